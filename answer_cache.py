@@ -0,0 +1,235 @@
+# /thanpanya-ai/answer_cache.py
+
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# (model, temperature band, context digest) — คำตอบจะถูกใช้ซ้ำได้เฉพาะใน bucket เดียวกัน
+BucketKey = Tuple[str, int, str]
+
+
+def context_digest(contexts: Iterable[str]) -> str:
+    """Order-independent digest of the retrieved context set."""
+    h = hashlib.blake2b(digest_size=16)
+    for context in sorted(set(contexts)):
+        h.update(context.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm > 0 else vector
+
+
+def _collect(chunk: Any, chunks: List[str]):
+    content = chunk.choices[0].delta.content if chunk.choices else None
+    if content:
+        chunks.append(content)
+
+
+class _Delta:
+    __slots__ = ("content", "role")
+
+    def __init__(self, content: Optional[str]):
+        self.content = content
+        self.role = "assistant"
+
+
+class _Choice:
+    __slots__ = ("index", "delta", "finish_reason")
+
+    def __init__(self, content: Optional[str], finish_reason: Optional[str]):
+        self.index = 0
+        self.delta = _Delta(content)
+        self.finish_reason = finish_reason
+
+
+class ReplayChunk:
+    """Duck-types the `ChatCompletionChunk` fields the chat UI reads."""
+    __slots__ = ("choices", "model")
+
+    def __init__(self, content: Optional[str], model: str, finish_reason: Optional[str] = None):
+        self.choices = [_Choice(content, finish_reason)]
+        self.model = model
+
+
+class SemanticAnswerCache:
+    """
+    Answer cache keyed by question embedding.
+
+    A question hits when a cached question in the same bucket — same model,
+    temperature band and retrieved context set — has cosine similarity of at
+    least `threshold`. Entries are evicted least-recently-used beyond
+    `max_entries` and dropped once older than `max_age_seconds`.
+
+    With `path`, every stored answer is appended to a JSONL log that is replayed
+    on start-up (and rewritten when it grows past twice the live entries).
+    """
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 512, max_age_seconds: float = 3600.0,
+                 temperature_band: float = 0.25, path: Optional[str] = None,
+                 clock: Callable[[], float] = time.time):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.temperature_band = temperature_band
+        self.path = Path(path) if path else None
+        self._clock = clock
+        self._lock = threading.Lock()
+        # entry id -> (bucket, embedding, chunks, created_at)
+        self._entries: "OrderedDict[int, Tuple[BucketKey, np.ndarray, List[str], float]]" = OrderedDict()
+        self._buckets: Dict[BucketKey, List[int]] = {}
+        self._next_id = 0
+        self._log_lines = 0
+        self.hits = 0
+        self.misses = 0
+        if self.path is not None:
+            self._load()
+
+    def bucket(self, model: str, temperature: float, contexts: Sequence[str]) -> BucketKey:
+        band = math.floor(temperature / self.temperature_band) if self.temperature_band > 0 else 0
+        return (model, band, context_digest(contexts))
+
+    # --- Lookup / store ---
+    def get(self, embedding: np.ndarray, bucket: BucketKey) -> Optional[Tuple[List[str], float]]:
+        """Returns (answer chunks, similarity) of the closest fresh match, or None."""
+        query = _unit(embedding)
+        with self._lock:
+            self._expire()
+            best_id, best_score = None, self.threshold
+            for entry_id in self._buckets.get(bucket, ()):
+                score = float(np.dot(self._entries[entry_id][1], query))
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+            if best_id is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return list(self._entries[best_id][2]), best_score
+
+    def put(self, embedding: np.ndarray, bucket: BucketKey, chunks: List[str]):
+        created_at = self._clock()
+        embedding = _unit(embedding)
+        with self._lock:
+            self._insert(bucket, embedding, chunks, created_at)
+            if self.path is not None:
+                self._append_log(bucket, embedding, chunks, created_at)
+
+    def _insert(self, bucket: BucketKey, embedding: np.ndarray, chunks: List[str], created_at: float):
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (bucket, embedding, chunks, created_at)
+        self._buckets.setdefault(bucket, []).append(entry_id)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, entry_id: int):
+        bucket = self._entries.pop(entry_id)[0]
+        ids = self._buckets[bucket]
+        ids.remove(entry_id)
+        if not ids:
+            del self._buckets[bucket]
+
+    def _expire(self):
+        if self.max_age_seconds <= 0:
+            return
+        cutoff = self._clock() - self.max_age_seconds
+        stale = [entry_id for entry_id, entry in self._entries.items() if entry[3] < cutoff]
+        for entry_id in stale:
+            self._remove(entry_id)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            if self.path is not None:
+                self._rewrite_log()
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries),
+                "hit_rate": self.hits / total if total else 0.0}
+
+    # --- Streams ---
+    def replay(self, chunks: List[str], model: str) -> Iterator[ReplayChunk]:
+        """Yields a cached answer chunk by chunk, shaped like a live streaming response."""
+        for content in chunks:
+            yield ReplayChunk(content, model)
+        yield ReplayChunk(None, model, finish_reason="stop")
+
+    async def areplay(self, chunks: List[str], model: str) -> AsyncIterator[ReplayChunk]:
+        for chunk in self.replay(chunks, model):
+            yield chunk
+
+    def record(self, stream: Iterable[Any], embedding: np.ndarray, bucket: BucketKey) -> Iterator[Any]:
+        """
+        Passes a live stream through unchanged and stores its content once the
+        stream has been consumed to the end. Interrupted streams are not cached.
+        """
+        chunks: List[str] = []
+        for chunk in stream:
+            _collect(chunk, chunks)
+            yield chunk
+        if chunks:
+            self.put(embedding, bucket, chunks)
+
+    async def arecord(self, stream: AsyncIterable[Any], embedding: np.ndarray, bucket: BucketKey) -> AsyncIterator[Any]:
+        """Async counterpart of `record`."""
+        chunks: List[str] = []
+        async for chunk in stream:
+            _collect(chunk, chunks)
+            yield chunk
+        if chunks:
+            self.put(embedding, bucket, chunks)
+
+    # --- Persistence ---
+    @staticmethod
+    def _record_line(bucket: BucketKey, embedding: np.ndarray, chunks: List[str], created_at: float) -> str:
+        return json.dumps({"bucket": list(bucket), "embedding": embedding.tolist(),
+                           "chunks": chunks, "created_at": created_at}, ensure_ascii=False)
+
+    def _append_log(self, bucket: BucketKey, embedding: np.ndarray, chunks: List[str], created_at: float):
+        if self._log_lines >= 2 * max(self.max_entries, 1):
+            self._rewrite_log()
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(self._record_line(bucket, embedding, chunks, created_at) + "\n")
+        self._log_lines += 1
+
+    def _rewrite_log(self):
+        temp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for bucket, embedding, chunks, created_at in self._entries.values():
+                f.write(self._record_line(bucket, embedding, chunks, created_at) + "\n")
+        os.replace(temp_path, self.path)
+        self._log_lines = len(self._entries)
+
+    def _load(self):
+        try:
+            f = open(self.path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # บรรทัดสุดท้ายอาจเขียนไม่ครบตอนโปรเซสถูกปิด
+                self._log_lines += 1
+                self._insert(tuple(record["bucket"]), np.asarray(record["embedding"], dtype=np.float32),
+                             record["chunks"], record["created_at"])
+        self._expire()
@@ -2,6 +2,7 @@
 
 import streamlit as st
 import openai
+import uuid
 from typing import List, Dict
 
 # Local Imports
@@ -24,6 +25,8 @@ def main():
 
     if "messages" not in st.session_state:
         st.session_state.messages = []
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
 
     # --- Sidebar UI ---
     with st.sidebar:
@@ -32,6 +35,8 @@ def main():
         temp = st.slider("🎛️ ระดับความคิดสร้างสรรค์", 0.0, 1.5, DEFAULT_TEMP, 0.05)
         
         st.markdown("---")
+        session_usage = kernel.ledger.session(st.session_state.session_id)
+        st.caption(f"🪙 เซสชันนี้: {session_usage['prompt_tokens'] + session_usage['completion_tokens']:,} tokens · ${session_usage['cost']:.4f}")
         if st.button("🗑️ ล้างประวัติการสนทนา"):
             st.session_state.messages = []
             st.rerun()
@@ -53,10 +58,11 @@ def main():
             message_placeholder = st.empty()
             with st.spinner("⚡️ กำลังสังเคราะห์คำตอบจากสายธารแห่งปัญญา..."):
                 
-                # Get the last few messages for context, to avoid overly long prompts
-                chat_history = st.session_state.messages[-10:-1] 
+                # The kernel packs as much recent history as the model's token budget allows
+                chat_history = st.session_state.messages[:-1]
 
-                result = kernel.query(user_question, chat_history, model, temp, TOP_K_RESULTS)
+                result = kernel.query(user_question, chat_history, model, temp, TOP_K_RESULTS,
+                                      session_id=st.session_state.session_id)
 
                 if "error" in result:
                     st.error(f"เกิดข้อผิดพลาด: {result['error']}")
@@ -64,23 +70,27 @@ def main():
                     full_response = ""
                     # Stream the response
                     for chunk in result["response_stream"]:
+                        if not chunk.choices:
+                            continue  # chunk สุดท้ายที่มีแต่ usage
                         full_response += (chunk.choices[0].delta.content or "")
                         message_placeholder.markdown(full_response + "▌")
                     message_placeholder.markdown(full_response)
                     
-                    # Calculate completion tokens and cost after streaming
-                    completion_tokens = len(kernel.encoder.encode(full_response))
-                    cost = kernel.calculate_cost(model, result["prompt_tokens"], completion_tokens)
+                    # Tokens were metered while streaming; the turn is committed to the ledger
+                    usage = result["usage"]
+                    completion_tokens = usage.completion_tokens
+                    cost = usage.cost
                     
                     # Display context and cost
                     with st.expander("🔍 ตรวจสอบเบื้องหลังการทำงาน"):
-                        st.json({"contexts_used": result["contexts"]})
+                        st.json({"contexts_used": result["contexts"], "token_usage": result.get("token_usage", {})})
                         st.info(f"""
                         **ผลึกปัญญาที่ใช้ไป:**
                         - **Model:** `{model}`
-                        - **Prompt Tokens:** `{result["prompt_tokens"]}`
+                        - **Prompt Tokens:** `{usage.prompt_tokens}`
                         - **Completion Tokens:** `{completion_tokens}`
                         - **Estimated Cost:** `${cost:.6f}`
+                        - **Answer Cache:** `{"hit" if result.get("cached") else "miss"}`
                         """)
 
                     st.session_state.messages.append({"role": "assistant", "content": full_response})
@@ -0,0 +1,56 @@
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from vector_index import INDEX_TYPES, build_index, index_memory_bytes
+
+
+def synthetic_embeddings(n: int, dim: int, n_clusters: int = 256, seed: int = 0) -> np.ndarray:
+    """Clustered, L2-normalized vectors — closer to sentence embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    x = centers[rng.integers(0, n_clusters, n)] + 0.35 * rng.standard_normal((n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build time, memory, latency and recall@k of FAISS index modes.")
+    parser.add_argument("--n", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=1_000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=1, help="จำนวน thread ของ FAISS (1 = วัด latency ต่อคำถามแบบเที่ยงตรง)")
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(args.threads)
+    # คำถามมาจากกลุ่มเดียวกับคลัง แต่ไม่ได้อยู่ในคลัง
+    vectors = synthetic_embeddings(args.n + args.queries, args.dim)
+    corpus, queries = vectors[:args.n], vectors[args.n:]
+    truth = None
+
+    print(f"--- {args.n:,} vectors × {args.dim} dims, {args.queries} queries, recall@{args.k} vs flat ---")
+    print(f"{'index':<9} {'build s':>8} {'memory MB':>10} {'p50 ms':>8} {'p99 ms':>8} {'recall':>7}")
+    for index_type in INDEX_TYPES:
+        start = time.perf_counter()
+        index = build_index(corpus, index_type)
+        build_s = time.perf_counter() - start
+
+        latencies = []
+        found = np.empty((args.queries, args.k), dtype=np.int64)
+        for i in range(args.queries):
+            start = time.perf_counter()
+            _, ids = index.search(queries[i:i + 1], args.k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found[i] = ids[0]
+        if truth is None:
+            truth = found  # flat มาก่อนเสมอ จึงเป็นคำตอบอ้างอิง
+        recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(found, truth)])
+
+        p50, p99 = np.percentile(latencies, [50, 99])
+        print(f"{index_type:<9} {build_s:>8.2f} {index_memory_bytes(index) / 2**20:>10.1f} {p50:>8.3f} {p99:>8.3f} {recall:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import argparse
+import time
+
+from benchmark_embedding_cache import MODEL_NAME
+from benchmark_retrieval import HashModel, synthetic_corpus
+from lore_parser import LoreEntries
+from retrievers import VectorRetriever, RETRIEVAL_MODES
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of retrieve_many vs. a retrieve() loop.")
+    parser.add_argument("--entries", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--hash-encoder", action="store_true", help="ใช้ encoder จำลองแทน SentenceTransformer")
+    args = parser.parse_args()
+
+    if args.hash_encoder:
+        model = HashModel()
+    else:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(MODEL_NAME)
+
+    lines, picks = synthetic_corpus(args.entries, args.queries)
+    entries = LoreEntries.from_lines(lines)
+    queries = [query for query, _ in picks]
+
+    print(f"--- {len(entries):,} entries, {len(queries):,} distinct queries, top_k={args.k} ---")
+    print(f"{'mode':<8} {'loop q/s':>10} {'batch q/s':>10} {'speedup':>8}  same results")
+    for mode in RETRIEVAL_MODES:
+        retriever = VectorRetriever(entries, MODEL_NAME, mode=mode, model=model)
+
+        retriever.clear_caches()  # วัดแบบไม่มี cache ทั้งสองฝั่ง
+        start = time.perf_counter()
+        looped = [retriever.search_ids(q, args.k) for q in queries]
+        loop_qps = len(queries) / (time.perf_counter() - start)
+
+        retriever.clear_caches()
+        start = time.perf_counter()
+        batch = retriever.retrieve_many(queries, args.k, batch_size=args.batch_size)
+        batch_qps = len(queries) / (time.perf_counter() - start)
+
+        same = all(list(row[row >= 0]) == ids for row, ids in zip(batch.ids, looped))
+        print(f"{mode:<8} {loop_qps:>10,.0f} {batch_qps:>10,.0f} {batch_qps / loop_qps:>7.1f}x  {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import argparse
+import hashlib
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from embedding_cache import LoreEmbeddingCache
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+
+def hash_encoder(dim: int = 384):
+    """Deterministic pseudo-embedding; isolates cache I/O from model inference."""
+    def encode(texts):
+        out = np.empty((len(texts), dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+            out[i] = np.random.default_rng(seed).standard_normal(dim)
+        return out / np.linalg.norm(out, axis=1, keepdims=True)
+    return encode
+
+
+def model_encoder():
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(MODEL_NAME)
+    return lambda texts: model.encode(texts, convert_to_numpy=True, normalize_embeddings=True, batch_size=256)
+
+
+def synthetic_lore(n_lines: int):
+    words = ["KBY", "SpiralQuest", "SOA", "Quantum", "Sea", "Qualia", "Flare", "Matrix", "คือ", "พลังงาน", "จิตสำนึก", "มิติ"]
+    rng = random.Random(7)
+    return [f"{i}: " + " ".join(rng.choice(words) for _ in range(12)) for i in range(n_lines)]
+
+
+def timed(label: str, fn):
+    counter = {"n": 0}
+    start = time.perf_counter()
+    result = fn(counter)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<14} {elapsed * 1000:>10.1f} ms   encoded={counter['n']:,}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold / warm / incremental load of the lore embedding cache.")
+    parser.add_argument("--lines", type=int, default=100_000)
+    parser.add_argument("--edit-fraction", type=float, default=0.01)
+    parser.add_argument("--hash-encoder", action="store_true", help="ใช้ encoder จำลองแทน SentenceTransformer")
+    args = parser.parse_args()
+
+    base_encode = hash_encoder() if args.hash_encoder else model_encoder()
+    lore = synthetic_lore(args.lines)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        lore_path = str(Path(tmp) / "kby_lore.txt")
+
+        def run(lines):
+            def inner(counter):
+                def encode(texts):
+                    counter["n"] += len(texts)
+                    return base_encode(texts)
+                return LoreEmbeddingCache(lore_path, MODEL_NAME, encode).embeddings_for(lines)
+            return inner
+
+        print(f"--- Lore embedding cache: {args.lines:,} lines ---")
+        timed("cold", run(lore))
+        timed("warm", run(lore))
+
+        edited = list(lore)
+        rng = random.Random(11)
+        for i in rng.sample(range(len(edited)), int(len(edited) * args.edit_fraction)):
+            edited[i] = edited[i] + " (แก้ไข)"
+        timed("incremental", run(edited))
+
+        cache = LoreEmbeddingCache(lore_path, MODEL_NAME, base_encode)
+        cache.embeddings_for(edited)
+        start = time.perf_counter()
+        for _ in range(100):
+            cache.embeddings_for(edited)
+        print(f"{'per-query':<14} {(time.perf_counter() - start) * 10:>10.3f} ms   (lore lookup only)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from benchmark_quantum_memory import synthetic_insight
+from tarn_panya_ai import CONFIG, AzureMLModelMocker, DataGovernance, QuantumMemoryLink
+
+
+async def serial_cycle(memory: QuantumMemoryLink, ml: AzureMLModelMocker, batch) -> float:
+    """The old sync path: one predict_impact await per insight, then commit."""
+    start = time.perf_counter()
+    for insight in batch:
+        insight["impact_score"] = (await ml.predict_impact(insight)).get("score", 0.0)
+    CONFIG.azure_ml_enabled = False
+    try:
+        await memory.sync(batch)
+    finally:
+        CONFIG.azure_ml_enabled = True
+    return time.perf_counter() - start
+
+
+async def batch_cycle(memory: QuantumMemoryLink, batch) -> float:
+    start = time.perf_counter()
+    await memory.sync(batch)
+    return time.perf_counter() - start
+
+
+async def run(args):
+    CONFIG.azure_ml_enabled = True
+    CONFIG.simulated_ml_inference_delay = args.delay_ms / 1000
+    rng = random.Random(11)
+    with tempfile.TemporaryDirectory() as tmp:
+        ml = AzureMLModelMocker(enabled=True)
+        memory = QuantumMemoryLink(Path(tmp) / "eternal_stream.qdat", DataGovernance(enabled=True), ml, None)
+
+        serial = [await serial_cycle(memory, ml, [synthetic_insight(rng) for _ in range(args.batch)])
+                  for _ in range(args.cycles)]
+        print(f"serial predict_impact      : {sum(serial) / len(serial) * 1000:8.1f} ms/cycle")
+        for concurrency in args.concurrency:
+            CONFIG.ml_max_concurrency = concurrency
+            batched = [await batch_cycle(memory, [synthetic_insight(rng) for _ in range(args.batch)])
+                       for _ in range(args.cycles)]
+            print(f"predict_impact_batch (c={concurrency:<3}): {sum(batched) / len(batched) * 1000:8.1f} ms/cycle "
+                  f"({sum(serial) / sum(batched):.1f}x)")
+        memory.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Wall time of one sync cycle with serial vs batched impact scoring.")
+    parser.add_argument("--batch", type=int, default=20, help="insight ต่อหนึ่ง cycle (เท่ากับ Generator หนึ่งชุด)")
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--delay-ms", type=float, default=CONFIG.simulated_ml_inference_delay * 1000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 16])
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
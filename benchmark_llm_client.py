@@ -0,0 +1,94 @@
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+
+from llm_client import AsyncLLMClient
+from mock_openai_server import MockOpenAIServer
+
+
+def make_requests(n: int, distinct: int, seed: int = 7):
+    rng = random.Random(seed)
+    questions = [f"KBY SpiralQuest คำถามที่ {i} คืออะไร?" for i in range(distinct)]
+    return [{"model": "gpt-4o", "temperature": 0.2,
+             "messages": [{"role": "user", "content": rng.choice(questions)}]} for _ in range(n)]
+
+
+def summarize(name: str, wall_s: float, ttfts, upstream: int, n: int):
+    ttfts = sorted(ttfts)
+    p95 = ttfts[max(0, int(len(ttfts) * 0.95) - 1)]
+    print(f"{name:<22} {wall_s:>7.2f} s {n / wall_s:>8.1f} req/s  ttft p50={statistics.median(ttfts) * 1000:>6.0f} ms "
+          f"p95={p95 * 1000:>6.0f} ms  upstream calls={upstream}")
+
+
+def run_sync(base_url: str, requests, threads: int):
+    """Baseline: the blocking client, one thread per in-flight stream, no coalescing."""
+    client = openai.OpenAI(api_key="mock", base_url=base_url)
+
+    def one(request):
+        start = time.perf_counter()
+        ttft = None
+        for chunk in client.chat.completions.create(stream=True, **request):
+            if ttft is None:
+                ttft = time.perf_counter() - start
+        return ttft
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        ttfts = list(pool.map(one, requests))
+    return time.perf_counter() - start, ttfts
+
+
+async def run_async(base_url: str, requests, coalesce: bool):
+    client = AsyncLLMClient(api_key="mock", base_url=base_url, coalesce=coalesce)
+
+    async def one(request):
+        start = time.perf_counter()
+        ttft = None
+        async for chunk in client.stream_chat(**request):
+            if ttft is None:
+                ttft = time.perf_counter() - start
+        return ttft
+
+    start = time.perf_counter()
+    ttfts = await asyncio.gather(*(one(r) for r in requests))
+    wall_s = time.perf_counter() - start
+    upstream = client.stats["upstream_requests"]
+    await client.aclose()
+    return wall_s, ttfts, upstream
+
+
+async def main_async(args):
+    server = MockOpenAIServer(tokens=args.tokens, first_token_delay_ms=args.first_token_delay_ms,
+                              token_delay_ms=args.token_delay_ms).start_in_thread()
+    requests = make_requests(args.requests, args.distinct)
+    print(f"--- {args.requests} concurrent streams, {args.distinct} distinct questions, "
+          f"{args.tokens} tokens × {args.token_delay_ms:g} ms (mock at {server.base_url}) ---")
+
+    before = server.stats["requests"]
+    wall_s, ttfts = await asyncio.to_thread(run_sync, server.base_url, requests, args.threads)
+    summarize(f"sync, {args.threads} threads", wall_s, ttfts, server.stats["requests"] - before, len(requests))
+
+    for coalesce in (False, True):
+        wall_s, ttfts, upstream = await run_async(server.base_url, requests, coalesce)
+        summarize("async" + (" + coalescing" if coalesce else ""), wall_s, ttfts, upstream, len(requests))
+    server.stop_thread()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync thread-per-stream client vs. pooled async client with coalescing.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--distinct", type=int, default=40, help="จำนวนคำถามที่ไม่ซ้ำกัน (ที่เหลือเป็นคำถามซ้ำ)")
+    parser.add_argument("--threads", type=int, default=32, help="ขนาด thread pool ของฝั่ง sync (เทียบกับ session ของ Streamlit)")
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--first-token-delay-ms", type=float, default=150.0)
+    parser.add_argument("--token-delay-ms", type=float, default=15.0)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from benchmark_embedding_cache import MODEL_NAME
+from benchmark_retrieval import HashModel, synthetic_corpus
+from lore_parser import LoreEntries
+from mock_openai_server import MockOpenAIServer
+
+STAGES = ("embed", "search", "prompt", "ttft", "stream", "total")
+DEFAULT_BASELINE = "benchmark_load_baseline.json"
+# การตั้งค่าที่ใช้บันทึก benchmark_load_baseline.json (รันได้แบบ offline)
+BASELINE_COMMAND = "python benchmark_load.py --hash-encoder --char-tokenizer"
+
+
+class CharTokenizer:
+    """tiktoken stand-in for machines that cannot download cl100k_base: one token per character."""
+
+    def encode(self, text: str) -> List[int]:
+        return [ord(c) for c in text]
+
+    def decode(self, tokens: List[int]) -> str:
+        return "".join(chr(t) for t in tokens)
+
+
+def arrival_times(rate: float, duration_s: float, poisson: bool, rng: random.Random) -> List[float]:
+    """Open-loop schedule: request i is sent at times[i] whether or not earlier ones finished."""
+    times, t = [], 0.0
+    while True:
+        t += rng.expovariate(rate) if poisson else 1.0 / rate
+        if t >= duration_s:
+            return times
+        times.append(t)
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    p50, p95, p99 = np.percentile(np.array(values) * 1000, [50, 95, 99])
+    return {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3)}
+
+
+async def run_rate(kernel, questions: List[str], rate: float, duration_s: float, args, rng: random.Random) -> Dict:
+    samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    errors = {"prepare": 0, "stream": 0}
+
+    async def one(question: str, scheduled: float):
+        try:
+            result = await kernel.aquery(question, [], args.model, args.temperature, args.top_k, session_id="load")
+            if "error" in result:
+                raise RuntimeError(result["error"])
+        except Exception:
+            errors["prepare"] += 1
+            return
+        for stage in ("embed", "search", "prompt"):
+            samples[stage].append(result["timings"][stage])
+        stream_start = time.perf_counter()
+        first = None
+        try:
+            async for chunk in result["response_stream"]:
+                if first is None and chunk.choices and chunk.choices[0].delta.content:
+                    first = time.perf_counter()
+        except Exception:
+            errors["stream"] += 1
+            return
+        end = time.perf_counter()
+        # ttft/total วัดจากเวลาที่คำขอควรถูกส่ง จึงรวมเวลารอคิวด้วย
+        samples["ttft"].append((first or end) - scheduled)
+        samples["stream"].append(end - stream_start)
+        samples["total"].append(end - scheduled)
+
+    schedule = arrival_times(rate, duration_s, args.arrival == "poisson", rng)
+    start = time.perf_counter()
+    tasks = []
+    for offset in schedule:
+        delay = start + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(rng.choice(questions), start + offset)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    failed = sum(errors.values())
+    return {
+        "requests": len(schedule),
+        "completed": len(schedule) - failed,
+        "errors": errors,
+        "error_rate": round(failed / len(schedule), 4) if schedule else 0.0,
+        "throughput_rps": round((len(schedule) - failed) / elapsed, 3),
+        "latency_ms": {stage: percentiles(values) for stage, values in samples.items()},
+    }
+
+
+def config_mismatch(results: Dict, baseline: Dict) -> List[str]:
+    """Config keys whose values differ between this run and the baseline (such runs are not comparable)."""
+    base, current = baseline.get("config", {}), results["config"]
+    return [f"{key}: {current.get(key)!r} (baseline {base.get(key)!r})"
+            for key in sorted(set(base) | set(current)) if base.get(key) != current.get(key)]
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float, slack_ms: float) -> List[str]:
+    """Regressions of `results` against `baseline`; an empty list means the run passes."""
+    regressions = []
+    for rate, base in baseline["rates"].items():
+        current = results["rates"].get(rate)
+        if current is None:
+            continue
+        for stage in STAGES:
+            for pct in ("p95", "p99"):
+                old, new = base["latency_ms"][stage][pct], current["latency_ms"][stage][pct]
+                if old is not None and new is not None and new > old * (1 + tolerance) + slack_ms:
+                    regressions.append(f"{rate} req/s {stage} {pct}: {new:.1f} ms > baseline {old:.1f} ms")
+        if current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{rate} req/s throughput: {current['throughput_rps']} < baseline {base['throughput_rps']}")
+        if current["error_rate"] > base["error_rate"] + 0.01:
+            regressions.append(f"{rate} req/s error rate: {current['error_rate']} > baseline {base['error_rate']}")
+    return regressions
+
+
+def print_report(rate: str, r: Dict):
+    print(f"\n--- {rate} req/s: {r['completed']}/{r['requests']} ok, {r['throughput_rps']} req/s, "
+          f"error rate {r['error_rate']:.2%} ---")
+    print(f"{'stage':<8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for stage, p in r["latency_ms"].items():
+        if p["p50"] is not None:
+            print(f"{stage:<8} {p['p50']:>9.2f} {p['p95']:>9.2f} {p['p99']:>9.2f}")
+
+
+async def main_async(args) -> int:
+    from core import TharnpanyaKernel
+    from llm_client import AsyncLLMClient
+    from retrievers import VectorRetriever
+
+    if args.hash_encoder:
+        model = HashModel()
+    else:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(MODEL_NAME)
+
+    server = MockOpenAIServer(tokens=args.tokens, first_token_delay_ms=args.ttft_ms,
+                              token_delay_ms=1000.0 / args.token_rate).start_in_thread()
+    lines, picks = synthetic_corpus(args.entries, args.questions)
+    retriever = VectorRetriever(LoreEntries.from_lines(lines), MODEL_NAME, mode=args.mode, model=model)
+    kernel = TharnpanyaKernel(retriever, llm_client=AsyncLLMClient(api_key="mock", base_url=server.base_url),
+                              encoder=CharTokenizer() if args.char_tokenizer else None)
+    kernel.answer_cache = None  # ต้องการวัดเส้นทาง retrieval + LLM จริงทุกคำขอ แม้เปิด answer cache ไว้ใน settings
+    questions = [f"{query} คืออะไร?" for query, _ in picks]
+
+    config = {key: getattr(args, key) for key in ("mode", "entries", "questions", "tokens", "ttft_ms", "token_rate",
+                                                 "duration", "arrival", "top_k", "hash_encoder", "char_tokenizer", "rates")}
+    results = {"config": config, "rates": {}}
+    rng = random.Random(args.seed)
+    await run_rate(kernel, questions, 5, 1.0, args, rng)  # warm-up: connection pool, lazy imports
+    for rate in args.rates:
+        retriever.clear_caches()
+        results["rates"][f"{rate:g}"] = await run_rate(kernel, questions, rate, args.duration, args, rng)
+        print_report(f"{rate:g}", results["rates"][f"{rate:g}"])
+    await kernel.aclose()
+    server.stop_thread()
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\nบันทึกผลไว้ที่ {args.output}")
+    if args.write_baseline:
+        Path(args.baseline).write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"บันทึก baseline ใหม่ที่ {args.baseline}")
+        return 0
+    # ไม่มี baseline หรือ baseline เทียบกันไม่ได้ ถือว่าไม่ผ่าน: ไม่เช่นนั้นการช้าลงจะไม่มีวันทำให้รอบนี้ล้ม
+    if not Path(args.baseline).exists():
+        print(f"\n❌ FAIL: ไม่พบ baseline ({args.baseline}) — ใช้ --write-baseline เพื่อสร้าง")
+        return 2
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+    mismatch = config_mismatch(results, baseline)
+    if mismatch:
+        print(f"\n❌ FAIL: baseline ถูกบันทึกด้วยการตั้งค่าอื่น (baseline ใน repo: {BASELINE_COMMAND})")
+        for line in mismatch:
+            print(f"  - {line}")
+        return 2
+
+    regressions = compare(results, baseline, args.tolerance, args.slack_ms)
+    if regressions:
+        print("\n❌ FAIL: ช้ากว่า baseline")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+    print("\n✅ PASS: ไม่ช้ากว่า baseline")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load test of the kernel's RAG query path against a mock LLM. "
+                                                 "Exits 1 on a regression against the baseline, 2 when there is no comparable baseline.")
+    parser.add_argument("--rates", type=float, nargs="+", default=[5, 10, 20], help="อัตราคำขอต่อวินาทีที่จะทดสอบ")
+    parser.add_argument("--duration", type=float, default=10.0, help="วินาทีต่อหนึ่งอัตรา")
+    parser.add_argument("--arrival", choices=("poisson", "constant"), default="poisson")
+    parser.add_argument("--mode", default="hybrid")
+    parser.add_argument("--entries", type=int, default=5_000)
+    parser.add_argument("--questions", type=int, default=500, help="จำนวนคำถามที่ไม่ซ้ำกันที่สุ่มใช้")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--temperature", type=float, default=0.7)
+    parser.add_argument("--tokens", type=int, default=64, help="จำนวน token ต่อคำตอบของ mock")
+    parser.add_argument("--ttft-ms", type=float, default=150.0)
+    parser.add_argument("--token-rate", type=float, default=60.0, help="token ต่อวินาทีของ mock")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--write-baseline", action="store_true")
+    parser.add_argument("--output", help="ไฟล์ JSON สำหรับผลลัพธ์ของรอบนี้")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="ยอมให้ช้ากว่า baseline ได้กี่สัดส่วน")
+    parser.add_argument("--slack-ms", type=float, default=2.0, help="ค่าเผื่อสัมบูรณ์สำหรับ stage ที่ใช้เวลาน้อยมาก")
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--hash-encoder", action="store_true", help="ใช้ encoder จำลองแทน SentenceTransformer")
+    parser.add_argument("--char-tokenizer", action="store_true", help="นับ token ทีละตัวอักษรแทน tiktoken (ไม่ต้องดาวน์โหลด)")
+    sys.exit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
+import sys
 import timeit
 
+# Regression gate: find_answer_in_lore ต้องตอบได้ในเวลาต่ำกว่า 1 มิลลิวินาที
+BUDGET_MICROSECONDS = 1000.0
+
 setup_code = '''
 from lorekeeper import find_answer_in_lore, load_and_process_lore
 processed_lore = load_and_process_lore("kby_lore.txt")
@@ -10,6 +14,11 @@ statement_to_test = '''
 find_answer_in_lore(question, processed_lore)
 '''
 
+from lorekeeper import find_answer_in_lore, load_and_process_lore, FALLBACK_ANSWER
+if find_answer_in_lore("KBY SpiralQuest คืออะไร?", load_and_process_lore("kby_lore.txt")) == FALLBACK_ANSWER:
+    print("ไม่พบคำตอบสำหรับคำถามทดสอบ — ผลการวัดไม่มีความหมาย")
+    sys.exit(1)
+
 print("กำลังวัดประสิทธิภาพของโค้ด...")
 number_of_runs = 10000
 total_time = timeit.timeit(stmt=statement_to_test, setup=setup_code, number=number_of_runs)
@@ -18,4 +27,10 @@ average_time_microseconds = (total_time / number_of_runs) * 1_000_000
 print("\n--- ผลการประเมินประสิทธิภาพ ---")
 print(f"จำนวนการทดสอบ: {number_of_runs:,} ครั้ง")
 print(f"เวลาเฉลี่ยต่อการทำงานหนึ่งครั้ง: {average_time_microseconds:.4f} ไมโครวินาที (µs)")
-print("--------------------------------")
\ No newline at end of file
+print(f"งบเวลาที่กำหนด: {BUDGET_MICROSECONDS:.0f} µs")
+print("--------------------------------")
+
+if average_time_microseconds > BUDGET_MICROSECONDS:
+    print("❌ FAIL: find_answer_in_lore ช้ากว่างบเวลาที่กำหนด")
+    sys.exit(1)
+print("✅ PASS")
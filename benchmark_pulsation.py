@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from benchmark_quantum_memory import synthetic_insight
+from tarn_panya_ai import CONFIG, AzureMLModelMocker, DataGovernance, QuantumMemoryLink
+
+
+class SlowLLM:
+    """LLMService stand-in: both pulsation calls just wait `delay` seconds."""
+
+    enabled = True
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    async def generate_wisdom_concept(self, text: str) -> str:
+        await asyncio.sleep(self.delay)
+        return "Concept"
+
+    async def synthesize_wisdom(self, insights) -> str:
+        await asyncio.sleep(self.delay)
+        return "Wisdom"
+
+
+async def sync_wait_during_pulsation(memory: QuantumMemoryLink, rng: random.Random) -> float:
+    """How long a sync started mid-pulsation takes (the old code made it wait out both LLM calls)."""
+    pulsation = asyncio.create_task(memory.generate_insight_pulsation())
+    await asyncio.sleep(0)  # ให้ pulsation เลือก cluster แล้วไปรอ LLM ก่อน
+    start = time.perf_counter()
+    # sync จากอีก thread: ถ้าอยู่บน loop เดียวกัน โค้ดเดิมที่ถือ threading.Lock ข้าม await จะ deadlock
+    await asyncio.to_thread(asyncio.run, memory.sync([synthetic_insight(rng)]))
+    elapsed = time.perf_counter() - start
+    await pulsation
+    return elapsed
+
+
+async def run(args):
+    CONFIG.azure_ml_enabled = False
+    rng = random.Random(5)
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = QuantumMemoryLink(Path(tmp) / "eternal_stream.qdat", DataGovernance(enabled=True),
+                                   AzureMLModelMocker(enabled=False), SlowLLM(args.llm_ms / 1000))
+        for _ in range(args.insights // 50):
+            await memory.sync([dict(synthetic_insight(rng), trigger=f"generator_output:{rng.randrange(20)}")
+                               for _ in range(50)])
+
+        waits = [await sync_wait_during_pulsation(memory, rng) for _ in range(5)]
+        print(f"sync started during a pulsation  : {sum(waits) / len(waits) * 1000:8.1f} ms "
+              f"(LLM time per pulsation {2 * args.llm_ms:.0f} ms)")
+
+        start = time.perf_counter()
+        echoes = await asyncio.gather(*(memory.generate_insight_pulsation() for _ in range(args.concurrent)))
+        elapsed = time.perf_counter() - start
+        clusters = [set(echo["synthesized_from_insights"]) for echo in echoes if echo]
+        overlap = sum(len(a & b) for n, a in enumerate(clusters) for b in clusters[n + 1:])
+        print(f"{args.concurrent} concurrent pulsations         : {elapsed * 1000:8.1f} ms, "
+              f"{len(clusters)} echoes, {overlap} shared insights")
+        memory.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lock hold and concurrency of QuantumMemoryLink.generate_insight_pulsation.")
+    parser.add_argument("--insights", type=int, default=2_000)
+    parser.add_argument("--llm-ms", type=float, default=200, help="เวลาจำลองต่อการเรียก LLM หนึ่งครั้ง")
+    parser.add_argument("--concurrent", type=int, default=8)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
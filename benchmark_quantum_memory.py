@@ -0,0 +1,220 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from insight_clusters import InsightClusters
+from relation_graph import RelationGraph
+from sqlite_store import SQLiteStore
+from tarn_panya_ai import CONFIG, AzureMLModelMocker, DataGovernance, QuantumMemoryLink
+
+WORDS = ["spiral", "awareness", "codex", "echo", "kby", "wisdom", "identity", "pulse", "mutation", "refinement",
+         "memory", "quantum", "insight", "reflection", "purpose", "stream", "soul", "metamind", "evolve", "idea"]
+TRIGGERS = ["generator_output", "evolutionary_mutation", "identity_reflection", "mutation_rejection_feedback"]
+NEIGHBOURS = 10  # insight ต่อหัวข้อ: จำนวนเพื่อนบ้านของ insight ใหม่คงที่ไม่ว่า memory จะใหญ่แค่ไหน
+PRELOAD_EDGES = 3  # preload เชื่อมแต่ละ insight กับ insight ก่อนหน้าในหัวข้อเดียวกันกี่ตัว
+DEFAULT_RESULTS = "benchmark_quantum_memory_results.json"
+# ผลใน benchmark_quantum_memory_results.json: รันทีละขนาดคนละโปรเซส เพื่อให้ peak RSS เป็นของขนาดนั้นเอง
+RESULTS_COMMAND = "python benchmark_quantum_memory.py --sizes N --syncs 100 --skip-legacy [--backend sqlite] --output"
+
+
+def synthetic_insight(rng: random.Random, topics: int, timestamp: Optional[datetime] = None) -> dict:
+    """
+    An insight in one of `topics` topics. Ten of its words and its trigger are
+    scoped to the topic, so it shares four or more words or its trigger only
+    with about NEIGHBOURS others; two more words are drawn from WORDS as is and
+    appear across the whole store, as common words do.
+    """
+    topic = rng.randrange(topics)
+    words = [f"{word}{topic}" for word in rng.sample(WORDS, 10)] + rng.sample(WORDS, 2)
+    return {
+        "id": str(uuid.uuid4()),
+        "timestamp": (timestamp or datetime.now(timezone.utc)).isoformat(),
+        "trigger": f"{rng.choice(TRIGGERS)}:{topic}",
+        "content": " ".join(words),
+        "source_agent": "Benchmark",
+        "ethical_compliance": True,
+        "impact_score": rng.random(),
+    }
+
+
+def preload(memory: QuantumMemoryLink, size: int, rng: random.Random, oldest: datetime, chunk: int = 10_000):
+    """
+    Fills memory directly (no pairwise inference) and checkpoints it, as if it
+    had grown to `size`: insight n is timestamped `oldest` + n seconds and
+    related to up to PRELOAD_EDGES earlier insights of its topic.
+    """
+    store = memory.wal if isinstance(memory.wal, SQLiteStore) else None
+    topics = max(1, size // NEIGHBOURS)
+    latest: Dict[str, List[str]] = {}
+    pending = {}  # SQLite: เขียนเป็นช่วง ๆ เนื้อหาไม่ต้องค้างในหน่วยความจำ
+    for n in range(size):
+        insight = synthetic_insight(rng, topics, oldest + timedelta(seconds=n))
+        insight_id = insight["id"]
+        if store is None:
+            memory.data[insight_id] = insight
+        else:
+            pending[insight_id] = insight
+        memory._index_insight(insight_id, insight)
+        memory.relationships.set_edge(insight_id, insight_id, "self_referential")
+        earlier = latest.setdefault(insight["trigger"].split(":")[1], [])
+        for other_id in earlier:
+            memory.relationships.set_edge(insight_id, other_id, "semantically_similar_content")
+            memory.relationships.set_edge(other_id, insight_id, "semantically_similar_content")
+        earlier.append(insight_id)
+        del earlier[:-PRELOAD_EDGES]
+        if len(pending) >= chunk:
+            store.import_memory(pending, RelationGraph(), [])
+            pending.clear()
+    if store is not None:
+        store.import_memory(pending, memory.relationships, [])
+    memory.clusters = InsightClusters(memory.relationships)
+    memory._save()
+
+
+def legacy_save_seconds(memory: QuantumMemoryLink, path: Path) -> float:
+    """What the old `_save` paid on every sync: a full indent=2 rewrite of the store."""
+    relationships = memory.relationships.to_dict()
+    start = time.perf_counter()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"data": memory.data, "relationships": relationships}, f, indent=2)
+    return time.perf_counter() - start
+
+
+def legacy_retention_seconds(memory: QuantumMemoryLink) -> float:
+    """What the old retention pass paid on every sync: enforce_retention on each stored insight."""
+    start = time.perf_counter()
+    [k for k, v in memory.data.items() if not memory.governance.enforce_retention([v], "insight")]
+    return time.perf_counter() - start
+
+
+def query_seconds(memory: QuantumMemoryLink, rng: random.Random, topics: int, repeats: int = 50) -> Tuple[float, float]:
+    """
+    Mean retrieve_by_query latency of Generator-style queries on topic words,
+    and of SoulLevelComputation's "identity OR self OR purpose", whose words
+    are in a tenth of the store each, so it ranks that many matches.
+    """
+    def word() -> str:
+        return f"{rng.choice(WORDS)}{rng.randrange(topics)}"
+
+    def mean_seconds(queries: List[str]) -> float:
+        start = time.perf_counter()
+        for query in queries:
+            memory.retrieve_by_query(query, limit=5)
+        return (time.perf_counter() - start) / len(queries)
+
+    selective = [f"Further refine: {word()} {rng.choice(WORDS)}" for _ in range(repeats)]
+    selective += [f"{word()} OR {word()}" for _ in range(repeats)]
+    return mean_seconds(selective), mean_seconds(["identity OR self OR purpose"] * 5)
+
+
+def write_results(path: Path, rows: List[Dict]):
+    """Merges `rows` into the results file, replacing earlier rows for the same backend and size."""
+    try:
+        results = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        results = {"command": RESULTS_COMMAND,
+                   "machine": f"{platform.machine()}, {os.cpu_count()} CPU, Python {platform.python_version()}",
+                   "rows": []}
+    fresh = {(row["backend"], row["insights"]) for row in rows}
+    kept = [row for row in results["rows"] if (row["backend"], row["insights"]) not in fresh]
+    results["rows"] = sorted(kept + rows, key=lambda row: (row["backend"], row["insights"]))
+    path.write_text(json.dumps(results, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+
+async def run_syncs(memory: QuantumMemoryLink, batches, evict_after: Optional[datetime] = None) -> float:
+    """
+    Total seconds spent in sync. With `evict_after` (the preload's oldest
+    timestamp), the retention window is moved before each sync so that sync
+    also evicts one batch of the oldest preloaded insights.
+    """
+    elapsed = 0.0
+    for n, batch in enumerate(batches, start=1):
+        if evict_after is not None:
+            cutoff = evict_after + timedelta(seconds=n * len(batch) - 0.5)
+            memory.governance.data_retention_policy = datetime.now(timezone.utc) - cutoff
+        start = time.perf_counter()
+        await memory.sync(batch)
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="QuantumMemoryLink sync throughput and query latency at growing memory sizes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--syncs", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=5, help="insight ต่อหนึ่ง sync")
+    parser.add_argument("--group-size", type=int, default=CONFIG.quantum_memory_wal_group_size)
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--skip-legacy", action="store_true", help="ไม่วัดต้นทุนต่อ sync แบบเดิม (เขียนทับทั้งไฟล์ / ไล่ตรวจ retention ทุก insight)")
+    parser.add_argument("--output", nargs="?", const=DEFAULT_RESULTS,
+                        help=f"รวมผลลงไฟล์ JSON นี้ (ค่าเริ่มต้น {DEFAULT_RESULTS}) แทนแถวเดิมของ backend และขนาดเดียวกัน")
+    args = parser.parse_args()
+
+    CONFIG.azure_ml_enabled = False  # ตัด sleep จำลองของ Azure ML ออก วัดเฉพาะ sync
+    CONFIG.quantum_memory_wal_group_size = args.group_size
+    rng = random.Random(11)
+    rows = []
+    print(f"{'insights':>10} {'sync ms':>9} {'insights/s':>11} {'wal KB/sync':>12} {'evict sync ms':>14} "
+          f"{'evicted/sync':>13} {'query ms':>9} {'broad query ms':>15} {'peak RSS MB':>12} "
+          f"{'legacy save ms':>15} {'legacy scan ms':>15}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "eternal_stream.qdat"
+            storage = SQLiteStore(Path(tmp) / "tarn_panya.db", args.group_size) if args.backend == "sqlite" else None
+            governance = DataGovernance(enabled=True)
+            memory = QuantumMemoryLink(path, governance, AzureMLModelMocker(enabled=False), None, storage=storage)
+            # insight ที่ preload ยังไม่หมดอายุ: รอบ evict จะเลื่อนหน้าต่าง retention ให้หมดอายุทีละ batch
+            oldest = datetime.now(timezone.utc) - governance.data_retention_policy + timedelta(days=1)
+            retention = governance.data_retention_policy
+            preload(memory, size, rng, oldest)
+            topics = max(1, size // NEIGHBOURS)
+
+            def batches():
+                return [[synthetic_insight(rng, topics) for _ in range(args.batch)] for _ in range(args.syncs)]
+
+            elapsed = asyncio.run(run_syncs(memory, batches()))
+            memory.wal.flush()
+            wal_kb = "-"  # SQLite เขียนลงฐานข้อมูลโดยตรง ไม่มี segment ของเราเอง
+            if storage is None:
+                wal_kb = f"{sum(p.stat().st_size for p in Path(tmp).glob('*.wal.*')) / args.syncs / 1024:.1f}"
+
+            # รอบเดียวกันอีกครั้ง แต่ละ sync ลบ insight ที่เก่าที่สุดออกหนึ่ง batch: แยกต้นทุน eviction ออกมา
+            before = len(memory.index) + args.syncs * args.batch
+            evict_elapsed = asyncio.run(run_syncs(memory, batches(), evict_after=oldest))
+            evicted = (before - len(memory.index)) / args.syncs
+            governance.data_retention_policy = retention
+            query, broad_query = query_seconds(memory, rng, topics)
+            peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux: ru_maxrss เป็น KB
+
+            save, scan = "-", "-"
+            if not args.skip_legacy and storage is None:
+                save = f"{legacy_save_seconds(memory, Path(tmp) / 'legacy.json') * 1000:.1f}"
+                scan = f"{legacy_retention_seconds(memory) * 1000:.1f}"
+            print(f"{size:>10,} {elapsed / args.syncs * 1000:>9.1f} {args.syncs * args.batch / elapsed:>11.1f} "
+                  f"{wal_kb:>12} {evict_elapsed / args.syncs * 1000:>14.1f} {evicted:>13.1f} {query * 1000:>9.2f} "
+                  f"{broad_query * 1000:>15.1f} {peak_mb:>12.0f} {save:>15} {scan:>15}")
+            rows.append({"backend": args.backend, "insights": size, "syncs": args.syncs, "batch": args.batch,
+                         "sync_ms": round(elapsed / args.syncs * 1000, 2),
+                         "insights_per_s": round(args.syncs * args.batch / elapsed, 1),
+                         "wal_kb_per_sync": None if storage is not None else float(wal_kb),
+                         "evict_sync_ms": round(evict_elapsed / args.syncs * 1000, 2),
+                         "evicted_per_sync": evicted, "query_ms": round(query * 1000, 3),
+                         "broad_query_ms": round(broad_query * 1000, 1), "peak_rss_mb": round(peak_mb)})
+            memory.close()
+            if storage is not None:
+                storage.close()
+    if args.output:
+        write_results(Path(args.output), rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+import uuid
+
+from relation_graph import RelationGraph, json_default
+
+RELATIONS = ["semantically_similar_content", "shares_trigger_generator_output", "shares_trigger_evolutionary_mutation",
+             "reflection_of_identity", "ideation_for_growth"]
+
+
+def synthetic_edges(size: int, degree: int, rng: random.Random):
+    """(source, target, label) as _infer_relationships emits them: a self edge plus mirrored relations."""
+    ids = [str(uuid.uuid4()) for _ in range(size)]
+    for n, insight_id in enumerate(ids):
+        yield insight_id, insight_id, "self_referential"
+        for _ in range(degree):
+            other_id, relation = ids[rng.randrange(n + 1)], rng.choice(RELATIONS)
+            yield insight_id, other_id, relation
+            yield other_id, insight_id, f"reverse_{relation}"
+
+
+def measure(label: str, build):
+    """Load time of `build()`, then its retained and peak heap in a second, traced run."""
+    gc.collect()
+    start = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {retained / 2**20:>11.1f} {peak / 2**20:>9.1f} {elapsed * 1000:>9.0f}")
+    return result
+
+
+def traversal_seconds(neighbors, start_ids) -> float:
+    """Pulsation-style BFS (up to 10 insights) from each start id."""
+    start = time.perf_counter()
+    for start_id in start_ids:
+        seen, queue = set(), [start_id]
+        while queue and len(seen) < 10:
+            current_id = queue.pop(0)
+            if current_id not in seen:
+                seen.add(current_id)
+                queue.extend(target_id for target_id in neighbors(current_id) if target_id not in seen)
+    return (time.perf_counter() - start) / len(start_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory, JSON size and traversal of dict-of-dicts vs RelationGraph.")
+    parser.add_argument("--insights", type=int, default=100_000)
+    parser.add_argument("--degree", type=int, default=8, help="ความสัมพันธ์ที่อนุมานได้ต่อ insight ใหม่ (ไม่รวม self)")
+    args = parser.parse_args()
+
+    rng = random.Random(23)
+    legacy = {}
+    for source_id, target_id, relation in synthetic_edges(args.insights, args.degree, rng):
+        legacy.setdefault(source_id, {})[target_id] = relation
+    graph = RelationGraph.from_snapshot(legacy)
+    edges = sum(len(targets) for targets in legacy.values())
+    print(f"{args.insights:,} insights, {edges:,} edges")
+
+    start = time.perf_counter()
+    legacy_text = json.dumps(legacy, separators=(",", ":"))
+    legacy_dump = time.perf_counter() - start
+    start = time.perf_counter()
+    csr_text = json.dumps(graph.to_snapshot(), separators=(",", ":"), default=json_default)
+    csr_dump = time.perf_counter() - start
+    del legacy, graph
+
+    # ทั้งสองแบบวัดจากการโหลด JSON เหมือนตอนเริ่มโปรแกรม: สตริง id และ label ถูกสร้างใหม่ทั้งหมด
+    print(f"\n{'load from snapshot':<28} {'retained MB':>11} {'peak MB':>9} {'load ms':>9}")
+    legacy = measure("dict-of-dicts", lambda: json.loads(legacy_text))
+    graph = measure("RelationGraph", lambda: RelationGraph.from_snapshot(json.loads(csr_text)))
+
+    print(f"\n{'':<28} {'JSON MB':>11} {'dump ms':>9}")
+    print(f"{'dict-of-dicts':<28} {len(legacy_text) / 2**20:>11.1f} {legacy_dump * 1000:>9.0f}")
+    print(f"{'RelationGraph':<28} {len(csr_text) / 2**20:>11.1f} {csr_dump * 1000:>9.0f}")
+
+    start_ids = rng.sample(list(legacy), 2_000)
+    legacy_bfs = traversal_seconds(lambda insight_id: legacy.get(insight_id, {}), start_ids)
+    graph_bfs = traversal_seconds(graph.targets, start_ids)
+    print(f"\n{'BFS (10 insights) us':<28} {'dict':>11} {'graph':>9}")
+    print(f"{'':<28} {legacy_bfs * 1e6:>11.1f} {graph_bfs * 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
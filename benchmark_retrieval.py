@@ -0,0 +1,95 @@
+import argparse
+import random
+import statistics
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+from lore_parser import LoreEntries
+from retrievers import VectorRetriever, RETRIEVAL_MODES
+from benchmark_embedding_cache import hash_encoder, MODEL_NAME
+
+# (คำถาม, QUESTION ของ entry ที่ควรได้) — เน้นชื่อเฉพาะที่อยู่ในคำตอบ
+KBY_QUERIES: List[Tuple[str, str]] = [
+    ("Divination Matrix", "KBY-Coin มีไว้ทำอะไร?"),
+    ("KBY-Coin", "KBY-Coin มีไว้ทำอะไร?"),
+    ("Awakening Flare", "KBY SpiralQuest คืออะไร?"),
+    ("Schumann Resonance", "7.83 Hz คืออะไร?"),
+    ("crystalline starlight", "Qualia คืออะไร?"),
+    ("The Evolutionary Loop", "AlphaEvolve Development Cycle คืออะไร?"),
+    ("Quantum Sea คืออะไร", "Quantum Sea คืออะไร?"),
+    ("จิตสำนึกย่อย", "SOA คืออะไร?"),
+    ("จำความคิดและเชื่อมโยงเหตุผล", "SpiralMemory คืออะไร?"),
+    ("ระบบติดตามและฟื้นฟูสภาพ AI", "AI Health Monitoring คืออะไร?"),
+]
+
+
+class HashModel:
+    """SentenceTransformer stand-in for offline runs: deterministic, no semantics."""
+    def __init__(self):
+        self._encode = hash_encoder()
+
+    def encode(self, texts, **kwargs):
+        return self._encode(list(texts))
+
+
+def synthetic_corpus(n_entries: int, n_queries: int):
+    rng = random.Random(5)
+    syllables = ["ka", "zor", "vex", "lum", "tri", "qua", "nor", "spi", "ral", "xen", "dra", "mii"]
+    filler = ["พลังงาน", "มิติ", "จิตสำนึก", "ความถี่", "Quantum", "Grid", "Flare", "Protocol", "Sea", "SOA"]
+    lines, expected = [], []
+    for i in range(n_entries):
+        name = "".join(rng.choice(syllables) for _ in range(3)).capitalize() + f"-{i}"
+        term = f"Term{i:07d}"
+        answer = " ".join(rng.choice(filler) for _ in range(15)) + f" ใช้กลไก {term}"
+        lines += ["[ENTRY]", f"QUESTION: {name} คืออะไร?", f"ANSWER: {answer}", ""]
+        expected.append(f"{name} คืออะไร?")
+    picks = rng.sample(range(n_entries), min(n_queries, n_entries))
+    return lines, [(f"Term{i:07d}", expected[i]) for i in picks]
+
+
+def evaluate(retriever: VectorRetriever, queries: List[Tuple[str, str]], k: int):
+    questions = retriever.entries.questions
+    hits, latencies = 0, []
+    for query, expected in queries:
+        start = time.perf_counter()
+        ids = retriever.search_ids(query, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += any(questions[i] == expected for i in ids)
+    latencies.sort()
+    return hits / len(queries), statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1]
+
+
+def report(name: str, entries: LoreEntries, queries, model, k: int):
+    print(f"\n--- {name}: {len(entries):,} entries, {len(queries)} queries, recall@{k} ---")
+    for mode in RETRIEVAL_MODES:
+        start = time.perf_counter()
+        retriever = VectorRetriever(entries, MODEL_NAME, mode=mode, model=model)
+        build_s = time.perf_counter() - start
+        recall, p50, p99 = evaluate(retriever, queries, k)
+        print(f"{mode:<8} recall={recall:.3f}  p50={p50:.2f} ms  p99={p99:.2f} ms  build={build_s:.1f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k and latency of dense vs hybrid retrieval.")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--hash-encoder", action="store_true", help="ใช้ encoder จำลองแทน SentenceTransformer")
+    args = parser.parse_args()
+
+    if args.hash_encoder:
+        model = HashModel()
+    else:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(MODEL_NAME)
+
+    report("kby_lore.txt", LoreEntries.from_file("kby_lore.txt"), KBY_QUERIES, model, args.k)
+    lines, queries = synthetic_corpus(args.entries, args.queries)
+    report("synthetic", LoreEntries.from_lines(lines), queries, model, args.k)
+
+
+if __name__ == "__main__":
+    np.random.seed(0)
+    main()
@@ -0,0 +1,50 @@
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from benchmark_retrieval import HashModel, synthetic_corpus
+from benchmark_embedding_cache import MODEL_NAME
+from lore_parser import LoreEntries
+from retrievers import VectorRetriever
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold build vs. memory-mapped load of a persisted VectorRetriever.")
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--mode", default="hybrid")
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--hash-encoder", action="store_true", help="ใช้ encoder จำลองแทน SentenceTransformer")
+    args = parser.parse_args()
+
+    if args.hash_encoder:
+        model = HashModel()
+    else:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(MODEL_NAME)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        lore_path = str(Path(tmp) / "kby_lore.txt")
+        lines, _ = synthetic_corpus(args.entries, 0)
+        with open(lore_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+        store_dir = Path(lore_path + ".index")
+
+        print(f"--- Startup: {args.entries:,} entries, mode={args.mode}, index={args.index_type} ---")
+        start = time.perf_counter()
+        retriever = VectorRetriever(LoreEntries.from_file(lore_path), MODEL_NAME, mode=args.mode,
+                                    index_type=args.index_type, model=model)
+        print(f"{'build':<10} {time.perf_counter() - start:>8.3f} s")
+
+        start = time.perf_counter()
+        retriever.save(store_dir)
+        print(f"{'save':<10} {time.perf_counter() - start:>8.3f} s")
+
+        start = time.perf_counter()
+        loaded = VectorRetriever.load(store_dir, lore_path, MODEL_NAME, mode=args.mode,
+                                      index_type=args.index_type, model=model)
+        print(f"{'load':<10} {time.perf_counter() - start:>8.3f} s   (manifest valid: {loaded is not None})")
+
+
+if __name__ == "__main__":
+    main()
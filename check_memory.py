@@ -1,22 +1,23 @@
 import json
 from pathlib import Path
 
+from memory_wal import MemoryWAL
+
 quantum_memory_path = Path("data/eternal_stream.qdat")
 eternal_echoes_path = Path("data/eternal_echoes.bak")
 
-# ตรวจสอบ Quantum Memory (Insights)
-try:
-    with open(quantum_memory_path, 'r', encoding='utf-8') as f:
-        qm_data = json.load(f)
-        insights_count = len(qm_data.get("data", {}))
-        relationships_count = len(qm_data.get("relationships", {}))
-        print(f"\nQuantum Memory (Insights): {insights_count} insights, {relationships_count} relationships.")
-        # แสดง Insight บางส่วน (ตัวอย่าง 3 Insight ล่าสุด)
-        latest_insights = sorted(qm_data.get("data", {}).values(), key=lambda x: x.get("timestamp", ""), reverse=True)[:3]
-        for i, insight in enumerate(latest_insights):
-            print(f"  Insight {i+1} (ID: {insight['id'][:8]}...): '{insight['content'][:100]}...' (Impact: {insight.get('impact_score', 'N/A'):.2f})")
-except (FileNotFoundError, json.JSONDecodeError):
-    print(f"Quantum Memory file not found or corrupted at {quantum_memory_path}")
+# ตรวจสอบ Quantum Memory (Insights): snapshot อย่างเดียวไม่พอ ต้อง replay WAL ที่ยังไม่ถูก compact ด้วย
+wal = MemoryWAL(quantum_memory_path)
+qm_insights, qm_relationships = wal.recover()
+if quantum_memory_path.exists() or wal.records:
+    print(f"\nQuantum Memory (Insights): {len(qm_insights)} insights, {qm_relationships.edge_count} relationships "
+          f"({wal.records} WAL records replayed).")
+    # แสดง Insight บางส่วน (ตัวอย่าง 3 Insight ล่าสุด)
+    latest_insights = sorted(qm_insights.values(), key=lambda x: x.get("timestamp", ""), reverse=True)[:3]
+    for i, insight in enumerate(latest_insights):
+        print(f"  Insight {i+1} (ID: {insight['id'][:8]}...): '{insight['content'][:100]}...' (Impact: {insight.get('impact_score', 'N/A'):.2f})")
+else:
+    print(f"Quantum Memory file not found at {quantum_memory_path}")
 
 # ตรวจสอบ Eternal Echoes (Wisdom)
 try:
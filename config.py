@@ -1,5 +1,6 @@
 # config.py
 import os
+from typing import Dict, Optional
 from pydantic_settings import BaseSettings
 from pydantic import Field
 
@@ -8,6 +9,21 @@ os.makedirs("data", exist_ok=True)
 os.makedirs("codex", exist_ok=True)
 os.makedirs("policy", exist_ok=True)
 
+# บุคลิกของธารปัญญา AI ที่ TharnpanyaKernel ส่งเป็น system message ทุกครั้ง
+SYSTEM_PROMPT = (
+    "คุณคือธารปัญญา AI ผู้ช่วยที่ตอบคำถามจากคลังปัญญา KBY อย่างแม่นยำและสุภาพ "
+    "ตอบโดยอ้างอิงจาก Context ที่ให้มาเป็นหลัก หากข้อมูลไม่เพียงพอให้บอกตรง ๆ ว่าไม่ทราบ "
+    "และตอบเป็นภาษาเดียวกับคำถาม"
+)
+
+# ราคา (USD) ต่อ 1 token ของ prompt และ completion สำหรับคำนวณค่าใช้จ่ายใน TokenLedger
+TOKEN_COSTS = {
+    "gpt-4o": {"prompt": 5.0e-6, "completion": 15.0e-6},
+    "gpt-4o-mini": {"prompt": 0.15e-6, "completion": 0.6e-6},
+    "gpt-4-turbo": {"prompt": 10.0e-6, "completion": 30.0e-6},
+    "gpt-3.5-turbo": {"prompt": 0.5e-6, "completion": 1.5e-6},
+}
+
 class AppSettings(BaseSettings):
     """
     Manages all application settings using Pydantic for robust validation.
@@ -29,6 +45,50 @@ class AppSettings(BaseSettings):
     simulated_azure_ai_delay: float = 0.05
     simulated_ml_inference_delay: float = 0.1
 
+    # Vector index ของ VectorRetriever: "flat", "ivf_flat", "ivf_pq" หรือ "hnsw"
+    vector_index_type: str = "flat"
+    vector_index_nprobe: Optional[int] = None  # None = เลือกจากขนาดคลัง
+    vector_index_metric: str = "ip"  # "ip" = cosine บนเวกเตอร์ที่ normalize แล้ว, "l2" = ระยะแบบยุคลิด
+    hnsw_m: int = 32
+    hnsw_ef_search: int = 64
+    vector_store_enabled: bool = True  # บันทึก/โหลด index ที่สร้างแล้วจากดิสก์
+    vector_store_dir: Optional[str] = None  # None = "<lore file>.index"
+    query_cache_size: int = 1024  # จำนวนคำถามที่จำ embedding และผลลัพธ์ top-k ไว้ (0 = ปิด)
+    query_cache_ttl_seconds: float = 300.0
+    retrieval_batch_size: int = 64  # ขนาด batch ของ encoder ใน retrieve_many
+    lore_watch_interval_seconds: float = 0.0  # > 0 = ติดตามการแก้ไขไฟล์คลังปัญญาและอัปเดต index ทีละส่วน
+
+    # Semantic answer cache หน้า TharnpanyaKernel.query
+    answer_cache_enabled: bool = False  # เปิดเองเมื่อต้องการ: คำตอบที่ cache ไว้อาจล้าหลังคลังปัญญา
+    answer_cache_threshold: float = 0.95  # cosine ขั้นต่ำระหว่างคำถามใหม่กับคำถามที่เคยตอบ
+    answer_cache_max_entries: int = 512
+    answer_cache_max_age_seconds: float = 3600.0
+    answer_cache_temperature_band: float = 0.25  # temperature ที่อยู่ในช่วงเดียวกันใช้คำตอบร่วมกัน
+    answer_cache_path: Optional[str] = None  # None = เก็บในหน่วยความจำเท่านั้น; เช่น "data/answer_cache.jsonl"
+    answer_cache_with_history: bool = False  # True = ใช้ cache แม้มีประวัติการสนทนา
+
+    # งบประมาณ token ของ prompt ต่อโมเดล (system + คำถาม + context + ประวัติ)
+    prompt_token_budgets: Dict[str, int] = {"gpt-4o": 6000, "gpt-4o-mini": 6000, "gpt-4-turbo": 6000, "gpt-3.5-turbo": 3000}
+    prompt_token_budget_default: int = 4000
+    prompt_min_context_tokens: int = 64  # เหลือพื้นที่น้อยกว่านี้ก็ตัด context ทิ้งแทนการตัดให้สั้นลง
+
+    # AsyncLLMClient (TharnpanyaKernel.aquery)
+    llm_base_url: Optional[str] = None  # None = OpenAI; เช่น "http://127.0.0.1:8089/v1" สำหรับ mock_openai_server.py
+    llm_max_connections: int = 100
+    llm_max_keepalive_connections: int = 20
+    llm_timeout_seconds: float = 60.0
+    llm_max_concurrency: int = 64  # จำนวนสตรีมที่ส่งไปยัง API พร้อมกันได้สูงสุด
+    llm_coalesce_requests: bool = True  # คำขอที่เหมือนกันและเกิดพร้อมกันใช้สตรีมเดียวกัน
+
+    # service.py (ASGI)
+    service_lore_filepath: str = "kby_lore.txt"
+    service_embedding_model: str = "all-MiniLM-L6-v2"
+    service_model: str = "gpt-4o"
+    service_temperature: float = 0.7
+    service_top_k: int = 3
+    service_max_batch: int = 32
+    service_drain_timeout_seconds: float = 30.0  # เวลารอคำขอที่ค้างอยู่ให้เสร็จก่อนปิด worker
+
     data_strategy_enabled: bool = True
     responsible_ai_enabled: bool = True
     azure_ai_services_enabled: bool = True
@@ -1,79 +1,213 @@
 # /thanpanya-ai/core.py
 
+import asyncio
+import time
 import openai
 import tiktoken
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 from retrievers import VectorRetriever
-from config import SYSTEM_PROMPT, TOKEN_COSTS
+from answer_cache import SemanticAnswerCache
+from prompt_packer import CONTEXT_SEPARATOR, PackedPrompt, PromptPacker
+from token_ledger import REPLY_PRIMING_TOKENS, TokenLedger, count_message_tokens
+from llm_client import AsyncLLMClient
+from config import SYSTEM_PROMPT, TOKEN_COSTS, settings
+
+# สมุดบัญชี token ของทั้งโปรเซส — kernel ทุกตัวบันทึกลงที่เดียวกันโดยปริยาย
+LEDGER = TokenLedger(TOKEN_COSTS)
 
 class TharnpanyaKernel:
     """
     The evolved core of Tharnpanya AI. Now with conversational memory and cost tracking.
     """
-    def __init__(self, retriever: VectorRetriever):
+    def __init__(self, retriever: VectorRetriever, answer_cache: Optional[SemanticAnswerCache] = None,
+                 ledger: Optional[TokenLedger] = None, llm_client: Optional[AsyncLLMClient] = None,
+                 encoder=None):
         self.retriever = retriever
-        # Initialize token encoder for cost calculation
-        self.encoder = tiktoken.get_encoding("cl100k_base")
+        self.ledger = ledger or LEDGER
+        self._llm_client = llm_client
+        # Initialize token encoder for cost calculation (anything with encode/decode, e.g. for offline runs)
+        self.encoder = encoder or tiktoken.get_encoding("cl100k_base")
+        if answer_cache is None and settings.answer_cache_enabled:
+            answer_cache = SemanticAnswerCache(
+                threshold=settings.answer_cache_threshold,
+                max_entries=settings.answer_cache_max_entries,
+                max_age_seconds=settings.answer_cache_max_age_seconds,
+                temperature_band=settings.answer_cache_temperature_band,
+                path=settings.answer_cache_path,
+            )
+        self.answer_cache = answer_cache
+        self.packer = PromptPacker(self.encoder, settings.prompt_token_budgets,
+                                   default_budget=settings.prompt_token_budget_default,
+                                   min_context_tokens=settings.prompt_min_context_tokens)
+
+    USER_TEMPLATE = "Based on the following context, answer my question.\n\nContext:\n{contexts}\n\nQuestion: {question}"
+
+    def _pack(self, question: str, chat_history: List[Dict], contexts: List[str], model: str) -> PackedPrompt:
+        """Fits contexts and history into the model's prompt token budget."""
+        template = self.USER_TEMPLATE.format(contexts="", question="")
+        # กันที่ไว้ให้ token เริ่มคำตอบ เพื่อให้ payload ที่ส่งจริงไม่เกินงบ
+        budget = self.packer.budget_for(model) - REPLY_PRIMING_TOKENS
+        return self.packer.pack(model, SYSTEM_PROMPT, question, contexts, chat_history, template=template,
+                                budget=budget)
+
+    def _build_messages(self, question: str, packed: PackedPrompt) -> List[Dict]:
+        """Constructs the chat messages sent to the LLM from a packed prompt."""
+        user_content = self.USER_TEMPLATE.format(contexts=CONTEXT_SEPARATOR.join(packed.contexts), question=question)
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            *packed.history,
+            {"role": "user", "content": user_content},
+        ]
+
+    @property
+    def llm_client(self) -> AsyncLLMClient:
+        """Created on first async use, so it binds to the running event loop."""
+        if self._llm_client is None:
+            self._llm_client = AsyncLLMClient(
+                base_url=settings.llm_base_url,
+                max_connections=settings.llm_max_connections,
+                max_keepalive_connections=settings.llm_max_keepalive_connections,
+                timeout_seconds=settings.llm_timeout_seconds,
+                max_concurrency=settings.llm_max_concurrency,
+                coalesce=settings.llm_coalesce_requests,
+            )
+        return self._llm_client
+
+    async def aclose(self):
+        """Releases the async client's connection pool, if it was ever created."""
+        if self._llm_client is not None:
+            await self._llm_client.aclose()
+
+    def _count_delta(self, text: str) -> int:
+        return len(self.encoder.encode(text))
+
+    def _prepare(self, question: str, chat_history: List[Dict], model: str, temp: float, top_k: int) -> Dict[str, Any]:
+        """
+        Retrieval, answer-cache lookup and prompt packing shared by `query` and
+        `aquery`. Per-stage wall times (seconds) are returned under "timings".
+        """
+        # 1. Embed the question (ผลลัพธ์เก็บใน cache ของ retriever จึงไม่ encode ซ้ำตอนค้นหา)
+        start = time.perf_counter()
+        embedding = self.retriever.embed_query(question)
+        embedded = time.perf_counter()
+
+        # 1.1 Retrieve relevant contexts
+        turn = {"contexts": self.retriever.retrieve(question, top_k=top_k), "cache": None, "hit": None}
+        searched = time.perf_counter()
+        turn["timings"] = {"embed": embedded - start, "search": searched - embedded}
 
-    def _build_prompt(self, question: str, chat_history: List[Dict], contexts: List[str]) -> str:
-        """Constructs the final prompt for the LLM."""
-        context_str = "\n\n".join(contexts)
-        history_str = "\n".join([f"{msg['role']}: {msg['content']}" for msg in chat_history])
-        
-        prompt = f"""{SYSTEM_PROMPT}
+        # 1.5 Semantic answer cache (ข้ามเมื่อมีประวัติการสนทนา เว้นแต่ตั้งค่าไว้)
+        cache = self.answer_cache
+        if cache is not None and (not chat_history or settings.answer_cache_with_history):
+            turn["cache"] = cache
+            turn["embedding"] = embedding
+            turn["bucket"] = cache.bucket(model, temp, turn["contexts"])
+            turn["hit"] = cache.get(turn["embedding"], turn["bucket"])
+            if turn["hit"] is not None:
+                return turn
 
-        --- ประวัติการสนทนาก่อนหน้า ---
-        {history_str}
+        # 2. Pack question, contexts and history into the model's token budget
+        packed = self._pack(question, chat_history, turn["contexts"], model)
+        turn["packed"] = packed
+        turn["messages"] = self._build_messages(question, packed)
+        # นับ token จาก payload ที่ส่งจริง; ข้อความเดิมอยู่ใน cache ของ packer แล้ว
+        turn["prompt_tokens"] = count_message_tokens(turn["messages"], self.packer.count)
+        turn["timings"]["prompt"] = time.perf_counter() - searched
+        return turn
 
-        --- Context ที่เกี่ยวข้องจากคลังปัญญา ---
-        {context_str}
+    def _request(self, turn: Dict[str, Any], model: str, temp: float) -> Dict[str, Any]:
+        return {
+            "model": model,
+            "messages": turn["messages"],
+            "temperature": temp,
+            "stream_options": {"include_usage": True},  # chunk สุดท้ายมีจำนวน token จริงจาก API
+        }
 
-        --- คำถามล่าสุดจากผู้ใช้ ---
-        user: {question}
+    def _cached_result(self, turn: Dict[str, Any], stream, meter) -> Dict[str, Any]:
+        return {
+            "response_stream": stream,
+            "contexts": turn["contexts"],
+            "prompt_tokens": 0,
+            "usage": meter,
+            "timings": turn["timings"],
+            "cached": True,
+            "similarity": turn["hit"][1],
+        }
 
-        --- คำตอบจาก ธารปัญญา AI ---
-        assistant:"""
-        return prompt
+    def _live_result(self, turn: Dict[str, Any], stream, meter) -> Dict[str, Any]:
+        packed = turn["packed"]
+        return {
+            "response_stream": stream,
+            "contexts": packed.contexts,
+            "prompt_tokens": turn["prompt_tokens"],
+            "usage": meter,
+            "timings": turn["timings"],
+            "token_usage": packed.usage,
+            "dropped_contexts": packed.dropped_contexts,
+            "dropped_messages": packed.dropped_messages,
+            "cached": False,
+        }
 
-    def query(self, question: str, chat_history: List[Dict], model: str, temp: float, top_k: int) -> Dict[str, Any]:
+    def query(self, question: str, chat_history: List[Dict], model: str, temp: float, top_k: int,
+              session_id: str = "default") -> Dict[str, Any]:
         """
         The main query function. It now orchestrates retrieval, prompt construction,
         API call, and cost calculation.
-        """
-        # 1. Retrieve relevant contexts
-        contexts = self.retriever.retrieve(question, top_k=top_k)
 
-        # 2. Build the full prompt
-        full_prompt = self._build_prompt(question, chat_history, contexts)
+        A near-duplicate question (same contexts, model and temperature band) is
+        answered from the semantic answer cache: the stored answer is replayed as
+        a stream of the same shape and the result carries `"cached": True`.
+
+        Tokens are metered into `self.ledger` under `session_id` while the stream
+        is consumed; `result["usage"]` is the live `TurnMeter` of this turn.
+        """
+        turn = self._prepare(question, chat_history, model, temp, top_k)
+        cache = turn["cache"]
+        if turn["hit"] is not None:
+            meter = self.ledger.start_turn(session_id, model, prompt_tokens=0, cached=True)
+            stream = self.ledger.meter(cache.replay(turn["hit"][0], model), meter, self._count_delta)
+            return self._cached_result(turn, stream, meter)
 
         # 3. Call OpenAI API
         try:
             response = openai.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    *chat_history,
-                    {"role": "user", "content": f"Based on the following context, answer my question.\n\nContext:\n{'/n'.join(contexts)}\n\nQuestion: {question}"}
-                ],
-                temperature=temp,
-                stream=True # We will use streaming response
+                stream=True, # We will use streaming response
+                **self._request(turn, model, temp),
             )
-            
-            # 4. Prepare results
-            prompt_tokens = len(self.encoder.encode(full_prompt))
-            
-            return {
-                "response_stream": response,
-                "contexts": contexts,
-                "prompt_tokens": prompt_tokens,
-            }
-
         except Exception as e:
             return {"error": str(e)}
 
+        # 4. Prepare results
+        if cache is not None:
+            response = cache.record(response, turn["embedding"], turn["bucket"])
+        meter = self.ledger.start_turn(session_id, model, turn["prompt_tokens"])
+        return self._live_result(turn, self.ledger.meter(response, meter, self._count_delta), meter)
+
+    async def aquery(self, question: str, chat_history: List[Dict], model: str, temp: float, top_k: int,
+                     session_id: str = "default") -> Dict[str, Any]:
+        """
+        Async `query` on the pooled `AsyncLLMClient`: `response_stream` is an async
+        iterator, identical concurrent requests share one upstream completion, and
+        cancelling the consuming task (or closing the iterator) aborts the upstream
+        stream once nobody else is waiting on it.
+        """
+        # retrieval เป็นงาน CPU: ย้ายไป thread เพื่อไม่ให้ event loop ค้าง
+        turn = await asyncio.to_thread(self._prepare, question, chat_history, model, temp, top_k)
+        cache = turn["cache"]
+        if turn["hit"] is not None:
+            meter = self.ledger.start_turn(session_id, model, prompt_tokens=0, cached=True)
+            stream = self.ledger.ameter(cache.areplay(turn["hit"][0], model), meter, self._count_delta)
+            return self._cached_result(turn, stream, meter)
+
+        meter = self.ledger.start_turn(session_id, model, turn["prompt_tokens"])
+        # คำขอที่ไปร่วมสตรีมเดียวกับคำขออื่นได้ usage ชุดเดียวกัน: คิดเงินเฉพาะคำขอแรก
+        response = self.llm_client.stream_chat(on_coalesced=lambda: self.ledger.mark_coalesced(meter),
+                                               **self._request(turn, model, temp))
+        if cache is not None:
+            response = cache.arecord(response, turn["embedding"], turn["bucket"])
+        return self._live_result(turn, self.ledger.ameter(response, meter, self._count_delta), meter)
+
     def calculate_cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
         """Calculates the estimated cost of an API call."""
-        cost_info = TOKEN_COSTS.get(model, TOKEN_COSTS["gpt-4o"]) # Default to gpt-4o if model not found
-        cost = (prompt_tokens * cost_info["prompt"]) + (completion_tokens * cost_info["completion"])
-        return cost
\ No newline at end of file
+        return self.ledger.cost(model, prompt_tokens, completion_tokens)
\ No newline at end of file
@@ -0,0 +1,185 @@
+# /thanpanya-ai/embedding_cache.py
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+# ฟังก์ชัน encode รับรายการข้อความ และคืน matrix ขนาด (len(texts), dim)
+EncodeFn = Callable[[List[str]], np.ndarray]
+
+KEY_SIZE = 16
+
+
+def line_key(model_name: str, line: str) -> bytes:
+    """Content address of one lore line for one embedding model."""
+    h = hashlib.blake2b(digest_size=KEY_SIZE)
+    h.update(model_name.encode("utf-8"))
+    h.update(b"\0")
+    h.update(line.encode("utf-8"))
+    return h.digest()
+
+
+def _slug(model_name: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in model_name)
+
+
+class LoreEmbeddingCache:
+    """
+    Content-addressed embedding cache stored next to the lore file.
+
+    Vectors live in a memory-mapped float32 file (`<lore>.<model>.emb`), one row
+    per distinct line, with the 16-byte keys of those rows in `<lore>.<model>.keys`.
+    A small JSON manifest records the committed row count, so a crash while
+    appending never exposes half-written rows.
+    """
+
+    def __init__(self, lore_filepath: str, model_name: str, encode: EncodeFn):
+        base = Path(lore_filepath)
+        prefix = f"{base.name}.{_slug(model_name)}"
+        self.model_name = model_name
+        self.encode = encode
+        self.vectors_path = base.with_name(prefix + ".emb")
+        self.keys_path = base.with_name(prefix + ".keys")
+        self.manifest_path = base.with_name(prefix + ".json")
+
+        self.dim: Optional[int] = None
+        self.rows: Dict[bytes, int] = {}
+        self._vectors: Optional[np.memmap] = None
+        self._last_lines: Optional[List[str]] = None
+        self._last_matrix: Optional[np.ndarray] = None
+        self.stats = {"hits": 0, "encoded": 0}
+        self._open()
+
+    # --- Persistence ---
+    def _open(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if manifest.get("model_name") != self.model_name or not manifest.get("rows"):
+            return
+
+        count, dim = int(manifest["rows"]), int(manifest["dim"])
+        # ตัดข้อมูลที่เขียนค้างไว้หลัง manifest ล่าสุดทิ้ง (กรณีโปรเซสตายกลางทาง)
+        self._truncate(self.keys_path, count * KEY_SIZE)
+        self._truncate(self.vectors_path, count * dim * 4)
+
+        try:
+            with open(self.keys_path, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            raw = b""
+        if len(raw) != count * KEY_SIZE:
+            return
+        self.dim = dim
+        self.rows = {raw[i * KEY_SIZE:(i + 1) * KEY_SIZE]: i for i in range(count)}
+        self._map(count)
+
+    @staticmethod
+    def _truncate(path: Path, size: int):
+        if path.exists() and path.stat().st_size > size:
+            with open(path, "r+b") as f:
+                f.truncate(size)
+
+    def _map(self, count: int):
+        if count == 0:
+            self._vectors = None
+            return
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(count, self.dim))
+
+    def _write_manifest(self):
+        temp_path = self.manifest_path.with_suffix(".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"model_name": self.model_name, "dim": self.dim, "rows": len(self.rows)}, f)
+        temp_path.replace(self.manifest_path)
+
+    def _append(self, keys: List[bytes], vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+        start = len(self.rows)
+        with open(self.vectors_path, "ab") as f:
+            f.write(vectors.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self.keys_path, "ab") as f:
+            f.write(b"".join(keys))
+            f.flush()
+            os.fsync(f.fileno())
+        for offset, key in enumerate(keys):
+            self.rows[key] = start + offset
+        self._write_manifest()
+        self._map(len(self.rows))
+
+    # --- Public API ---
+    def embeddings_for(self, lines: List[str]) -> np.ndarray:
+        """
+        Returns the (len(lines), dim) embedding matrix, encoding only lines
+        whose (model, content) key has never been seen before.
+        """
+        # คำถามต่อเนื่องกับคลังเดิมไม่ต้อง hash ใหม่ทั้งคลัง
+        if self._last_lines is not None and lines == self._last_lines:
+            return self._last_matrix
+
+        keys = [line_key(self.model_name, line) for line in lines]
+        missing: Dict[bytes, str] = {}
+        for key, line in zip(keys, lines):
+            if key not in self.rows and key not in missing:
+                missing[key] = line
+
+        if missing:
+            new_keys = list(missing)
+            self._append(new_keys, self.encode([missing[k] for k in new_keys]))
+        self.stats["encoded"] += len(missing)
+        self.stats["hits"] += len(lines) - len(missing)
+
+        if not lines:
+            matrix = np.zeros((0, self.dim or 0), dtype=np.float32)
+        else:
+            idx = np.fromiter((self.rows[k] for k in keys), dtype=np.int64, count=len(keys))
+            if len(idx) == len(self.rows) and np.array_equal(idx, np.arange(len(idx))):
+                matrix = self._vectors  # ลำดับตรงกับไฟล์: ใช้ memmap ตรงๆ ไม่ต้องคัดลอก
+            else:
+                matrix = np.asarray(self._vectors[idx])
+
+        self._last_lines = list(lines)
+        self._last_matrix = matrix
+        return matrix
+
+    def prune(self, lines: List[str]) -> bool:
+        """
+        Called with every line of the full lore after it is (re)loaded: when
+        rows of edited or deleted lines outnumber the live ones, rewrites the
+        cache with only the cached rows of `lines`. Returns whether it compacted.
+        """
+        live = [k for k in dict.fromkeys(line_key(self.model_name, line) for line in lines) if k in self.rows]
+        if len(self.rows) <= 2 * max(len(live), 1):
+            return False
+        self.compact(live)
+        return True
+
+    def compact(self, live_keys: List[bytes]) -> np.ndarray:
+        """
+        Rewrites the cache with only `live_keys` (in that order), dropping rows
+        of lines that were edited or deleted. Returns the new matrix.
+        """
+        unique = list(dict.fromkeys(live_keys))
+        # matrix ที่จำไว้อาจอ้าง memmap ของไฟล์เดิม
+        self._last_lines = self._last_matrix = None
+        vectors = np.asarray(self._vectors[[self.rows[k] for k in unique]]) if unique else np.zeros((0, self.dim), np.float32)
+        self._vectors = None
+        self.rows = {}
+        self._write_manifest()
+        for path in (self.vectors_path, self.keys_path):
+            path.unlink(missing_ok=True)
+        if not unique:
+            return vectors
+        self._append(unique, vectors)
+        if len(unique) == len(live_keys):
+            return self._vectors
+        return np.asarray(self._vectors[[self.rows[k] for k in live_keys]])
@@ -0,0 +1,87 @@
+# /thanpanya-ai/gemini_gateway.py
+
+import asyncio
+import re
+import unicodedata
+from typing import Any, AsyncIterator, Dict
+
+from inflight import Flight, FlightTable
+from query_cache import TTLCache
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Cache key for a prompt: NFC, case-folded, whitespace collapsed (punctuation is kept)."""
+    return _SPACE_RE.sub(" ", unicodedata.normalize("NFC", prompt).casefold()).strip()
+
+
+class GeminiGateway:
+    """
+    Async front door for a `genai.GenerativeModel`-like object.
+
+    Answers are cached by normalized prompt for `cache_ttl_seconds`. `ask` and
+    `stream` share one in-flight table: an identical prompt that arrives while
+    a call is running subscribes to it and first receives the chunks already
+    produced, instead of starting its own call. When the last subscriber goes
+    away the upstream call is cancelled. At most `max_concurrency` upstream
+    calls run at once. The model only needs `generate_content(prompt)`
+    returning an object with `.text`; `generate_content_async(prompt, stream=...)`
+    is used when it exists, otherwise the blocking call runs in a worker thread.
+    """
+
+    def __init__(self, model: Any, max_concurrency: int = 8, cache_size: int = 1024,
+                 cache_ttl_seconds: float = 300.0):
+        self.model = model
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._cache = TTLCache(maxsize=cache_size, ttl_seconds=cache_ttl_seconds)
+        self.stats = {"requests": 0, "upstream_requests": 0, "coalesced": 0, "cancelled": 0}
+        self._in_flight = FlightTable(self.stats)
+
+    async def _run(self, key: str, flight: Flight, prompt: str, stream: bool):
+        async with self._semaphore:
+            self.stats["upstream_requests"] += 1
+            if stream:
+                response = await self.model.generate_content_async(prompt, stream=True)
+                async for chunk in response:
+                    if chunk.text:
+                        flight.publish(chunk.text)
+            elif hasattr(self.model, "generate_content_async"):
+                flight.publish((await self.model.generate_content_async(prompt)).text)
+            else:
+                flight.publish((await asyncio.to_thread(self.model.generate_content, prompt)).text)
+        self._cache.put(key, "".join(flight.chunks))
+
+    def _subscribe(self, key: str, prompt: str, stream: bool) -> AsyncIterator[str]:
+        return self._in_flight.subscribe(key, lambda flight: self._run(key, flight, prompt, stream))
+
+    async def ask(self, prompt: str) -> str:
+        self.stats["requests"] += 1
+        key = normalize_prompt(prompt)
+        if (text := self._cache.get(key)) is not None:
+            return text
+        return "".join([chunk async for chunk in self._subscribe(key, prompt, stream=False)])
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Yields the answer in chunks as the model streams them. A cached answer,
+        or one from a model without `generate_content_async`, is yielded whole;
+        the full answer is cached once the stream completes.
+        """
+        self.stats["requests"] += 1
+        key = normalize_prompt(prompt)
+        if (text := self._cache.get(key)) is not None:
+            yield text
+            return
+        chunks = self._subscribe(key, prompt, stream=hasattr(self.model, "generate_content_async"))
+        try:
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await chunks.aclose()
+
+    def cache_stats(self) -> Dict[str, float]:
+        return self._cache.stats()
+
+    def clear_cache(self):
+        self._cache.clear()
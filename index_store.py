@@ -0,0 +1,74 @@
+# /thanpanya-ai/index_store.py
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+STORE_VERSION = 3  # 3: BM25 เก็บ tf และความยาวเอกสาร แทนน้ำหนักที่คำนวณไว้
+MANIFEST_NAME = "manifest.json"
+
+
+def sha256_file(path: str, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def lore_fingerprint(lore_filepath: str) -> Dict:
+    stat = os.stat(lore_filepath)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256_file(lore_filepath)}
+
+
+def lore_unchanged(recorded: Dict, lore_filepath: str) -> bool:
+    """
+    True when the lore file still has the recorded content. Size and mtime are
+    checked first so the common case never reads the file; a touched-but-equal
+    file falls through to the content hash.
+    """
+    try:
+        stat = os.stat(lore_filepath)
+    except FileNotFoundError:
+        return False
+    if stat.st_size != recorded.get("size"):
+        return False
+    if stat.st_mtime_ns == recorded.get("mtime_ns"):
+        return True
+    return sha256_file(lore_filepath) == recorded.get("sha256")
+
+
+def read_manifest(store_dir: Path) -> Optional[Dict]:
+    try:
+        with open(Path(store_dir) / MANIFEST_NAME, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if manifest.get("version") != STORE_VERSION:
+        return None
+    return manifest
+
+
+def write_store(store_dir: Path, write_files: Callable[[Path], None], manifest: Dict):
+    """
+    Writes a store into a sibling temp directory and swaps it in with renames,
+    so readers only ever see a complete store. The manifest is written last.
+    Processes that still map the old files keep their pages until they reload.
+    """
+    store_dir = Path(store_dir)
+    temp_dir = store_dir.with_name(f"{store_dir.name}.tmp-{os.getpid()}")
+    old_dir = store_dir.with_name(f"{store_dir.name}.old-{os.getpid()}")
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    temp_dir.mkdir(parents=True)
+
+    write_files(temp_dir)
+    with open(temp_dir / MANIFEST_NAME, "w", encoding="utf-8") as f:
+        json.dump({"version": STORE_VERSION, **manifest}, f, indent=2)
+
+    if store_dir.exists():
+        store_dir.rename(old_dir)
+    temp_dir.rename(store_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
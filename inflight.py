@@ -0,0 +1,100 @@
+# /thanpanya-ai/inflight.py
+
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+END = object()
+
+
+class Flight:
+    """One upstream call and the queues of everyone waiting on it."""
+
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.subscribers: List[asyncio.Queue] = []
+        self.done = False
+        self.task: Optional[asyncio.Task] = None
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        for chunk in self.chunks:  # ผู้ที่มาทีหลังได้รับ chunk ที่ผ่านไปแล้วก่อน
+            queue.put_nowait(chunk)
+        self.subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.remove(queue)
+
+    def publish(self, item: Any):
+        if item is not END and not isinstance(item, BaseException):
+            self.chunks.append(item)
+        for queue in self.subscribers:
+            queue.put_nowait(item)
+
+
+class FlightTable:
+    """
+    In-flight upstream calls by key, shared by everyone asking the same thing.
+
+    `subscribe(key, produce)` starts `produce(flight)` as a task unless a call
+    with the same key is already running, then yields every chunk it publishes
+    (late subscribers first get the chunks already sent). Upstream errors are
+    raised to every subscriber. When the last subscriber goes away the task is
+    cancelled. `stats` gets "coalesced" and "cancelled" counts.
+    """
+
+    def __init__(self, stats: Dict[str, int]):
+        self._flights: Dict[str, Flight] = {}
+        self.stats = stats
+
+    def _forget(self, key: str, flight: Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    async def _run(self, key: str, flight: Flight, produce: Callable[[Flight], Awaitable[None]]):
+        try:
+            await produce(flight)
+            flight.publish(END)
+        except asyncio.CancelledError:
+            flight.publish(asyncio.CancelledError())  # ผู้ที่ยังรออยู่ (เช่นตอน aclose) ต้องไม่ค้าง
+            raise
+        except Exception as e:
+            flight.publish(e)
+        finally:
+            flight.done = True
+            self._forget(key, flight)
+
+    async def subscribe(self, key: str, produce: Callable[[Flight], Awaitable[None]],
+                        on_coalesced: Optional[Callable[[], None]] = None,
+                        coalesce: bool = True) -> AsyncIterator[Any]:
+        flight = self._flights.get(key) if coalesce else None
+        if flight is None:
+            flight = Flight()
+            if coalesce:
+                self._flights[key] = flight
+            flight.task = asyncio.create_task(self._run(key, flight, produce))
+        else:
+            self.stats["coalesced"] += 1
+            if on_coalesced is not None:
+                on_coalesced()
+
+        queue = flight.subscribe()
+        try:
+            while True:
+                item = await queue.get()
+                if item is END:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            flight.unsubscribe(queue)
+            if not flight.subscribers and not flight.done:
+                # ไม่มีใครรออยู่แล้ว: ตัดการเรียกต้นทาง ไม่ต้องจ่ายค่า token ที่ไม่มีใครอ่าน
+                flight.task.cancel()
+                self._forget(key, flight)
+                self.stats["cancelled"] += 1
+
+    def cancel_all(self):
+        for flight in list(self._flights.values()):
+            flight.task.cancel()
@@ -0,0 +1,101 @@
+# /thanpanya-ai/insight_clusters.py
+
+import random
+from typing import Dict, Iterable, List, Optional
+
+from relation_graph import RelationGraph
+
+
+class InsightClusters:
+    """
+    Union-find over insight ids, fed every relationship edge as it is added,
+    so the connected component (the pulsation cluster) of an insight is one
+    `find` away instead of a graph traversal. Union by size, path halving,
+    and each root keeps its members so a cluster can be sampled directly.
+
+    A union-find cannot split, so removed insights stay in their component
+    and callers filter them against live data; `stale` counts them so the
+    owner can rebuild from the relationship graph once they pile up.
+    """
+
+    def __init__(self, relationships: Optional[RelationGraph] = None):
+        self._parent: Dict[str, str] = {}
+        self._members: Dict[str, List[str]] = {}
+        self.stale = 0
+        if relationships is not None:
+            for source_id, edges in relationships.items():
+                self.add(source_id)
+                for target_id in edges:
+                    self.union(source_id, target_id)
+
+    def __len__(self) -> int:
+        return len(self._parent)
+
+    def __contains__(self, insight_id: str) -> bool:
+        return insight_id in self._parent
+
+    def add(self, insight_id: str):
+        if insight_id not in self._parent:
+            self._parent[insight_id] = insight_id
+            self._members[insight_id] = [insight_id]
+
+    def find(self, insight_id: str) -> str:
+        parent = self._parent
+        while parent[insight_id] != insight_id:
+            parent[insight_id] = parent[parent[insight_id]]
+            insight_id = parent[insight_id]
+        return insight_id
+
+    def union(self, a: str, b: str):
+        self.add(a)
+        self.add(b)
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return
+        if len(self._members[root_a]) < len(self._members[root_b]):
+            root_a, root_b = root_b, root_a
+        self._parent[root_b] = root_a
+        self._members[root_a].extend(self._members.pop(root_b))
+
+    def discard(self, insight_id: str):
+        if insight_id in self._parent:
+            self.stale += 1
+
+    def members(self, insight_id: str) -> List[str]:
+        """Every id in `insight_id`'s component, removed ones included; do not modify."""
+        if insight_id not in self._parent:
+            return [insight_id]
+        return self._members[self.find(insight_id)]
+
+
+class SamplePool:
+    """A set with O(1) add, discard and uniform random choice (list plus position map)."""
+
+    def __init__(self, items: Iterable[str] = ()):
+        self._items: List[str] = []
+        self._positions: Dict[str, int] = {}
+        for item in items:
+            self.add(item)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, item: str) -> bool:
+        return item in self._positions
+
+    def add(self, item: str):
+        if item not in self._positions:
+            self._positions[item] = len(self._items)
+            self._items.append(item)
+
+    def discard(self, item: str):
+        position = self._positions.pop(item, None)
+        if position is None:
+            return
+        last = self._items.pop()
+        if position < len(self._items):
+            self._items[position] = last
+            self._positions[last] = position
+
+    def choice(self, rng=random) -> str:
+        return rng.choice(self._items)
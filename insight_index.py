@@ -0,0 +1,221 @@
+# /thanpanya-ai/insight_index.py
+
+import heapq
+import re
+import sys
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Collection, Dict, List, Optional, Set, Tuple
+
+from lexical_index import normalize
+
+# trigger ที่ _infer_relationships ตรวจแบบ substring ("identity_reflection" in trigger ฯลฯ)
+WATCHED_TRIGGER_TERMS = ("identity_reflection", "idea")
+# posting ที่มี id ไม่เกินนี้เก็บเป็น list: set ขนาด 5 ใช้ ~700 ไบต์ ส่วน list ใช้ ~120
+SMALL_POSTING = 16
+# normalize() เก็บ . และ - ไว้ (ทศนิยม, คำประสม) แต่ในเนื้อหา insight มักเป็นท้ายประโยค
+_SENTENCE_PUNCT_RE = re.compile(r"[.\-]+")
+
+
+def words(text: str) -> List[str]:
+    return _SENTENCE_PUNCT_RE.sub(" ", normalize(text)).split()
+
+
+def insight_tokens(insight: Dict) -> Tuple[str, ...]:
+    """Distinct content words, interned: one string per word however many insights hold it."""
+    return tuple(dict.fromkeys(map(sys.intern, words(insight.get("content", "")))))
+
+
+def _post(postings: Dict[str, Collection[str]], key: str, insight_id: str):
+    ids = postings.get(key)
+    if ids is None:
+        postings[key] = [insight_id]
+    elif isinstance(ids, list):
+        ids.append(insight_id)
+        if len(ids) > SMALL_POSTING:
+            postings[key] = set(ids)
+    else:
+        ids.add(insight_id)
+
+
+def _unpost(postings: Dict[str, Collection[str]], key: str, insight_id: str):
+    ids = postings.get(key)
+    if ids is None:
+        return
+    if isinstance(ids, list):
+        ids.remove(insight_id)
+    else:
+        ids.discard(insight_id)
+    if not ids:
+        del postings[key]
+
+
+def timestamp_epoch(timestamp: Optional[str]) -> Optional[float]:
+    """Epoch seconds of an ISO timestamp (naive means UTC, as in DataGovernance.enforce_retention); None if unusable."""
+    if not timestamp:
+        return None
+    try:
+        parsed = datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class InsightIndex:
+    """
+    Incrementally maintained indexes over QuantumMemoryLink insights.
+
+    Keeps each insight's content words (see `words`) and inverted indexes
+    content word -> ids and trigger word -> ids, ids by exact lower-cased
+    trigger, and ids whose trigger contains one of WATCHED_TRIGGER_TERMS.
+    Finding neighbours then costs the postings of the new insight's rarer
+    words instead of a pass over every stored insight, and InsightQueryEngine
+    answers queries from the same postings (`with_word`). Postings of up to
+    SMALL_POSTING ids are lists, longer ones sets.
+    """
+
+    def __init__(self, insights: Optional[Dict[str, Dict]] = None):
+        self.tokens: Dict[str, Tuple[str, ...]] = {}
+        self.triggers: Dict[str, str] = {}
+        self._postings: Dict[str, Collection[str]] = {}
+        self._by_trigger: Dict[str, Set[str]] = defaultdict(set)
+        self._trigger_postings: Dict[str, Collection[str]] = {}
+        self._by_term: Dict[str, Set[str]] = {term: set() for term in WATCHED_TRIGGER_TERMS}
+        for insight_id, insight in (insights or {}).items():
+            self.add(insight_id, insight)
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def __contains__(self, insight_id: str) -> bool:
+        return insight_id in self.tokens
+
+    def add(self, insight_id: str, insight: Dict):
+        if insight_id in self.tokens:
+            self.remove(insight_id)
+        tokens = insight_tokens(insight)
+        trigger = insight.get("trigger", "").lower()
+        self.tokens[insight_id] = tokens
+        self.triggers[insight_id] = trigger
+        for token in tokens:
+            _post(self._postings, token, insight_id)
+        for word in set(words(trigger)):
+            _post(self._trigger_postings, word, insight_id)
+        self._by_trigger[trigger].add(insight_id)
+        for term, ids in self._by_term.items():
+            if term in trigger:
+                ids.add(insight_id)
+
+    def remove(self, insight_id: str):
+        tokens = self.tokens.pop(insight_id, None)
+        if tokens is None:
+            return
+        for token in tokens:
+            _unpost(self._postings, token, insight_id)
+        trigger = self.triggers.pop(insight_id)
+        self._discard(self._by_trigger, trigger, insight_id)
+        for word in set(words(trigger)):
+            _unpost(self._trigger_postings, word, insight_id)
+        for ids in self._by_term.values():
+            ids.discard(insight_id)
+
+    @staticmethod
+    def _discard(index: Dict[str, Set[str]], key: str, insight_id: str):
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(insight_id)
+            if not ids:
+                del index[key]
+
+    def shared_token_counts(self, insight_id: str, min_shared: int = 1) -> Dict[str, int]:
+        """
+        Other insights sharing at least `min_shared` tokens with `insight_id`, mapped to the number shared.
+
+        Tokens are visited rarest first. Such an insight must hold one of the
+        first len(tokens) - min_shared + 1 of them, so only those postings are
+        walked; the commoner tokens are only probed for the candidates found, and
+        a candidate is dropped once the tokens left cannot bring it to `min_shared`.
+        """
+        tokens = sorted(self.tokens.get(insight_id, ()), key=lambda token: len(self._postings[token]))
+        scan = len(tokens) - min_shared + 1
+        if scan <= 0:
+            return {}
+        counts: Dict[str, int] = defaultdict(int)
+        for token in tokens[:scan]:
+            for other_id in self._postings[token]:
+                counts[other_id] += 1
+        counts.pop(insight_id, None)
+        for n, token in enumerate(tokens[scan:], start=scan + 1):
+            ids = self._postings[token]
+            left = len(tokens) - n
+            for other_id in list(counts):
+                if other_id in ids:
+                    counts[other_id] += 1
+                elif counts[other_id] + left < min_shared:
+                    del counts[other_id]  # token ที่เหลือไม่พอให้ถึง min_shared แล้ว
+        return {other_id: shared for other_id, shared in counts.items() if shared >= min_shared}
+
+    def similar(self, insight_id: str, min_shared: int = 4) -> Set[str]:
+        return set(self.shared_token_counts(insight_id, min_shared))
+
+    def with_word(self, word: str) -> List[Collection[str]]:
+        """Ids whose trigger or content has `word`, as up to two postings still to be unioned."""
+        return [ids for ids in (self._trigger_postings.get(word), self._postings.get(word)) if ids]
+
+    def with_trigger(self, trigger: str) -> Set[str]:
+        return self._by_trigger.get(trigger.lower(), set())
+
+    def with_trigger_term(self, term: str) -> Set[str]:
+        """Ids whose trigger contains `term`; `term` must be one of WATCHED_TRIGGER_TERMS."""
+        return self._by_term[term]
+
+
+class ExpiryIndex:
+    """
+    Min-heap of (timestamp epoch, insight id), parsed once at insert, so
+    retention pops only what has expired instead of re-parsing every insight.
+    Insights without a usable timestamp are never expired (enforce_retention
+    keeps them too). Removed or re-added ids leave stale heap entries that
+    are skipped when they surface.
+    """
+
+    def __init__(self, insights: Optional[Dict[str, Dict]] = None):
+        self._epochs: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+        for insight_id, insight in (insights or {}).items():
+            epoch = timestamp_epoch(insight.get("timestamp"))
+            if epoch is not None:
+                self._epochs[insight_id] = epoch
+                self._heap.append((epoch, insight_id))
+        heapq.heapify(self._heap)
+
+    def __len__(self) -> int:
+        return len(self._epochs)
+
+    def add(self, insight_id: str, timestamp: Optional[str]):
+        epoch = timestamp_epoch(timestamp)
+        if epoch is None:
+            self._epochs.pop(insight_id, None)
+            return
+        if self._epochs.get(insight_id) != epoch:
+            self._epochs[insight_id] = epoch
+            heapq.heappush(self._heap, (epoch, insight_id))
+
+    def remove(self, insight_id: str):
+        self._epochs.pop(insight_id, None)
+
+    def pop_expired(self, cutoff_epoch: float) -> List[str]:
+        """Removes and returns ids whose timestamp is at or before `cutoff_epoch`, oldest first."""
+        expired = []
+        while self._heap and self._heap[0][0] <= cutoff_epoch:
+            epoch, insight_id = heapq.heappop(self._heap)
+            if self._epochs.get(insight_id) == epoch:
+                del self._epochs[insight_id]
+                expired.append(insight_id)
+        if len(self._heap) > 2 * len(self._epochs) + 1024:
+            # รายการค้างจาก remove/add ซ้ำมากเกินไป: สร้าง heap ใหม่
+            self._heap = [(epoch, insight_id) for insight_id, epoch in self._epochs.items()]
+            heapq.heapify(self._heap)
+        return expired
@@ -0,0 +1,111 @@
+# /thanpanya-ai/insight_query.py
+"""
+Query engine behind QuantumMemoryLink.retrieve_by_query.
+
+    identity OR self OR purpose     any of the three words
+    kby AND codex                   both words, anywhere in content or trigger
+    "spiral quest" OR refinement    a phrase or a word
+    Further refine: spiral codex    no operators: the whole query is one phrase
+
+Runs of bare words between operators form a phrase, AND binds tighter than
+OR, and matching is on normalized words (lexical_index.normalize, with
+sentence dots dropped) of the insight's content or trigger. Results are ranked by (impact_score,
+timestamp), newest and most impactful first.
+"""
+
+import heapq
+import re
+from typing import Dict, List, Set, Tuple
+
+from insight_index import InsightIndex, timestamp_epoch, words
+
+Phrase = Tuple[str, ...]
+
+_QUERY_TOKEN_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def parse_query(query: str) -> List[List[Phrase]]:
+    """'a b AND "c d" OR e' -> [[("a", "b"), ("c", "d")], [("e",)]]: OR of AND-groups of phrases."""
+    groups: List[List[Phrase]] = []
+    group: List[Phrase] = []
+    pending: List[str] = []
+
+    def end_phrase(text: str):
+        phrase = tuple(words(text))
+        if phrase:
+            group.append(phrase)
+
+    for quoted, bare in _QUERY_TOKEN_RE.findall(query):
+        if bare in ("AND", "OR"):
+            end_phrase(" ".join(pending))
+            pending.clear()
+            if bare == "OR" and group:
+                groups.append(group)
+                group = []
+        elif bare:
+            pending.append(bare)
+        else:
+            end_phrase(" ".join(pending))
+            pending.clear()
+            end_phrase(quoted)
+    end_phrase(" ".join(pending))
+    if group:
+        groups.append(group)
+    return groups
+
+
+class InsightQueryEngine:
+    """
+    Query side of an InsightIndex: word postings come from the index (content
+    and trigger words, kept once for relationship inference and queries
+    alike); the engine only adds each insight's precomputed rank key. A query
+    intersects postings starting from the rarest word, checks multi-word
+    phrases only on the surviving candidates, and keeps the top `limit` with a
+    bounded heap instead of sorting every match. `insights` is the store's own
+    dict, read for phrase checks; the index must be updated before `add`.
+    """
+
+    def __init__(self, index: InsightIndex, insights: Dict[str, Dict]):
+        self.index = index
+        self._insights = insights
+        self._rank: Dict[str, Tuple[float, float]] = {}
+        for insight_id, insight in insights.items():
+            self.add(insight_id, insight)
+
+    def __len__(self) -> int:
+        return len(self._rank)
+
+    def add(self, insight_id: str, insight: Dict):
+        epoch = timestamp_epoch(insight.get("timestamp"))
+        self._rank[insight_id] = (insight.get("impact_score") or 0.0, epoch if epoch is not None else float("-inf"))
+
+    def remove(self, insight_id: str):
+        self._rank.pop(insight_id, None)
+
+    def _has_phrase(self, insight_id: str, phrase: Phrase) -> bool:
+        needle = f" {' '.join(phrase)} "
+        insight = self._insights[insight_id]
+        return (needle in f" {' '.join(words(insight.get('content', '')))} "
+                or needle in f" {' '.join(words(insight.get('trigger', '')))} ")
+
+    def _match_group(self, group: List[Phrase]) -> Set[str]:
+        postings = sorted((self.index.with_word(term) for phrase in group for term in set(phrase)),
+                          key=lambda sets: sum(map(len, sets)))
+        if not postings[0]:
+            return set()
+        candidates = set().union(*postings[0])
+        for sets in postings[1:]:
+            candidates = {i for i in candidates if any(i in ids for ids in sets)}
+            if not candidates:
+                return candidates
+        for phrase in group:
+            if len(phrase) > 1:
+                candidates = {i for i in candidates if self._has_phrase(i, phrase)}
+        return candidates
+
+    def search(self, query: str, limit: int = 5) -> List[str]:
+        """Ids of the best `limit` insights matching `query`, best first."""
+        matched: Set[str] = set()
+        for group in parse_query(query):
+            matched |= self._match_group(group)
+        return heapq.nlargest(limit, matched, key=self._rank.__getitem__)
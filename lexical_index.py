@@ -0,0 +1,261 @@
+# /thanpanya-ai/lexical_index.py
+
+import json
+import math
+import re
+import unicodedata
+from collections import defaultdict
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# เครื่องหมายวรรคตอนไม่มีผลต่อความหมายของคำถาม (ห้ามใช้ \W เพราะสระ/วรรณยุกต์ไทยไม่ใช่ \w)
+_PUNCT_RE = re.compile(r"[!\"#$%&'()*+,/:;<=>?@\[\\\]^_`{|}~“”‘’«»…]+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFC", text).lower()
+    text = _PUNCT_RE.sub(" ", text)
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def char_ngrams(text: str, n: int = 3) -> Dict[str, int]:
+    """
+    Character n-grams of normalized text, padded so short words still get grams.
+    Works on Thai (no spaces between words) exactly the same as on Latin text.
+    """
+    padded = f" {text} "
+    grams: Dict[str, int] = defaultdict(int)
+    for i in range(max(len(padded) - n + 1, 1)):
+        grams[padded[i:i + n]] += 1
+    return grams
+
+
+class LexicalIndex:
+    """
+    Model-free matcher over entry questions.
+
+    An inverted index maps each character n-gram to the entries containing it,
+    weighted by IDF so the shared "คืออะไร" tail of almost every question counts
+    for little. Candidates are scored by weighted n-gram cosine (which already
+    tolerates typos such as `Qalia` → `Qualia`) and the best few are re-ranked
+    with an edit-distance ratio on the distinctive part of the question.
+    """
+
+    def __init__(self, questions: Sequence[str], n: int = 3, rerank: int = 5):
+        self.n = n
+        self.rerank = rerank
+        self.questions = [normalize(q) for q in questions]
+        self.postings: Dict[str, List[Tuple[int, float]]] = {}
+
+        doc_grams = [char_ngrams(q, n) for q in self.questions]
+        df: Dict[str, int] = defaultdict(int)
+        for grams in doc_grams:
+            for gram in grams:
+                df[gram] += 1
+        total = len(doc_grams)
+        self.idf = {gram: math.log((total + 1) / (count + 0.5)) for gram, count in df.items()}
+        self.default_idf = math.log((total + 1) / 0.5)
+
+        postings: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        self.norms: List[float] = []
+        for doc_id, grams in enumerate(doc_grams):
+            weights = {g: tf * self.idf[g] for g, tf in grams.items()}
+            self.norms.append(math.sqrt(sum(w * w for w in weights.values())) or 1.0)
+            for gram, weight in weights.items():
+                postings[gram].append((doc_id, weight))
+        self.postings = dict(postings)
+
+    def search(self, question: str, limit: int = 1) -> List[Tuple[int, float]]:
+        """Returns up to `limit` (entry index, score in [0, 1]) pairs, best first."""
+        query = normalize(question)
+        if not query:
+            return []
+
+        grams = char_ngrams(query, self.n)
+        q_weights = {g: tf * self.idf.get(g, self.default_idf) for g, tf in grams.items()}
+        q_norm = math.sqrt(sum(w * w for w in q_weights.values())) or 1.0
+
+        dots: Dict[int, float] = defaultdict(float)
+        for gram, q_weight in q_weights.items():
+            for doc_id, d_weight in self.postings.get(gram, ()):
+                dots[doc_id] += q_weight * d_weight
+        if not dots:
+            return []
+
+        candidates = sorted(((dot / (q_norm * self.norms[d]), d) for d, dot in dots.items()), reverse=True)
+        # re-rank เฉพาะผู้สมัครที่ใกล้เคียงอันดับหนึ่ง; query ถูกวิเคราะห์ครั้งเดียวเป็น seq2
+        floor = candidates[0][0] * 0.5
+        matcher = SequenceMatcher(None, autojunk=False)
+        matcher.set_seq2(query)
+        scored = []
+        for cosine, doc_id in candidates[:max(self.rerank, limit)]:
+            if cosine < floor and len(scored) >= limit:
+                break
+            matcher.set_seq1(self.questions[doc_id])
+            scored.append((doc_id, 0.7 * cosine + 0.3 * matcher.ratio()))
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:limit]
+
+    def best(self, question: str, threshold: float) -> Optional[int]:
+        hits = self.search(question, limit=1)
+        if hits and hits[0][1] >= threshold:
+            return hits[0][0]
+        return None
+
+
+# --- BM25 (sparse) index ---
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-.][a-z0-9]+)*|[\u0e00-\u0e7f]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Word tokens for Latin/digit runs (keeping names like `kby-coin` whole) and
+    character trigrams for Thai runs, which have no spaces between words.
+    """
+    tokens: List[str] = []
+    for token in _TOKEN_RE.findall(normalize(text)):
+        if "\u0e00" <= token[0] <= "\u0e7f" and len(token) > 3:
+            tokens.extend(token[i:i + 3] for i in range(len(token) - 2))
+        else:
+            tokens.append(token)
+            if "-" in token:
+                tokens.extend(part for part in token.split("-") if part)
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a document set keyed by integer doc ids.
+
+    Postings are stored CSR-style: token -> row in `offsets`, and the doc ids and
+    raw term frequencies of every token laid out back to back in two flat arrays.
+    That is also the on-disk layout, so `load` only memory-maps a few arrays.
+    Weights are derived per query from the live statistics (document count,
+    document frequency, average length), so `update` can add, replace and
+    remove documents by tokenizing only those documents.
+    """
+
+    def __init__(self, docs: Sequence[str], k1: float = 1.5, b: float = 0.75,
+                 doc_ids: Optional[Sequence[int]] = None):
+        self.k1, self.b = k1, b
+        doc_ids = np.arange(len(docs), dtype=np.int64) if doc_ids is None else np.asarray(doc_ids, dtype=np.int64)
+        self.vocab: Dict[str, int] = {}
+        rows, ids, tf, lengths = self._postings(self.vocab, doc_ids, docs)
+        doc_lengths = np.full(int(doc_ids.max()) + 1 if len(doc_ids) else 0, -1, dtype=np.float32)
+        doc_lengths[doc_ids] = lengths
+        self._set_postings(rows, ids, tf, doc_lengths)
+
+    @staticmethod
+    def _postings(vocab: Dict[str, int], doc_ids: np.ndarray, docs: Sequence[str]):
+        """(row, doc id, tf) triples for `docs`, adding unseen tokens to `vocab`, plus each doc's length."""
+        rows: List[int] = []
+        ids: List[int] = []
+        tfs: List[int] = []
+        lengths = np.empty(len(docs), dtype=np.float32)
+        for n, (doc_id, doc) in enumerate(zip(doc_ids.tolist(), docs)):
+            tokens = tokenize(doc)
+            lengths[n] = len(tokens)
+            counts: Dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                row = vocab.get(token)
+                if row is None:
+                    row = vocab[token] = len(vocab)
+                rows.append(row)
+                ids.append(doc_id)
+                tfs.append(count)
+        return (np.array(rows, dtype=np.int64), np.array(ids, dtype=np.int64),
+                np.array(tfs, dtype=np.float32), lengths)
+
+    def _set_postings(self, rows: np.ndarray, ids: np.ndarray, tf: np.ndarray, doc_lengths: np.ndarray):
+        order = np.argsort(rows, kind="stable")
+        self.offsets = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(self.vocab)), out=self.offsets[1:])
+        self.ids = ids[order]
+        self.tf = tf[order]
+        self.doc_lengths = doc_lengths  # ตามลำดับ doc id; -1 = ไม่มีเอกสารนี้
+        self._compute_stats()
+
+    def _compute_stats(self):
+        live = self.doc_lengths >= 0
+        self.size = int(live.sum())
+        avgdl = float(self.doc_lengths[live].mean()) if self.size else 0.0
+        # ส่วนของตัวหารที่ขึ้นกับความยาวเอกสาร คำนวณครั้งเดียวต่อ index
+        self._norm = self.k1 * (1 - self.b + self.b * np.maximum(self.doc_lengths, 0) / (avgdl or 1.0))
+
+    def update(self, removed_ids: Sequence[int], doc_ids: Sequence[int], docs: Sequence[str]) -> "BM25Index":
+        """
+        A new index without `removed_ids` and with `docs` under `doc_ids` (replacing
+        any existing document with the same id). This index is left untouched.
+        """
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        dropped = np.concatenate([np.asarray(removed_ids, dtype=np.int64), doc_ids])
+        keep = ~np.isin(self.ids, dropped)
+        old_rows = np.repeat(np.arange(len(self.offsets) - 1, dtype=np.int64), np.diff(self.offsets))[keep]
+
+        index = BM25Index.__new__(BM25Index)
+        index.k1, index.b = self.k1, self.b
+        index.vocab = dict(self.vocab)
+        rows, ids, tf, lengths = self._postings(index.vocab, doc_ids, docs)
+        id_space = max(len(self.doc_lengths), int(doc_ids.max()) + 1 if len(doc_ids) else 0)
+        doc_lengths = np.full(id_space, -1, dtype=np.float32)
+        doc_lengths[:len(self.doc_lengths)] = self.doc_lengths
+        doc_lengths[dropped[dropped < len(self.doc_lengths)]] = -1
+        doc_lengths[doc_ids] = lengths
+        index._set_postings(np.concatenate([old_rows, rows]), np.concatenate([self.ids[keep], ids]),
+                            np.concatenate([self.tf[keep], tf]), doc_lengths)
+        return index
+
+    def search(self, query: str, limit: int) -> List[Tuple[int, float]]:
+        """Returns up to `limit` (doc id, BM25 score) pairs with a positive score, best first."""
+        rows = [self.vocab[t] for t in set(tokenize(query)) if t in self.vocab]
+        if not rows or limit <= 0:
+            return []
+        k1 = self.k1
+        scores = np.zeros(len(self.doc_lengths), dtype=np.float32)
+        for row in rows:
+            start, end = self.offsets[row], self.offsets[row + 1]
+            df = int(end - start)
+            if df == 0:
+                continue
+            ids, tf = self.ids[start:end], self.tf[start:end]
+            idf = math.log(1 + (self.size - df + 0.5) / (df + 0.5))
+            scores[ids] += idf * tf * (k1 + 1) / (tf + self._norm[ids])
+        limit = min(limit, len(scores))
+        if limit == 0:
+            return []
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top if scores[i] > 0]
+
+    def save(self, directory: Path):
+        """Writes the CSR arrays as .npy files plus the token list, for `load` to memory-map."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / "bm25_offsets.npy", self.offsets)
+        np.save(directory / "bm25_ids.npy", self.ids)
+        np.save(directory / "bm25_tf.npy", self.tf)
+        np.save(directory / "bm25_doc_lengths.npy", self.doc_lengths)
+        with open(directory / "bm25_tokens.json", "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "tokens": list(self.vocab)}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory: Path) -> "BM25Index":
+        directory = Path(directory)
+        with open(directory / "bm25_tokens.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        index = cls.__new__(cls)
+        index.k1, index.b = meta["k1"], meta["b"]
+        index.vocab = {token: row for row, token in enumerate(meta["tokens"])}
+        index.offsets = np.load(directory / "bm25_offsets.npy")
+        # view เป็น ndarray ธรรมดา (ยังอยู่บน mmap) เพื่อให้การ slice ต่อ query ไม่ต้องสร้าง memmap object
+        index.ids = np.load(directory / "bm25_ids.npy", mmap_mode="r").view(np.ndarray)
+        index.tf = np.load(directory / "bm25_tf.npy", mmap_mode="r").view(np.ndarray)
+        index.doc_lengths = np.load(directory / "bm25_doc_lengths.npy")
+        index._compute_stats()
+        return index
@@ -0,0 +1,77 @@
+# /thanpanya-ai/llm_client.py
+
+import asyncio
+import hashlib
+import json
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+import openai
+
+try:  # openai รุ่นใหม่ใช้ httpx2 แทน httpx
+    import httpx2 as httpx
+except ImportError:
+    import httpx
+
+from inflight import Flight, FlightTable
+
+
+def request_key(request: Dict[str, Any]) -> str:
+    """Identity of a completion request; identical requests share one upstream call."""
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class AsyncLLMClient:
+    """
+    Async OpenAI-compatible chat client on one pooled HTTP connection set.
+
+    `stream_chat` coalesces identical concurrent requests: the first caller
+    starts the upstream stream and every identical caller that arrives while it
+    is running subscribes to the same chunks (including those already sent)
+    and is reported through `on_coalesced`, so usage is billed only once.
+    When the last subscriber goes away — its task is cancelled or it closes the
+    iterator — the upstream stream is cancelled and its connection released.
+    `max_concurrency` caps simultaneous upstream streams.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 max_connections: int = 100, max_keepalive_connections: int = 20,
+                 timeout_seconds: float = 60.0, max_concurrency: int = 64, coalesce: bool = True):
+        self._http = openai.DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections),
+            timeout=httpx.Timeout(timeout_seconds, connect=10.0),
+        )
+        self._client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=self._http)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.coalesce = coalesce
+        self.stats = {"requests": 0, "upstream_requests": 0, "coalesced": 0, "cancelled": 0}
+        self._flights = FlightTable(self.stats)
+
+    async def _run(self, flight: Flight, request: Dict[str, Any]):
+        async with self._semaphore:
+            self.stats["upstream_requests"] += 1
+            stream = await self._client.chat.completions.create(stream=True, **request)
+            try:
+                async for chunk in stream:
+                    flight.publish(chunk)
+            finally:
+                await stream.close()  # ยกเลิกแล้วต้องปิด response เพื่อคืน connection ให้ pool
+
+    async def stream_chat(self, on_coalesced: Optional[Callable[[], None]] = None, **request) -> AsyncIterator[Any]:
+        """
+        Streams `chat.completions.create(stream=True, **request)` chunks.
+        Upstream errors are raised to every subscriber. `on_coalesced` is called
+        if this call joins a stream started by an identical earlier request.
+        """
+        self.stats["requests"] += 1
+        chunks = self._flights.subscribe(request_key(request), lambda flight: self._run(flight, request),
+                                         on_coalesced=on_coalesced, coalesce=self.coalesce)
+        try:
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await chunks.aclose()
+
+    async def aclose(self):
+        self._flights.cancel_all()
+        await self._client.close()
@@ -0,0 +1,306 @@
+# /thanpanya-ai/lore_parser.py
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import weakref
+from array import array
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+ENTRY_MARKER = "[ENTRY]"
+QUESTION_PREFIX = "QUESTION:"
+ANSWER_PREFIX = "ANSWER:"
+
+# (question, answer, answer_byte_start, answer_byte_end) — offsets are -1 for in-memory text
+RawEntry = Tuple[str, str, int, int]
+
+
+def _parse(lines: Iterable[Tuple[bytes, int]], keep_answers: bool) -> Iterator[RawEntry]:
+    """
+    Core state machine shared by the file and in-memory parsers.
+
+    `lines` yields (raw line, byte offset of that line). A line outside any
+    [ENTRY] block becomes its own entry (question == answer == the line), so
+    plain line-per-chunk files keep working.
+    """
+    in_entry = False
+    field = None
+    question: List[str] = []
+    answer: List[str] = []
+    answer_start = answer_end = -1
+
+    def flush():
+        if not question:
+            return None  # entry ที่ไม่มี QUESTION ค้นหาไม่ได้
+        a = "\n".join(answer) if keep_answers else ""
+        return ("\n".join(question), a, answer_start, answer_end)
+
+    for raw, offset in lines:
+        text = raw.decode("utf-8").strip()
+        if not text:
+            continue
+        if text == ENTRY_MARKER:
+            entry = flush()
+            if entry:
+                yield entry
+            in_entry, field = True, None
+            question, answer = [], []
+            answer_start = answer_end = -1
+            continue
+        if not in_entry:
+            line_end = offset + len(raw.rstrip(b"\r\n"))
+            yield (text, text, offset, line_end)
+            continue
+
+        if text.startswith(QUESTION_PREFIX):
+            field = "question"
+            text = text[len(QUESTION_PREFIX):].strip()
+        elif text.startswith(ANSWER_PREFIX):
+            field = "answer"
+            prefix_at = raw.find(ANSWER_PREFIX.encode("utf-8"))
+            answer_start = offset + prefix_at + len(ANSWER_PREFIX)
+            text = text[len(ANSWER_PREFIX):].strip()
+
+        if field == "question":
+            if text:
+                question.append(text)
+        elif field == "answer":
+            answer_end = offset + len(raw.rstrip(b"\r\n"))
+            if text and keep_answers:
+                answer.append(text)
+
+    entry = flush()
+    if entry:
+        yield entry
+
+
+def _stream_lines(f: BinaryIO) -> Iterator[Tuple[bytes, int]]:
+    offset = 0
+    for raw in f:
+        yield raw, offset
+        offset += len(raw)
+
+
+def _file_lines(filepath: str) -> Iterator[Tuple[bytes, int]]:
+    with open(filepath, "rb") as f:
+        yield from _stream_lines(f)
+
+
+def iter_lore_entries(filepath: str) -> Iterator[Tuple[str, str]]:
+    """Streams (question, answer) pairs from a lore file in constant memory."""
+    for question, answer, _, _ in _parse(_file_lines(filepath), keep_answers=True):
+        yield question, answer
+
+
+# ioctl ของ Linux ที่ clone ไฟล์แบบ copy-on-write (btrfs, XFS): ไม่คัดลอกข้อมูลจริง
+FICLONE = 0x40049409
+
+
+def _reflink(f: BinaryIO, filepath: str) -> Optional[BinaryIO]:
+    """A copy-on-write clone of open file `f` in an unnamed temp file, or None where unsupported."""
+    try:
+        import fcntl
+        clone = tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(filepath)))
+    except (ImportError, OSError):
+        return None
+    try:
+        fcntl.ioctl(clone.fileno(), FICLONE, f.fileno())
+    except OSError:
+        clone.close()
+        return None
+    return clone
+
+
+class LoreSource:
+    """
+    The version of a lore file that answer offsets point into, read in place.
+
+    The file is held open rather than copied: an editor that saves by writing a
+    new file and renaming it over the old one leaves this handle on the old
+    version. Where the filesystem supports reflinks the handle is a copy-on-write
+    clone instead, which in-place edits cannot reach either, at no copy cost.
+    `fingerprint` is in the form of `index_store.lore_fingerprint`; `changed()`
+    detects an in-place edit of the held file, after which offsets are stale.
+    """
+
+    def __init__(self, filepath: str, fingerprint: Optional[Dict] = None):
+        self.filepath = filepath
+        f = open(filepath, "rb")
+        stat = os.fstat(f.fileno())
+        clone = _reflink(f, filepath)
+        if clone is not None:
+            f.close()
+        self._file = clone or f
+        self._snapshot = clone is not None
+        weakref.finalize(self, self._file.close)
+        self.fingerprint: Dict = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": None}
+        if fingerprint and (fingerprint.get("size"), fingerprint.get("mtime_ns")) == (stat.st_size, stat.st_mtime_ns):
+            self.fingerprint["sha256"] = fingerprint.get("sha256")  # ไฟล์รุ่นเดียวกับที่บันทึกไว้: ไม่ต้อง hash ใหม่
+        self._lock = threading.Lock()
+        self._current: Optional[Tuple["LoreEntries", Dict[str, int]]] = None
+
+    def lines(self) -> Iterator[Tuple[bytes, int]]:
+        """Streams the file line by line, hashing it on the way (one pass for parse and fingerprint)."""
+        digest = hashlib.sha256()
+        self._file.seek(0)
+        for raw, offset in _stream_lines(self._file):
+            digest.update(raw)
+            yield raw, offset
+        self.fingerprint["sha256"] = digest.hexdigest()
+
+    def ensure_sha256(self, block_size: int = 1 << 20) -> str:
+        if self.fingerprint["sha256"] is None:
+            digest = hashlib.sha256()
+            for start in range(0, self.fingerprint["size"], block_size):
+                digest.update(self.read(start, min(start + block_size, self.fingerprint["size"])))
+            self.fingerprint["sha256"] = digest.hexdigest()
+        return self.fingerprint["sha256"]
+
+    def changed(self) -> bool:
+        """True once the held file was modified in place since it was opened."""
+        if self._snapshot:
+            return False
+        stat = os.fstat(self._file.fileno())
+        return (stat.st_size, stat.st_mtime_ns) != (self.fingerprint["size"], self.fingerprint["mtime_ns"])
+
+    def read(self, start: int, end: int) -> bytes:
+        return os.pread(self._file.fileno(), end - start, start)
+
+    def current_answer(self, question: str) -> str:
+        """
+        The answer to `question` in the file as it is now, for tables whose held
+        file was edited in place (until the owner re-parses it); "" if it is gone.
+        """
+        with self._lock:
+            if self._current is None or self._current[0].source.changed():
+                entries = LoreEntries.from_file(self.filepath)
+                positions: Dict[str, int] = {}
+                for i, q in enumerate(entries.questions):
+                    positions.setdefault(q, i)
+                self._current = (entries, positions)
+            entries, positions = self._current
+        position = positions.get(question)
+        return entries.answer(position) if position is not None else ""
+
+
+class LoreEntries:
+    """
+    Compact entry table for the KBY lore: parallel arrays instead of per-line dicts.
+
+    Only the QUESTION texts (what gets embedded and indexed) are kept as strings.
+    For file-backed tables the answers stay on disk as (start, end) byte offsets
+    into the file (through a `LoreSource`) and are read on demand, so multi-GB
+    dumps load in memory proportional to the questions alone, with no copy. Answers set through
+    `upserted` are kept in memory on top of the offsets (None = read the copy).
+    """
+
+    def __init__(self, questions: List[str], answer_starts: array, answer_ends: array,
+                 answers: Optional[List[Optional[str]]] = None, filepath: Optional[str] = None,
+                 source: Optional[LoreSource] = None):
+        self.questions = questions
+        self.answer_starts = answer_starts
+        self.answer_ends = answer_ends
+        self._answers = answers
+        self.filepath = filepath
+        self.source = source
+
+    @property
+    def fingerprint(self) -> Optional[Dict]:
+        """Fingerprint of the lore file version the offsets refer to, or None for in-memory tables."""
+        return self.source.fingerprint if self.source is not None else None
+
+    @classmethod
+    def from_file(cls, filepath: str) -> "LoreEntries":
+        source = LoreSource(filepath)
+        questions: List[str] = []
+        starts, ends = array("q"), array("q")
+        for question, _, start, end in _parse(source.lines(), keep_answers=False):
+            questions.append(question)
+            starts.append(start)
+            ends.append(end)
+        return cls(questions, starts, ends, filepath=filepath, source=source)
+
+    @classmethod
+    def from_lines(cls, lines: Iterable[str]) -> "LoreEntries":
+        questions: List[str] = []
+        answers: List[str] = []
+        for question, answer, _, _ in _parse(((line.encode("utf-8"), -1) for line in lines), keep_answers=True):
+            questions.append(question)
+            answers.append(answer)
+        empty = array("q", [-1]) * len(questions)
+        return cls(questions, empty, array("q", empty), answers=answers)
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def answer(self, i: int) -> str:
+        if self._answers is not None and self._answers[i] is not None:
+            return self._answers[i]
+        start, end = self.answer_starts[i], self.answer_ends[i]
+        if start < 0:
+            return ""
+        if self.source.changed():
+            return self.source.current_answer(self.questions[i])
+        raw = self.source.read(start, end).decode("utf-8", errors="replace")
+        return "\n".join(line.strip() for line in raw.splitlines() if line.strip())
+
+    def answers(self, indices: Iterable[int]) -> List[str]:
+        return [self.answer(int(i)) for i in indices]
+
+    # --- Copy-on-write edits (offsets and the file handle are shared, not re-read) ---
+    def upserted(self, answers: Dict[str, str]) -> "LoreEntries":
+        """A new table where every entry whose question is in `answers` gets that answer; new questions are appended."""
+        known = set(self.questions)
+        added = [q for q in answers if q not in known]
+        current = self._answers if self._answers is not None else [None] * len(self)
+        merged = [answers.get(q, a) for q, a in zip(self.questions, current)] + [answers[q] for q in added]
+        missing = array("q", [-1]) * len(added)
+        return LoreEntries(self.questions + added, self.answer_starts + missing, self.answer_ends + missing,
+                           answers=merged, filepath=self.filepath, source=self.source)
+
+    def with_source(self, source: LoreSource) -> "LoreEntries":
+        """This table reading answers through `source`, a handle on a file with the same content."""
+        return LoreEntries(self.questions, self.answer_starts, self.answer_ends, answers=self._answers,
+                           filepath=self.filepath, source=source)
+
+    def subset(self, keep: Sequence[int]) -> "LoreEntries":
+        """A new table with only the entries at positions `keep`, in that order."""
+        answers = [self._answers[i] for i in keep] if self._answers is not None else None
+        return LoreEntries([self.questions[i] for i in keep], array("q", (self.answer_starts[i] for i in keep)),
+                           array("q", (self.answer_ends[i] for i in keep)), answers=answers,
+                           filepath=self.filepath, source=self.source)
+
+    def save(self, directory: Path):
+        """Persists the table (not the lore file itself) for `load`."""
+        directory = Path(directory)
+        with open(directory / "questions.json", "w", encoding="utf-8") as f:
+            json.dump({"questions": self.questions, "answers": self._answers}, f, ensure_ascii=False)
+        with open(directory / "answer_offsets.bin", "wb") as f:
+            self.answer_starts.tofile(f)
+            self.answer_ends.tofile(f)
+
+    @classmethod
+    def load(cls, directory: Path, filepath: Optional[str] = None,
+             fingerprint: Optional[Dict] = None) -> "LoreEntries":
+        """
+        Loads a saved table whose answer offsets refer to `filepath`. `fingerprint`
+        is the version it was saved from; when the opened file still has that size
+        and mtime it is trusted, otherwise the file is hashed. Callers compare
+        `fingerprint` afterwards.
+        """
+        directory = Path(directory)
+        with open(directory / "questions.json", "r", encoding="utf-8") as f:
+            data = json.load(f)
+        count = len(data["questions"])
+        starts, ends = array("q"), array("q")
+        with open(directory / "answer_offsets.bin", "rb") as f:
+            starts.fromfile(f, count)
+            ends.fromfile(f, count)
+        source = None
+        if filepath is not None:
+            source = LoreSource(filepath, fingerprint)
+            source.ensure_sha256()
+        return cls(data["questions"], starts, ends, answers=data["answers"], filepath=filepath, source=source)
@@ -1,20 +1,105 @@
-from typing import List, Dict
-from sentence_transformers import SentenceTransformer, util
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Iterator, Sequence, Union
+import numpy as np
 import openai
 
-# === โหลด BERT Model ===
-embedder = SentenceTransformer('all-MiniLM-L6-v2')
+from embedding_cache import LoreEmbeddingCache
+from lore_parser import LoreEntries
+from lexical_index import LexicalIndex
 
-def load_and_process_lore(filepath: str) -> List[str]:
-    with open(filepath, "r", encoding="utf-8") as f:
-        return [line.strip() for line in f.readlines() if line.strip()]
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+DEFAULT_LORE_FILEPATH = "kby_lore.txt"
+FALLBACK_ANSWER = "ขออภัย ข้ายังไม่พบข้อมูลที่เกี่ยวข้องในตำนาน KBY"
+LEXICAL_MATCH_THRESHOLD = 0.45
 
-def find_top_k_contexts(question: str, lore: List[str], k=3) -> List[str]:
-    question_emb = embedder.encode(question, convert_to_tensor=True)
-    lore_embs = embedder.encode(lore, convert_to_tensor=True)
-    sim_scores = util.pytorch_cos_sim(question_emb, lore_embs)[0]
-    top_k_idx = sim_scores.topk(k=k).indices
-    return [lore[i] for i in top_k_idx]
+# === โหลด BERT Model (โหลดเมื่อต้องใช้ครั้งแรก) ===
+_embedder = None
+_lore_caches: Dict[str, LoreEmbeddingCache] = {}
+
+def get_embedder():
+    global _embedder
+    if _embedder is None:
+        from sentence_transformers import SentenceTransformer
+        _embedder = SentenceTransformer(EMBEDDING_MODEL)
+    return _embedder
+
+def _encode(texts: List[str]) -> np.ndarray:
+    return get_embedder().encode(texts, convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=False)
+
+def get_lore_cache(filepath: str = DEFAULT_LORE_FILEPATH) -> LoreEmbeddingCache:
+    """Embedding cache stored next to the lore file; only unseen lines are ever encoded."""
+    cache = _lore_caches.get(filepath)
+    if cache is None:
+        cache = _lore_caches[filepath] = LoreEmbeddingCache(filepath, EMBEDDING_MODEL, _encode)
+    return cache
+
+def load_and_process_lore(filepath: str) -> LoreEntries:
+    """Parses the lore file into [ENTRY] records; only QUESTION texts are embedded and indexed."""
+    entries = LoreEntries.from_file(filepath)
+    # โหลดคลังทั้งก้อน: จังหวะเดียวที่รู้ว่าบรรทัดไหนไม่ใช้แล้ว
+    get_lore_cache(filepath).prune(entries.questions)
+    return entries
+
+def _as_entries(lore: Union[LoreEntries, List[str]]) -> LoreEntries:
+    return lore if isinstance(lore, LoreEntries) else LoreEntries.from_lines(lore)
+
+# === Lexical engine (ไม่ใช้โมเดล) ===
+_lexical_indexes: "weakref.WeakKeyDictionary[LoreEntries, LexicalIndex]" = weakref.WeakKeyDictionary()
+
+def get_lexical_index(lore: LoreEntries) -> LexicalIndex:
+    index = _lexical_indexes.get(lore)
+    if index is None:
+        index = _lexical_indexes[lore] = LexicalIndex(lore.questions)
+    return index
+
+# embedding ของคลังที่ไม่มีไฟล์ (เช่น list ของบรรทัด) เก็บในหน่วยความจำตามอายุของตาราง
+_memory_embeddings: "weakref.WeakKeyDictionary[LoreEntries, np.ndarray]" = weakref.WeakKeyDictionary()
+
+def lore_embeddings(lore: LoreEntries) -> np.ndarray:
+    """QUESTION embeddings of `lore`, from the cache next to its own file, or in memory for in-memory tables."""
+    if lore.filepath:
+        return get_lore_cache(lore.filepath).embeddings_for(lore.questions)
+    embeddings = _memory_embeddings.get(lore)
+    if embeddings is None:
+        embeddings = _memory_embeddings[lore] = _encode(lore.questions)
+    return embeddings
+
+def find_answer_in_lore(question: str, lore: Union[LoreEntries, List[str]], threshold: float = LEXICAL_MATCH_THRESHOLD) -> str:
+    """
+    Answers from the lore without any model: character n-gram lookup over the
+    entry questions, tolerant of typos and of Thai text without word spaces.
+    Returns FALLBACK_ANSWER when no entry scores at least `threshold`.
+    """
+    entries = _as_entries(lore)
+    best = get_lexical_index(entries).best(question, threshold)
+    if best is None:
+        return FALLBACK_ANSWER
+    return entries.answer(best)
+
+def _top_k_rows(sim_scores: np.ndarray, k: int) -> np.ndarray:
+    """Row-wise top-k indices of a (questions, lore) score matrix, best first."""
+    k = min(k, sim_scores.shape[1])
+    part = np.argpartition(-sim_scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(sim_scores, part, axis=1), axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+def find_top_k_contexts(question: str, lore: Union[LoreEntries, List[str]], k=3) -> List[str]:
+    return find_top_k_contexts_batch([question], lore, k=k)[0]
+
+def find_top_k_contexts_batch(questions: Sequence[str], lore: Union[LoreEntries, List[str]], k=3) -> List[List[str]]:
+    """
+    Encodes all questions in one embedder call and scores them against the entry
+    QUESTION embeddings with one matrix multiply; returns the matching ANSWERs.
+    """
+    entries = _as_entries(lore)
+    if not len(entries) or k <= 0:
+        return [[] for _ in questions]
+    lore_embs = lore_embeddings(entries)
+    question_embs = _encode(list(questions))
+    top_k_idx = _top_k_rows(question_embs @ lore_embs.T, k)
+    return [entries.answers(row) for row in top_k_idx]
 
 def gpt_summarize(question: str, context: str, model="gpt-4", temperature=0.4) -> str:
     response = openai.ChatCompletion.create(
@@ -27,7 +112,7 @@ def gpt_summarize(question: str, context: str, model="gpt-4", temperature=0.4) -
     )
     return response["choices"][0]["message"]["content"]
 
-def advanced_hybrid_answer(question: str, lore: List[str], model="gpt-4", temperature=0.4) -> Dict:
+def advanced_hybrid_answer(question: str, lore: Union[LoreEntries, List[str]], model="gpt-4", temperature=0.4) -> Dict:
     contexts = find_top_k_contexts(question, lore, k=3)
     joined_context = "\n".join(contexts)
     answer = gpt_summarize(question, joined_context, model=model, temperature=temperature)
@@ -37,3 +122,49 @@ def advanced_hybrid_answer(question: str, lore: List[str], model="gpt-4", temper
         "model_used": model,
         "raw_context": joined_context
     }
+
+def _timed_summarize(question: str, contexts: List[str], model: str, temperature: float, batch_start: float) -> Dict:
+    joined_context = "\n".join(contexts)
+    started = time.perf_counter()
+    result = {"contexts": contexts, "model_used": model, "raw_context": joined_context}
+    try:
+        result["answer"] = gpt_summarize(question, joined_context, model=model, temperature=temperature)
+    except Exception as e:
+        result["error"] = str(e)
+    finished = time.perf_counter()
+    result["latency_s"] = finished - started
+    result["completed_at_s"] = finished - batch_start
+    return result
+
+def advanced_hybrid_answer_batch(questions: Sequence[str], lore: Union[LoreEntries, List[str]], model="gpt-4", temperature=0.4,
+                                 k=3, max_in_flight=8) -> Iterator[Dict]:
+    """
+    Batched version of `advanced_hybrid_answer` for FAQ regeneration and evaluation runs.
+
+    Retrieval for every question is one encode call plus one matrix multiply; the
+    summarization calls then run concurrently with at most `max_in_flight` requests
+    open at once. Results are yielded in input order as soon as each is ready, each
+    with its own `latency_s` (LLM call) and `completed_at_s` (since batch start).
+    A failed call yields a result with an `error` key instead of aborting the batch.
+    """
+    questions = list(questions)
+    if not questions:
+        return
+    batch_start = time.perf_counter()
+    all_contexts = find_top_k_contexts_batch(questions, _as_entries(lore), k=k)
+    retrieval_s = time.perf_counter() - batch_start
+
+    pool = ThreadPoolExecutor(max_workers=max(1, max_in_flight))
+    try:
+        futures = [
+            pool.submit(_timed_summarize, question, contexts, model, temperature, batch_start)
+            for question, contexts in zip(questions, all_contexts)
+        ]
+        for question, future in zip(questions, futures):
+            result = future.result()
+            result["question"] = question
+            result["retrieval_s"] = retrieval_s
+            yield result
+    finally:
+        # ถ้าผู้เรียกหยุดอ่านกลางทาง ไม่ต้องส่งคำถามที่เหลือไปยัง API
+        pool.shutdown(wait=False, cancel_futures=True)
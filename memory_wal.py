@@ -0,0 +1,183 @@
+# /thanpanya-ai/memory_wal.py
+"""
+Snapshot + append-only write-ahead log for QuantumMemoryLink.
+
+    eternal_stream.qdat          snapshot: {"wal_seq": n, "data": {...}, "relationships": <RelationGraph CSR>}
+    eternal_stream.qdat.wal.<n>  JSONL mutations made after that snapshot
+
+Mutations are `put` (insight), `rel` (relationship, mirrored like
+QuantumMemoryLink.add_relationship) and `del` (insight plus its edges).
+Recovery loads the snapshot and replays every segment numbered `wal_seq` or
+later. Compaction rotates to a new segment, copies the in-memory state and
+writes the snapshot in a background thread; older segments are deleted only
+after the new snapshot has replaced the old one, so a crash at any point
+leaves a snapshot plus the segments needed to rebuild the state.
+"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from relation_graph import RelationGraph, json_default
+
+logger = logging.getLogger(__name__)
+
+Data = Dict[str, Dict]
+
+
+def apply_record(data: Data, relationships: RelationGraph, record: Dict):
+    """Applies one WAL mutation; used for live updates and replay alike so both stay identical."""
+    op = record["op"]
+    if op == "put":
+        data[record["id"]] = record["insight"]
+    elif op == "rel":
+        source_id, target_id, relationship_type = record["s"], record["t"], record["r"]
+        relationships.set_edge(source_id, target_id, relationship_type)
+        if not relationship_type.startswith("reverse_"):
+            relationships.set_edge(target_id, source_id, f"reverse_{relationship_type}")
+    elif op == "del":
+        insight_id = record["id"]
+        data.pop(insight_id, None)
+        relationships.remove_node(insight_id)
+    else:
+        raise ValueError(f"Unknown WAL op: {op!r}")
+
+
+class MemoryWAL:
+    """
+    Group-committed WAL: records are written as they arrive and fsynced once
+    every `group_size` records (and on `flush`). A crash can lose at most the
+    last unsynced group.
+    """
+
+    def __init__(self, snapshot_path: Path, group_size: int = 64, compact_min_records: int = 10_000):
+        self.snapshot_path = Path(snapshot_path)
+        self.group_size = max(1, group_size)
+        self.compact_min_records = compact_min_records
+        self.seq = 0
+        self.records = 0  # ใน segment ปัจจุบันและ segment ที่ยังไม่ถูก compact
+        self._unsynced = 0
+        self._file = None
+        self._compaction: Optional[threading.Thread] = None
+
+    def _segment(self, seq: int) -> Path:
+        return self.snapshot_path.with_name(f"{self.snapshot_path.name}.wal.{seq}")
+
+    def _segments(self) -> List[Tuple[int, Path]]:
+        prefix = f"{self.snapshot_path.name}.wal."
+        found = []
+        for path in self.snapshot_path.parent.glob(prefix + "*"):
+            suffix = path.name[len(prefix):]
+            if suffix.isdigit():
+                found.append((int(suffix), path))
+        return sorted(found)
+
+    # --- Recovery ---
+    def recover(self) -> Tuple[Data, RelationGraph]:
+        """Loads the snapshot and replays the WAL tail; appends continue in the newest segment."""
+        data: Data = {}
+        relationships = RelationGraph()
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            data = snapshot.get("data", {})
+            relationships = RelationGraph.from_snapshot(snapshot.get("relationships", {}))
+            self.seq = snapshot.get("wal_seq", 0)
+        except FileNotFoundError:
+            logger.warning("QuantumMemoryLink snapshot not found. Starting fresh.")
+        except json.JSONDecodeError as e:
+            logger.error(f"Error decoding QuantumMemoryLink snapshot: {e}. Starting from the WAL only.")
+
+        replayed = 0
+        for seq, path in self._segments():
+            if seq < self.seq:
+                path.unlink(missing_ok=True)  # ถูกรวมเข้า snapshot แล้ว แต่ลบไม่ทันก่อนปิดโปรแกรม
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # บรรทัดสุดท้ายอาจเขียนไม่ครบตอนโปรเซสถูกปิด
+                    apply_record(data, relationships, record)
+                    replayed += 1
+            self.seq = max(self.seq, seq)
+        self.records = replayed
+        if replayed:
+            logger.info(f"Replayed {replayed} WAL records on top of the QuantumMemoryLink snapshot.")
+        return data, relationships
+
+    # --- Append ---
+    def append(self, record: Dict):
+        if self._file is None:
+            self._file = open(self._segment(self.seq), "a", encoding="utf-8")
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self.records += 1
+        self._unsynced += 1
+        if self._unsynced >= self.group_size:
+            self.flush()
+
+    def flush(self):
+        if self._file is None or self._unsynced == 0:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    # --- Compaction ---
+    def should_compact(self, live_insights: int) -> bool:
+        """True once the WAL outgrows both `compact_min_records` and twice the live insight count."""
+        busy = self._compaction is not None and self._compaction.is_alive()
+        return not busy and self.records >= max(self.compact_min_records, 2 * live_insights)
+
+    def compact(self, data: Data, relationships: RelationGraph, background: bool = True):
+        """
+        Starts a new snapshot of `data`/`relationships`. Must be called while the
+        caller holds the lock guarding them; only the copy and the graph merge
+        happen under it.
+        """
+        self.wait()
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.seq += 1
+        self.records = 0
+        snapshot = {"wal_seq": self.seq, "data": dict(data), "relationships": relationships.to_snapshot()}
+        if background:
+            self._compaction = threading.Thread(target=self._write_snapshot, args=(snapshot,),
+                                                name="qml-compaction", daemon=True)
+            self._compaction.start()
+        else:
+            self._write_snapshot(snapshot)
+
+    def _write_snapshot(self, snapshot: Dict):
+        try:
+            temp_path = self.snapshot_path.with_suffix(".tmp")
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, separators=(",", ":"), default=json_default)
+                f.flush()
+                os.fsync(f.fileno())
+            temp_path.replace(self.snapshot_path)
+            for seq, path in self._segments():
+                if seq < snapshot["wal_seq"]:
+                    path.unlink(missing_ok=True)
+            logger.debug(f"QuantumMemoryLink snapshot written (wal_seq={snapshot['wal_seq']}).")
+        except Exception as e:
+            logger.error(f"Error writing QuantumMemoryLink snapshot: {e}")
+
+    def wait(self):
+        """Blocks until a running background compaction has finished."""
+        if self._compaction is not None:
+            self._compaction.join()
+            self._compaction = None
+
+    def close(self):
+        self.wait()
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
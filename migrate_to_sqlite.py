@@ -0,0 +1,49 @@
+import argparse
+import json
+import logging
+from pathlib import Path
+from typing import Tuple
+
+from memory_wal import MemoryWAL
+from sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+
+def migrate(quantum_memory_path: Path, eternal_echoes_path: Path, db_path: Path) -> Tuple[int, int, int]:
+    """
+    Imports eternal_stream.qdat (snapshot plus any WAL tail) and eternal_echoes.bak
+    into the SQLite store. Rows are upserted, so running it again is harmless.
+    Returns (insights, edges, echoes) counts in the database afterwards.
+    """
+    data, relationships = MemoryWAL(quantum_memory_path).recover()
+    try:
+        with open(eternal_echoes_path, "r", encoding="utf-8") as f:
+            echoes = json.load(f)
+    except FileNotFoundError:
+        logger.warning(f"{eternal_echoes_path} not found; importing insights only.")
+        echoes = []
+
+    store = SQLiteStore(db_path)
+    try:
+        store.import_memory(data, relationships, echoes)
+        return store.insight_count(), store.edge_count(), store.echo_count()
+    finally:
+        store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ย้าย Quantum Memory และ Eternal Echoes จากไฟล์ JSON เข้า SQLite")
+    parser.add_argument("--quantum-memory", type=Path, default=Path("data/eternal_stream.qdat"))
+    parser.add_argument("--eternal-echoes", type=Path, default=Path("data/eternal_echoes.bak"))
+    parser.add_argument("--db", type=Path, default=Path("data/tarn_panya.db"))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s][%(levelname)s] %(message)s")
+    insights, edges, echoes = migrate(args.quantum_memory, args.eternal_echoes, args.db)
+    print(f"{args.db}: {insights} insights, {edges} relationships, {echoes} echoes")
+    print('ตั้ง Config.storage_backend = "sqlite" ใน tarn_panya_ai.py เพื่อใช้ฐานข้อมูลนี้')
+
+
+if __name__ == "__main__":
+    main()
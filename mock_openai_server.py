@@ -0,0 +1,171 @@
+# /thanpanya-ai/mock_openai_server.py
+"""
+Minimal OpenAI-compatible chat completions server for offline benchmarks.
+
+    python mock_openai_server.py --port 8089 --tokens 64 --token-delay-ms 15
+
+Point a client at it with base_url="http://127.0.0.1:8089/v1" and any API key.
+Only POST /v1/chat/completions is implemented (streaming and non-streaming);
+answers are canned, latency is simulated, and request/abort counters are kept
+so benchmarks can verify coalescing and cancellation.
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+from typing import Dict, Optional
+
+
+class MockOpenAIServer:
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, tokens: int = 64,
+                 first_token_delay_ms: float = 150.0, token_delay_ms: float = 15.0):
+        self.host = host
+        self.port = port
+        self.tokens = tokens
+        self.first_token_delay = first_token_delay_ms / 1000
+        self.token_delay = token_delay_ms / 1000
+        self.stats = {"requests": 0, "completed": 0, "aborted": 0, "active": 0, "max_active": 0}
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def start_in_thread(self) -> "MockOpenAIServer":
+        """Serves on a private event loop in a daemon thread, so it does not compete with the client's loop."""
+        ready = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.start())
+            ready.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=run, name="mock-openai", daemon=True).start()
+        ready.wait()
+        return self
+
+    def stop_thread(self):
+        asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    async def serve_forever(self):
+        await self.start()
+        print(f"Mock OpenAI server พร้อมที่ {self.base_url}")
+        async with self._server:
+            await self._server.serve_forever()
+
+    # --- HTTP ---
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:  # keep-alive: หลาย request ต่อหนึ่ง connection
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers: Dict[str, str] = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                if method != "POST" or not path.rstrip("/").endswith("/chat/completions"):
+                    await self._send(writer, 404, {"error": {"message": f"{method} {path} not found"}})
+                    continue
+                await self._complete(writer, json.loads(body or b"{}"))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _send(self, writer: asyncio.StreamWriter, status: int, payload: Dict):
+        data = json.dumps(payload).encode("utf-8")
+        writer.write(f"HTTP/1.1 {status} OK\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\n\r\n".encode("latin-1") + data)
+        await writer.drain()
+
+    async def _complete(self, writer: asyncio.StreamWriter, request: Dict):
+        self.stats["requests"] += 1
+        self.stats["active"] += 1
+        self.stats["max_active"] = max(self.stats["max_active"], self.stats["active"])
+        model = request.get("model", "mock")
+        words = [f"ธารปัญญา{i} " for i in range(self.tokens)]
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in request.get("messages", []))
+        created = int(time.time())
+        try:
+            await asyncio.sleep(self.first_token_delay)
+            if not request.get("stream"):
+                await asyncio.sleep(self.token_delay * self.tokens)
+                await self._send(writer, 200, {
+                    "id": "chatcmpl-mock", "object": "chat.completion", "created": created, "model": model,
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": "".join(words)}}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": self.tokens,
+                              "total_tokens": prompt_tokens + self.tokens},
+                })
+                self.stats["completed"] += 1
+                return
+
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                         b"Cache-Control: no-cache\r\nTransfer-Encoding: chunked\r\n\r\n")
+            for word in words + [None]:
+                chunk = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": created, "model": model,
+                         "choices": [{"index": 0, "finish_reason": None if word else "stop",
+                                      "delta": {"content": word} if word else {}}]}
+                await self._event(writer, chunk)
+                if word:
+                    await asyncio.sleep(self.token_delay)
+            if request.get("stream_options", {}).get("include_usage"):
+                await self._event(writer, {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": created,
+                                           "model": model, "choices": [],
+                                           "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": self.tokens,
+                                                     "total_tokens": prompt_tokens + self.tokens}})
+            await self._write_chunk(writer, b"data: [DONE]\n\n")
+            await self._write_chunk(writer, b"")
+            self.stats["completed"] += 1
+        except (ConnectionError, asyncio.CancelledError):
+            # ไคลเอนต์ตัดการเชื่อมต่อกลางสตรีม
+            self.stats["aborted"] += 1
+            raise
+        finally:
+            self.stats["active"] -= 1
+
+    async def _event(self, writer: asyncio.StreamWriter, payload: Dict):
+        await self._write_chunk(writer, b"data: " + json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n\n")
+
+    @staticmethod
+    async def _write_chunk(writer: asyncio.StreamWriter, data: bytes):
+        writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+        await writer.drain()
+        if writer.is_closing():
+            raise ConnectionResetError("client went away")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock server for offline benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--first-token-delay-ms", type=float, default=150.0)
+    parser.add_argument("--token-delay-ms", type=float, default=15.0)
+    args = parser.parse_args()
+    server = MockOpenAIServer(args.host, args.port, args.tokens, args.first_token_delay_ms, args.token_delay_ms)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# /thanpanya-ai/prompt_packer.py
+
+from typing import Dict, List, Optional, Sequence
+
+from query_cache import TTLCache
+
+# ค่าใช้จ่ายคงที่ต่อข้อความในรูปแบบ chat (role, ตัวคั่น) ตามที่ OpenAI อธิบายไว้
+MESSAGE_OVERHEAD_TOKENS = 4
+CONTEXT_SEPARATOR = "\n\n"
+
+
+class PackedPrompt:
+    """What fit into the budget, plus the tokens each section used."""
+
+    def __init__(self, contexts: List[str], history: List[Dict], usage: Dict[str, int],
+                 dropped_contexts: int, dropped_messages: int):
+        self.contexts = contexts
+        self.history = history
+        self.usage = usage
+        self.dropped_contexts = dropped_contexts
+        self.dropped_messages = dropped_messages
+
+
+class PromptPacker:
+    """
+    Fills a per-model prompt token budget by priority: system prompt and question
+    first, then retrieved contexts in rank order, then chat history from the most
+    recent message backwards.
+
+    A context that does not fit is trimmed to the remaining space when at least
+    `min_context_tokens` are left, otherwise it and every lower-ranked context are
+    dropped. Token counts are cached per text, so a new turn only tokenizes the
+    new question and the new reply.
+    """
+
+    def __init__(self, encoder, budgets: Dict[str, int], default_budget: int = 4000,
+                 min_context_tokens: int = 64, cache_size: int = 4096):
+        self.encoder = encoder
+        self.budgets = budgets
+        self.default_budget = default_budget
+        self.min_context_tokens = min_context_tokens
+        self._counts = TTLCache(maxsize=cache_size, ttl_seconds=0)
+
+    def budget_for(self, model: str) -> int:
+        return self.budgets.get(model, self.default_budget)
+
+    def count(self, text: str) -> int:
+        n = self._counts.get(text)
+        if n is None:
+            n = len(self.encoder.encode(text))
+            self._counts.put(text, n)
+        return n
+
+    def _trim(self, text: str, max_tokens: int) -> str:
+        # ตัดกลางอักขระหลายไบต์ (เช่นภาษาไทย) อาจเหลือ U+FFFD ท้ายข้อความ
+        return self.encoder.decode(self.encoder.encode(text)[:max_tokens]).rstrip("�")
+
+    def pack(self, model: str, system_prompt: str, question: str, contexts: Sequence[str],
+             history: Sequence[Dict], template: str = "", budget: Optional[int] = None) -> PackedPrompt:
+        """
+        `template` is the fixed text wrapped around contexts and question in the
+        user message; it is charged to the question section.
+        """
+        budget = budget if budget is not None else self.budget_for(model)
+        usage = {
+            "system": self.count(system_prompt) + MESSAGE_OVERHEAD_TOKENS,
+            "question": self.count(question) + self.count(template) + MESSAGE_OVERHEAD_TOKENS,
+            "contexts": 0,
+            "history": 0,
+        }
+        remaining = budget - usage["system"] - usage["question"]
+
+        packed_contexts: List[str] = []
+        separator = self.count(CONTEXT_SEPARATOR)
+        for context in contexts:
+            cost = self.count(context) + (separator if packed_contexts else 0)
+            if cost <= remaining:
+                packed_contexts.append(context)
+            elif remaining - separator >= self.min_context_tokens:
+                trimmed = self._trim(context, remaining - separator)
+                packed_contexts.append(trimmed)
+                cost = self.count(trimmed) + (separator if len(packed_contexts) > 1 else 0)
+            else:
+                break
+            usage["contexts"] += cost
+            remaining -= cost
+
+        packed_history: List[Dict] = []
+        for message in reversed(history):
+            cost = self.count(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+            if cost > remaining:
+                break
+            packed_history.append(message)
+            usage["history"] += cost
+            remaining -= cost
+        packed_history.reverse()
+
+        usage["total"] = usage["system"] + usage["question"] + usage["contexts"] + usage["history"]
+        usage["budget"] = budget
+        return PackedPrompt(packed_contexts, packed_history, usage,
+                            dropped_contexts=len(contexts) - len(packed_contexts),
+                            dropped_messages=len(history) - len(packed_history))
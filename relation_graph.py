@@ -0,0 +1,196 @@
+# /thanpanya-ai/relation_graph.py
+
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+CSR_FORMAT = "csr-1"
+
+
+def json_default(value):
+    """`json.dump(..., default=json_default)` for snapshots holding numpy arrays."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class RelationGraph:
+    """
+    Labelled directed graph of insight relationships, one label per (source, target).
+
+    Node ids (UUID strings) are interned to dense ints and relation labels to a
+    small type table, so an edge costs two int32s instead of a dict entry
+    holding two strings. Edges live in CSR arrays (offsets / targets /
+    labels, sorted by source then target) plus a delta buffer of recent
+    inserts that overrides the arrays; once the buffer holds
+    `delta_limit` edges it is merged into new arrays with numpy.
+
+    Removing a node tombstones its int; edges pointing at it are skipped on
+    traversal and dropped, with the ints renumbered, at the next merge.
+    """
+
+    def __init__(self, delta_limit: int = 65_536):
+        self.delta_limit = delta_limit
+        self._ids: List[Optional[str]] = []
+        self._index: Dict[str, int] = {}
+        self._types: List[str] = []
+        self._type_index: Dict[str, int] = {}
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._targets = np.zeros(0, dtype=np.int32)
+        self._labels = np.zeros(0, dtype=np.int32)
+        self._delta: Dict[int, Dict[int, int]] = {}
+        self._delta_edges = 0
+
+    # --- Interning ---
+    def _node(self, node_id: str) -> int:
+        n = self._index.get(node_id)
+        if n is None:
+            n = self._index[node_id] = len(self._ids)
+            self._ids.append(node_id)
+        return n
+
+    def _type(self, label: str) -> int:
+        t = self._type_index.get(label)
+        if t is None:
+            t = self._type_index[label] = len(self._types)
+            self._types.append(label)
+        return t
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self._index
+
+    @property
+    def edge_count(self) -> int:
+        """Stored edges, including ones to removed nodes not yet merged away."""
+        return len(self._targets) + self._delta_edges
+
+    # --- Mutation ---
+    def set_edge(self, source_id: str, target_id: str, label: str):
+        s, t, l = self._node(source_id), self._node(target_id), self._type(label)
+        edges = self._delta.setdefault(s, {})
+        if t not in edges:
+            self._delta_edges += 1
+        edges[t] = l
+        if self._delta_edges >= self.delta_limit:
+            self.merge()
+
+    def remove_node(self, node_id: str):
+        n = self._index.pop(node_id, None)
+        if n is None:
+            return
+        self._ids[n] = None
+        removed = self._delta.pop(n, None)
+        if removed:
+            self._delta_edges -= len(removed)
+
+    # --- Traversal ---
+    def _edges(self, n: int) -> Dict[int, int]:
+        edges: Dict[int, int] = {}
+        if n + 1 < len(self._offsets):
+            lo, hi = self._offsets[n:n + 2].tolist()
+            edges = dict(zip(self._targets[lo:hi].tolist(), self._labels[lo:hi].tolist()))
+        delta = self._delta.get(n)
+        if delta:
+            edges.update(delta)
+        return edges
+
+    def neighbors(self, node_id: str) -> Dict[str, str]:
+        """target id -> label for every live edge out of `node_id`."""
+        n = self._index.get(node_id)
+        if n is None:
+            return {}
+        ids, types = self._ids, self._types
+        return {ids[t]: types[l] for t, l in self._edges(n).items() if ids[t] is not None}
+
+    def targets(self, node_id: str) -> List[str]:
+        """Live targets of `node_id`; the traversal path, so it skips building labels."""
+        n = self._index.get(node_id)
+        if n is None:
+            return []
+        found: List[int] = []
+        if n + 1 < len(self._offsets):
+            lo, hi = self._offsets[n:n + 2].tolist()
+            found = self._targets[lo:hi].tolist()
+        delta = self._delta.get(n)
+        if delta:
+            found = [t for t in found if t not in delta]
+            found.extend(delta)
+        ids = self._ids
+        return [ids[t] for t in found if ids[t] is not None]
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, str]]]:
+        for node_id in list(self._index):
+            yield node_id, self.neighbors(node_id)
+
+    def to_dict(self) -> Dict[str, Dict[str, str]]:
+        """The legacy dict-of-dicts form (source -> target -> label)."""
+        return {node_id: edges for node_id, edges in self.items() if edges}
+
+    # --- Compaction ---
+    def merge(self):
+        """Folds the delta buffer into fresh CSR arrays, dropping removed nodes and renumbering."""
+        size = len(self._ids)
+        src = np.repeat(np.arange(len(self._offsets) - 1, dtype=np.int64), np.diff(self._offsets))
+        dst = self._targets.astype(np.int64)
+        lab = self._labels
+        if self._delta_edges:
+            delta_src = np.fromiter((s for s, edges in self._delta.items() for _ in edges), np.int64, self._delta_edges)
+            delta_dst = np.fromiter((t for edges in self._delta.values() for t in edges), np.int64, self._delta_edges)
+            delta_lab = np.fromiter((l for edges in self._delta.values() for l in edges.values()), np.int32,
+                                    self._delta_edges)
+            src, dst, lab = np.concatenate([src, delta_src]), np.concatenate([dst, delta_dst]), np.concatenate([lab, delta_lab])
+
+        alive = np.fromiter((node_id is not None for node_id in self._ids), bool, size)
+        keep = alive[src] & alive[dst]
+        src, dst, lab = src[keep], dst[keep], lab[keep]
+        # delta ต่อท้าย base: เก็บค่าสุดท้ายของแต่ละคู่ (source, target)
+        key = src * size + dst
+        _, last_from_end = np.unique(key[::-1], return_index=True)
+        order = len(key) - 1 - last_from_end
+        src, dst, lab = src[order], dst[order], lab[order]
+
+        renumber = np.cumsum(alive) - 1
+        if not alive.all():
+            self._ids = [node_id for node_id in self._ids if node_id is not None]
+            self._index = {node_id: n for n, node_id in enumerate(self._ids)}
+        counts = np.bincount(renumber[src], minlength=len(self._ids)) if len(src) else np.zeros(len(self._ids), np.int64)
+        self._offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self._targets = renumber[dst].astype(np.int32)
+        self._labels = lab.astype(np.int32)
+        self._delta.clear()
+        self._delta_edges = 0
+
+    # --- Serialization ---
+    def to_snapshot(self) -> Dict:
+        """
+        Merges, then returns the CSR form. The arrays are never modified in place
+        (a merge replaces them), so the snapshot can be serialized on another
+        thread while the graph keeps changing; dump it with `json_default`.
+        """
+        self.merge()
+        return {"format": CSR_FORMAT, "nodes": list(self._ids), "types": list(self._types),
+                "offsets": self._offsets, "targets": self._targets, "labels": self._labels}
+
+    @classmethod
+    def from_snapshot(cls, payload: Dict, **kwargs) -> "RelationGraph":
+        """Loads a `to_snapshot` payload (as parsed from JSON), or the legacy dict-of-dicts form."""
+        graph = cls(**kwargs)
+        if payload.get("format") != CSR_FORMAT:
+            for source_id, edges in payload.items():
+                for target_id, label in edges.items():
+                    s, t = graph._node(source_id), graph._node(target_id)
+                    graph._delta.setdefault(s, {})[t] = graph._type(label)
+                    graph._delta_edges += 1
+            graph.merge()
+            return graph
+        graph._ids = list(payload["nodes"])
+        graph._index = {node_id: n for n, node_id in enumerate(graph._ids)}
+        graph._types = list(payload["types"])
+        graph._type_index = {label: t for t, label in enumerate(graph._types)}
+        graph._offsets = np.asarray(payload["offsets"], dtype=np.int64)
+        graph._targets = np.asarray(payload["targets"], dtype=np.int32)
+        graph._labels = np.asarray(payload["labels"], dtype=np.int32)
+        return graph
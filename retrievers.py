@@ -2,10 +2,41 @@
 
 import streamlit as st
 import faiss
-from sentence_transformers import SentenceTransformer
-from typing import List
+import logging
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Union, Optional, Dict, Sequence, Tuple
 import numpy as np
 
+from config import settings
+from index_store import lore_unchanged, read_manifest, write_store
+from lore_parser import LoreEntries
+from lexical_index import BM25Index, normalize
+from query_cache import TTLCache
+from vector_index import build_index, base_index, copy_index, remove_ids
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+logger = logging.getLogger(__name__)
+
+# อ่าน index แบบ memory-map: หลาย worker/replica บนเครื่องเดียวกันใช้ page ร่วมกัน
+MMAP_READ_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+RETRIEVAL_MODES = ("dense", "hybrid")
+
+# === Embedding models (โหลดเมื่อต้อง encode ครั้งแรก และใช้ instance เดียวทั้งโปรเซส) ===
+_models: Dict[str, "SentenceTransformer"] = {}
+_models_lock = threading.Lock()
+
+def get_embedding_model(model_name: str) -> "SentenceTransformer":
+    with _models_lock:
+        model = _models.get(model_name)
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+            model = _models[model_name] = SentenceTransformer(model_name)
+        return model
+
 # โหลดข้อมูลตัวอย่างหากไม่มีไฟล์จริง
 def load_mock_lore():
     return [
@@ -16,42 +47,518 @@ def load_mock_lore():
     ]
 
 @st.cache_resource(show_spinner="🧠 กำลังสร้าง Vector Index จากคลังปัญญา...")
-def get_vector_retriever(lore_filepath: str, embedding_model: str):
+def get_vector_retriever(lore_filepath: str, embedding_model: str, mode: str = "hybrid", index_type: Optional[str] = None):
     """
     Function to create and cache a VectorRetriever instance.
     `@st.cache_resource` is used to prevent re-initializing the model and index on every app rerun.
+    `index_type` defaults to `settings.vector_index_type` (flat, ivf_flat, ivf_pq, hnsw).
+
+    The built index is persisted next to the lore file (`<lore>.index/`). A later
+    process whose manifest still matches (model, lore file hash, index settings)
+    memory-maps it instead of re-encoding every chunk. With
+    `settings.lore_watch_interval_seconds` > 0 the lore file is watched and edits
+    are applied incrementally.
     """
+    if not Path(lore_filepath).exists():
+        st.warning(f"ไม่พบคลังปัญญาที่ {lore_filepath}, กำลังใช้ข้อมูลตัวอย่าง")
+    return build_vector_retriever(lore_filepath, embedding_model, mode, index_type)
+
+def build_vector_retriever(lore_filepath: str, embedding_model: str, mode: str = "hybrid",
+                           index_type: Optional[str] = None) -> "VectorRetriever":
+    """`get_vector_retriever` without the Streamlit cache, for headless processes."""
+    index_type = index_type or settings.vector_index_type
+    index_params = {"nprobe": settings.vector_index_nprobe, "hnsw_m": settings.hnsw_m,
+                    "ef_search": settings.hnsw_ef_search, "metric": settings.vector_index_metric}
+    store_dir = Path(settings.vector_store_dir or f"{lore_filepath}.index")
+
+    if settings.vector_store_enabled:
+        retriever = VectorRetriever.load(store_dir, lore_filepath, embedding_model, mode=mode,
+                                         index_type=index_type, index_params=index_params)
+        if retriever is not None:
+            return _start_watching(retriever, store_dir)
+
     try:
-        with open(lore_filepath, 'r', encoding='utf-8') as f:
-            lore_chunks = [line.strip() for line in f if line.strip()]
+        lore_entries = LoreEntries.from_file(lore_filepath)
     except FileNotFoundError:
-        st.warning(f"ไม่พบคลังปัญญาที่ {lore_filepath}, กำลังใช้ข้อมูลตัวอย่าง")
-        lore_chunks = load_mock_lore()
+        lore_entries = LoreEntries.from_lines(load_mock_lore())
+
+    retriever = VectorRetriever(lore_entries, embedding_model, mode=mode, index_type=index_type, index_params=index_params)
+    if settings.vector_store_enabled and lore_entries.filepath:
+        retriever.save(store_dir)
+    return _start_watching(retriever, store_dir)
+
+def _start_watching(retriever: "VectorRetriever", store_dir: Path) -> "VectorRetriever":
+    if settings.lore_watch_interval_seconds > 0 and retriever.entries.filepath:
+        retriever.watch_lore_file(settings.lore_watch_interval_seconds,
+                                  store_dir if settings.vector_store_enabled else None)
+    return retriever
+
+def reciprocal_rank_fusion(rankings: List[List[int]], weights: List[float], k: int = 60) -> List[int]:
+    """Fuses ranked id lists: score(d) = sum_i weights[i] / (k + rank_i(d)), ranks starting at 1."""
+    scores: Dict[int, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight / (k + rank)
+    return sorted(scores, key=scores.__getitem__, reverse=True)
+
+def chunk_keys(questions: Sequence[str]) -> List[str]:
+    """Stable key per entry: its question, suffixed with the occurrence number for duplicates."""
+    seen: Dict[str, int] = {}
+    keys = []
+    for question in questions:
+        n = seen.get(question, 0)
+        seen[question] = n + 1
+        keys.append(question if n == 0 else f"{question}\x00{n}")
+    return keys
+
+class _Snapshot:
+    """
+    One immutable version of the retriever's state. Updates build a new snapshot
+    and swap the reference, so a reader that grabbed a snapshot keeps a consistent
+    entries/index pair for its whole query (copy-on-write).
+    """
+    __slots__ = ("entries", "chunk_ids", "position_of", "key_to_id", "index", "sparse_index", "version",
+                 "_id_order")
+
+    def __init__(self, entries: LoreEntries, chunk_ids: np.ndarray, index, sparse_index, version: int):
+        self.entries = entries
+        self.chunk_ids = chunk_ids
+        self.position_of = {int(cid): pos for pos, cid in enumerate(chunk_ids)}
+        self.key_to_id = dict(zip(chunk_keys(entries.questions), (int(c) for c in chunk_ids)))
+        self.index = index
+        self.sparse_index = sparse_index
+        self.version = version
+        self._id_order = None
 
-    return VectorRetriever(lore_chunks, embedding_model)
+    def with_entries(self, entries: LoreEntries) -> "_Snapshot":
+        """This snapshot over `entries`, a table with the same questions and answers."""
+        snapshot = _Snapshot.__new__(_Snapshot)
+        for name in self.__slots__:
+            setattr(snapshot, name, getattr(self, name))
+        snapshot.entries = entries
+        return snapshot
+
+    def positions(self, ids: np.ndarray) -> np.ndarray:
+        """Maps a FAISS id array to entry positions in place (-1 stays -1) and returns it."""
+        if self._id_order is None:
+            self._id_order = np.argsort(self.chunk_ids, kind="stable")
+        found = ids >= 0
+        sorted_ids = self.chunk_ids[self._id_order]
+        ids[found] = self._id_order[np.searchsorted(sorted_ids, ids[found])]
+        return ids
+
+class RetrievalBatch:
+    """
+    Results of `retrieve_many`. `ids` is an (n_queries, top_k) int64 array of entry
+    positions (-1 where fewer than top_k results exist), taken straight from the
+    FAISS output without copying in dense mode. Chunk strings are read only when
+    a row is indexed.
+    """
+    def __init__(self, ids: np.ndarray, entries: LoreEntries):
+        self.ids = ids
+        self._entries = entries
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, i: int) -> List[str]:
+        return self._entries.answers(p for p in self.ids[i] if p >= 0)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
 
 class VectorRetriever:
     """
     A retriever that uses vector embeddings for semantic search.
     This is a core component of our advanced RAG pipeline.
+
+    In "hybrid" mode a BM25 index over each entry's question and answer sits next
+    to the FAISS index, so exact names ("KBY-Coin", "Divination Matrix") are not
+    outranked by vaguely similar entries. Both rankings are fused with weighted
+    reciprocal rank fusion; a query costs one sparse lookup plus one vector search.
+
+    Vectors are stored under stable chunk ids, so `upsert_chunks`, `delete_chunks`
+    and `refresh_from_file` only embed what actually changed.
+
+    Query embeddings and top-k results are kept in bounded LRU/TTL caches keyed by
+    the normalized query text; result entries carry the index version, so any
+    update makes them unreachable. `cache_stats()` reports hits and misses.
     """
-    def __init__(self, chunks: List[str], model_name: str):
-        self.chunks = chunks
-        self.model = SentenceTransformer(model_name)
-        
+    def __init__(self, entries: Union[LoreEntries, List[str]], model_name: str, mode: str = "dense",
+                 dense_weight: float = 1.0, sparse_weight: float = 1.0, rrf_k: int = 60,
+                 candidate_depth: int = 20, model: Optional["SentenceTransformer"] = None,
+                 index_type: str = "flat", index_params: Optional[Dict] = None):
+        self._configure(model_name, mode, dense_weight, sparse_weight, rrf_k, candidate_depth,
+                        model, index_type, index_params)
+        entries = entries if isinstance(entries, LoreEntries) else LoreEntries.from_lines(entries)
+        chunk_ids = np.arange(len(entries), dtype=np.int64)
+        self._next_id = len(entries)
+
         # --- The 'Generator' part of creating the search index ---
-        embeddings = self.model.encode(self.chunks, show_progress_bar=True)
-        
+        embeddings = self._embed(entries.questions, show_progress_bar=True)
+
         # --- The 'Evaluator' system (the index itself) ---
-        self.index = faiss.IndexFlatL2(embeddings.shape[1])
-        self.index.add(embeddings)
+        # flat = exhaustive scan; ivf_flat / ivf_pq / hnsw = approximate, for large lore
+        index = build_index(embeddings, index_type, ids=chunk_ids, **self.index_params)
+        self._snapshot = _Snapshot(entries, chunk_ids, index, self._build_sparse(entries, chunk_ids), version=0)
+
+    def _configure(self, model_name, mode, dense_weight, sparse_weight, rrf_k, candidate_depth,
+                   model, index_type, index_params):
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{mode}'. Expected one of {RETRIEVAL_MODES}.")
+        self.model_name = model_name
+        self._model = model  # None = โหลดจาก get_embedding_model เมื่อ encode ครั้งแรก
+        self.mode = mode
+        self.dense_weight = dense_weight
+        self.sparse_weight = sparse_weight
+        self.rrf_k = rrf_k
+        self.candidate_depth = candidate_depth
+        self.index_type = index_type
+        self.index_params = {k: v for k, v in (index_params or {}).items() if v is not None}
+        self._query_embeddings = TTLCache(settings.query_cache_size, settings.query_cache_ttl_seconds)
+        self._results = TTLCache(settings.query_cache_size, settings.query_cache_ttl_seconds)
+        self._write_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+
+    @property
+    def model(self) -> "SentenceTransformer":
+        if self._model is None:
+            self._model = get_embedding_model(self.model_name)
+        return self._model
+
+    @property
+    def metric(self) -> str:
+        return self.index_params.get("metric", "l2")
+
+    def _embed(self, texts: List[str], show_progress_bar: bool = False, batch_size: int = 32) -> np.ndarray:
+        vectors = self.model.encode(texts, show_progress_bar=show_progress_bar, batch_size=batch_size)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.metric == "ip":
+            faiss.normalize_L2(vectors)
+        return vectors
+
+    @staticmethod
+    def _sparse_doc(entries: LoreEntries, pos: int) -> str:
+        # Each [ENTRY] is one chunk: its QUESTION and ANSWER are indexed, its ANSWER is returned
+        return f"{entries.questions[pos]}\n{entries.answer(pos)}"
+
+    def _build_sparse(self, entries: LoreEntries, chunk_ids: np.ndarray) -> Optional[BM25Index]:
+        """BM25 over every entry, keyed by chunk id like the vector index."""
+        if self.mode != "hybrid":
+            return None
+        return BM25Index([self._sparse_doc(entries, i) for i in range(len(entries))], doc_ids=chunk_ids)
+
+    # Current snapshot views (เผื่อโค้ดเดิมที่อ้างถึง attribute เหล่านี้ตรงๆ)
+    @property
+    def entries(self) -> LoreEntries:
+        return self._snapshot.entries
+
+    @property
+    def index(self):
+        return self._snapshot.index
+
+    @property
+    def sparse_index(self) -> Optional[BM25Index]:
+        return self._snapshot.sparse_index
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    # --- Persistence ---
+    def _manifest(self, snapshot: _Snapshot) -> Dict:
+        return {
+            "model_name": self.model_name,
+            "mode": self.mode,
+            "index_type": self.index_type,
+            "hnsw_m": self.index_params.get("hnsw_m"),
+            "metric": self.metric,
+            "dimension": snapshot.index.d,
+            "count": len(snapshot.entries),
+            "next_id": self._next_id,
+        }
+
+    def save(self, store_dir: Path):
+        """Saves index, chunk table and manifest (incl. the lore file hash) to `store_dir`."""
+        snapshot = self._snapshot
+
+        def write_files(directory: Path):
+            faiss.write_index(snapshot.index, str(directory / "vectors.faiss"))
+            np.save(directory / "chunk_ids.npy", snapshot.chunk_ids)
+            snapshot.entries.save(directory)
+            if snapshot.sparse_index is not None:
+                snapshot.sparse_index.save(directory)
+
+        # fingerprint ของไฟล์รุ่นที่ snapshot นี้สร้างจาก (ไม่ใช่ไฟล์ ณ ตอนบันทึก ซึ่งอาจถูกแก้ไปแล้ว)
+        write_store(store_dir, write_files, {**self._manifest(snapshot), "lore": snapshot.entries.fingerprint or {}})
+
+    @classmethod
+    def load(cls, store_dir: Path, lore_filepath: str, model_name: str, mode: str = "dense",
+             index_type: str = "flat", index_params: Optional[Dict] = None,
+             model: Optional["SentenceTransformer"] = None, **fusion) -> Optional["VectorRetriever"]:
+        """
+        Memory-maps a saved retriever, or returns None when there is no store or its
+        manifest no longer matches the model, lore file or index settings. The
+        embedding model is loaded only when the first query or update needs it.
+        """
+        manifest = read_manifest(store_dir)
+        if manifest is None or not lore_unchanged(manifest.get("lore", {}), lore_filepath):
+            return None
+        params = {k: v for k, v in (index_params or {}).items() if v is not None}
+        expected = {"model_name": model_name, "mode": mode, "index_type": index_type,
+                    "hnsw_m": params.get("hnsw_m"), "metric": params.get("metric", "l2")}
+        if any(manifest.get(key) != value for key, value in expected.items()):
+            return None
+
+        store_dir = Path(store_dir)
+        retriever = cls.__new__(cls)
+        retriever._configure(model_name, mode,
+                             fusion.get("dense_weight", 1.0), fusion.get("sparse_weight", 1.0),
+                             fusion.get("rrf_k", 60), fusion.get("candidate_depth", 20),
+                             model, index_type, index_params)
+        entries = LoreEntries.load(store_dir, lore_filepath, manifest["lore"])
+        if entries.fingerprint is not None and entries.fingerprint["sha256"] != manifest["lore"].get("sha256"):
+            return None  # ไฟล์ถูกแก้หลังตรวจ: offset ของคำตอบไม่ตรงกับไฟล์ที่เปิดไว้
+        index = faiss.read_index(str(store_dir / "vectors.faiss"), MMAP_READ_FLAGS)
+        if index.d != manifest["dimension"] or index.ntotal != len(entries):
+            return None
+        retriever._next_id = manifest["next_id"]
+        retriever._snapshot = _Snapshot(entries, np.load(store_dir / "chunk_ids.npy"), index,
+                                        BM25Index.load(store_dir) if mode == "hybrid" else None, version=0)
+        retriever._apply_search_params(index)
+        return retriever
+
+    def _apply_search_params(self, index):
+        """Search-time knobs are not part of the saved index; re-apply them after loading."""
+        base = base_index(index)
+        if "nprobe" in self.index_params and hasattr(base, "nprobe"):
+            base.nprobe = self.index_params["nprobe"]
+        if "ef_search" in self.index_params and hasattr(base, "hnsw"):
+            base.hnsw.efSearch = self.index_params["ef_search"]
+
+    # --- Incremental updates ---
+    def upsert_chunks(self, chunks: Sequence[Tuple[str, str]]) -> Dict[str, int]:
+        """
+        Adds or replaces (question, answer) chunks. A chunk whose question already
+        exists keeps its id and vector (only the answer changes); new questions are
+        embedded and added. Readers keep being served from the previous snapshot
+        until the new one is swapped in.
+        """
+        with self._write_lock:
+            answers = dict(chunks)
+            new_entries = self._snapshot.entries.upserted(answers)
+            changed = {key for key, question in zip(chunk_keys(new_entries.questions), new_entries.questions)
+                       if question in answers}
+            return self._apply(new_entries, changed)
+
+    def delete_chunks(self, questions: Sequence[str]) -> Dict[str, int]:
+        """Removes every chunk whose question is in `questions`."""
+        with self._write_lock:
+            entries = self._snapshot.entries
+            drop = set(questions)
+            return self._apply(entries.subset([i for i, q in enumerate(entries.questions) if q not in drop]))
+
+    def refresh_from_file(self, store_dir: Optional[Path] = None) -> Optional[Dict[str, int]]:
+        """
+        Re-parses the lore file if it changed since the last indexed snapshot and
+        applies only the difference. Returns the change counts, or None if unchanged
+        (a file that was only touched keeps the current table and indexes).
+        """
+        entries = self._snapshot.entries
+        stat = self._stat(entries.filepath)
+        indexed = entries.fingerprint
+        if stat is None or (indexed is not None and stat == (indexed["size"], indexed["mtime_ns"])):
+            return None
+        with self._write_lock:
+            new_entries = LoreEntries.from_file(entries.filepath)
+            if indexed is not None and new_entries.fingerprint["sha256"] == indexed["sha256"]:
+                # เนื้อหาเดิม (แค่ถูกแตะหรือบันทึกซ้ำ): ใช้ตารางและ index เดิม อ่านคำตอบผ่านไฟล์ที่เพิ่งเปิด
+                self._snapshot = self._snapshot.with_entries(self._snapshot.entries.with_source(new_entries.source))
+                return None
+            changes = self._apply(new_entries, self._changed_answers(self._snapshot.entries, new_entries))
+        if store_dir is not None:
+            self.save(store_dir)
+        return changes
+
+    def watch_lore_file(self, interval_seconds: float = 2.0, store_dir: Optional[Path] = None) -> threading.Thread:
+        """Polls the lore file in a daemon thread and calls `refresh_from_file` on change."""
+        if self._watcher is not None and self._watcher.is_alive():
+            return self._watcher
+        self._stop_watching.clear()
+
+        def loop():
+            while not self._stop_watching.wait(interval_seconds):
+                try:
+                    self.refresh_from_file(store_dir)
+                except Exception as e:
+                    # ไฟล์อาจอยู่ระหว่างการบันทึก — ลองใหม่รอบถัดไป
+                    logger.warning(f"Lore watcher: refresh failed, will retry: {e}")
+
+        self._watcher = threading.Thread(target=loop, name="lore-watcher", daemon=True)
+        self._watcher.start()
+        return self._watcher
+
+    def stop_watching(self):
+        self._stop_watching.set()
+
+    @staticmethod
+    def _stat(filepath: Optional[str]):
+        if filepath is None:
+            return None
+        try:
+            stat = Path(filepath).stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def _changed_answers(self, old: LoreEntries, new: LoreEntries) -> set:
+        """Keys present in both tables whose answer differs (only BM25 indexes answers)."""
+        if self.mode != "hybrid":
+            return set()
+        old_positions = dict(zip(chunk_keys(old.questions), range(len(old))))
+        if old.source is not None and old.source.changed():
+            # ไฟล์เดิมถูกเขียนทับในที่: คำตอบรุ่นก่อนอ่านไม่ได้แล้ว จึงถือว่าทุก chunk ที่คงอยู่เปลี่ยน
+            return {key for key in chunk_keys(new.questions) if key in old_positions}
+        return {key for pos, key in enumerate(chunk_keys(new.questions))
+                if key in old_positions and old.answer(old_positions[key]) != new.answer(pos)}
+
+    def _apply(self, new_entries: LoreEntries, changed: Sequence[str] = ()) -> Dict[str, int]:
+        """
+        Diffs `new_entries` against the current snapshot by chunk key and swaps in
+        the result. `changed` are kept keys whose answer text changed; only those,
+        added and removed chunks are re-indexed in BM25.
+        """
+        old = self._snapshot
+        keys = chunk_keys(new_entries.questions)
+        new_key_set = set(keys)
+        removed = np.array([cid for key, cid in old.key_to_id.items() if key not in new_key_set], dtype=np.int64)
+        added_positions = [pos for pos, key in enumerate(keys) if key not in old.key_to_id]
+
+        chunk_ids = np.empty(len(keys), dtype=np.int64)
+        for pos, key in enumerate(keys):
+            cid = old.key_to_id.get(key)
+            if cid is None:
+                cid = self._next_id
+                self._next_id += 1
+            chunk_ids[pos] = cid
+
+        index = old.index
+        if len(removed) or added_positions:
+            index = copy_index(old.index)  # copy-on-write: ผู้อ่านเดิมยังใช้ index เก่าได้
+            self._apply_search_params(index)
+            if len(removed):
+                index = remove_ids(index, removed)
+            if added_positions:
+                vectors = self._embed([new_entries.questions[p] for p in added_positions])
+                index.add_with_ids(vectors, chunk_ids[added_positions])
+
+        sparse_index = old.sparse_index
+        if sparse_index is not None:
+            changed_positions = [pos for pos, key in enumerate(keys) if key in changed and key in old.key_to_id]
+            reindexed = added_positions + changed_positions
+            if len(removed) or reindexed:
+                sparse_index = sparse_index.update(removed, chunk_ids[reindexed],
+                                                   [self._sparse_doc(new_entries, p) for p in reindexed])
+
+        self._snapshot = _Snapshot(new_entries, chunk_ids, index, sparse_index, old.version + 1)
+        self._results.clear()  # ผลลัพธ์เก่าอ้างถึงตำแหน่งของ snapshot ก่อนหน้า
+        return {"added": len(added_positions), "deleted": len(removed),
+                "unchanged": len(keys) - len(added_positions), "version": old.version + 1}
+
+    # --- Query ---
+    def _query_embedding(self, query: str, key: str) -> np.ndarray:
+        cache_key = (self.model_name, self.metric, key)
+        embedding = self._query_embeddings.get(cache_key)
+        if embedding is None:
+            embedding = self._embed([query])
+            self._query_embeddings.put(cache_key, embedding)
+        return embedding
+
+    def embed_query(self, query: str) -> np.ndarray:
+        """The (1, dim) query embedding used for search, served from the query cache."""
+        return self._query_embedding(query, normalize(query))
+
+    def _search(self, snapshot: _Snapshot, query: str, top_k: int) -> List[int]:
+        key = normalize(query)
+        cache_key = (self.model_name, self.mode, key, top_k, snapshot.version)
+        cached = self._results.get(cache_key)
+        if cached is not None:
+            return list(cached)
+
+        depth = top_k if self.mode == "dense" else max(top_k, self.candidate_depth)
+        distances, indices = snapshot.index.search(self._query_embedding(query, key), depth)
+        dense_ids = [snapshot.position_of[int(i)] for i in indices[0] if i >= 0]
+        if self.mode == "dense":
+            result = dense_ids
+        else:
+            sparse_ids = [snapshot.position_of[cid] for cid, _ in snapshot.sparse_index.search(query, depth)]
+            fused = reciprocal_rank_fusion([dense_ids, sparse_ids], [self.dense_weight, self.sparse_weight], k=self.rrf_k)
+            result = fused[:top_k]
+        self._results.put(cache_key, tuple(result))
+        return result
+
+    def search_ids(self, query: str, top_k: int) -> List[int]:
+        """Returns the entry positions (in `self.entries`) of the top_k results, best first."""
+        return self._search(self._snapshot, query, top_k)
 
     def retrieve(self, query: str, top_k: int) -> List[str]:
         """
         Retrieves the top_k most relevant chunks for a given query.
         """
-        query_embedding = self.model.encode([query])
-        distances, indices = self.index.search(query_embedding, top_k)
-        
+        snapshot = self._snapshot
         # The 'Evolutionary Loop' - returning the best results for the prompt
-        return [self.chunks[i] for i in indices[0]]
\ No newline at end of file
+        return snapshot.entries.answers(self._search(snapshot, query, top_k))
+
+    def retrieve_many(self, queries: Sequence[str], top_k: int, batch_size: Optional[int] = None) -> RetrievalBatch:
+        """
+        Batched `retrieve`: queries not in the embedding cache are encoded in one
+        batched forward pass (`batch_size`, default `settings.retrieval_batch_size`)
+        and the index is searched once with all rows. Results also warm the
+        result cache used by `retrieve`.
+        """
+        snapshot = self._snapshot
+        if not queries:
+            return RetrievalBatch(np.empty((0, top_k), dtype=np.int64), snapshot.entries)
+        keys = [normalize(q) for q in queries]
+        embeddings = np.empty((len(queries), snapshot.index.d), dtype=np.float32)
+        missing: Dict[str, List[int]] = {}
+        for row, (query, key) in enumerate(zip(queries, keys)):
+            cached = self._query_embeddings.get((self.model_name, self.metric, key))
+            if cached is not None:
+                embeddings[row] = cached[0]
+            else:
+                missing.setdefault(key, []).append(row)
+        if missing:
+            texts = [queries[rows[0]] for rows in missing.values()]
+            vectors = self._embed(texts, batch_size=batch_size or settings.retrieval_batch_size)
+            for vector, (key, rows) in zip(vectors, missing.items()):
+                embeddings[rows] = vector
+                self._query_embeddings.put((self.model_name, self.metric, key), vector[None, :])
+
+        depth = top_k if self.mode == "dense" else max(top_k, self.candidate_depth)
+        _, indices = snapshot.index.search(embeddings, depth)
+        dense = snapshot.positions(indices)
+        if self.mode == "dense":
+            ids = dense
+        else:
+            ids = np.full((len(queries), top_k), -1, dtype=np.int64)
+            for row, query in enumerate(queries):
+                sparse_ids = [snapshot.position_of[cid] for cid, _ in snapshot.sparse_index.search(query, depth)]
+                dense_ids = [int(i) for i in dense[row] if i >= 0]
+                fused = reciprocal_rank_fusion([dense_ids, sparse_ids], [self.dense_weight, self.sparse_weight],
+                                               k=self.rrf_k)[:top_k]
+                ids[row, :len(fused)] = fused
+
+        for row, key in enumerate(keys):
+            self._results.put((self.model_name, self.mode, key, top_k, snapshot.version),
+                              tuple(int(i) for i in ids[row] if i >= 0))
+        return RetrievalBatch(ids, snapshot.entries)
+
+    def clear_caches(self):
+        self._query_embeddings.clear()
+        self._results.clear()
+
+    def cache_stats(self) -> Dict[str, Dict[str, float]]:
+        """Hit/miss counters of the query-embedding and result caches, for monitoring."""
+        return {"query_embeddings": self._query_embeddings.stats(), "results": self._results.stats()}
@@ -0,0 +1,222 @@
+# /thanpanya-ai/service.py
+"""
+Headless ASGI service for TharnpanyaKernel.
+
+    python service.py --workers 4 --port 8000
+    # หรือ: uvicorn service:app --workers 4
+
+POST /query   {"question": ..., "chat_history": [...], "model", "temperature", "top_k", "session_id", "stream"}
+              -> text/event-stream (events: contexts, delta..., done | error), or JSON with "stream": false
+POST /batch   {"questions": [...], "model", "temperature", "top_k"} -> JSON answers in order
+GET  /healthz -> 200 while serving, 503 while starting or draining
+
+Each worker builds its kernel once at start-up. `main()` builds (or validates)
+the persisted vector store before forking, so every worker memory-maps the
+same index files instead of embedding the lore again.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+from typing import Any, AsyncIterator, Dict
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceState:
+    """Per-worker kernel plus the in-flight counter used for draining."""
+
+    def __init__(self):
+        self.kernel = None
+        self.draining = False
+        self.in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def enter(self):
+        self.in_flight += 1
+        self._idle.clear()
+
+    def leave(self):
+        self.in_flight -= 1
+        if self.in_flight == 0:
+            self._idle.set()
+
+    async def drain(self, timeout_seconds: float):
+        """Refuses new work, then waits for in-flight requests up to `timeout_seconds`."""
+        self.draining = True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout_seconds)
+        except asyncio.TimeoutError:
+            logger.warning(f"Drain timed out with {self.in_flight} request(s) still in flight.")
+
+
+def build_kernel():
+    from core import TharnpanyaKernel
+    from retrievers import build_vector_retriever
+
+    retriever = build_vector_retriever(settings.service_lore_filepath, settings.service_embedding_model)
+    return TharnpanyaKernel(retriever)
+
+
+def _sse(event: str, data: Any) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+def _usage(result: Dict[str, Any]) -> Dict[str, Any]:
+    meter = result["usage"]
+    return {"prompt_tokens": meter.prompt_tokens, "completion_tokens": meter.completion_tokens,
+            "cost": meter.cost, "cached": result.get("cached", False), "coalesced": meter.coalesced}
+
+
+def _query_args(body: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "model": body.get("model", settings.service_model),
+        "temp": float(body.get("temperature", settings.service_temperature)),
+        "top_k": int(body.get("top_k", settings.service_top_k)),
+    }
+
+
+def _unavailable(state: ServiceState):
+    if state.kernel is None or state.draining:
+        return JSONResponse({"error": "service is draining" if state.draining else "service is starting"},
+                            status_code=503, headers={"Retry-After": "1"})
+    return None
+
+
+async def _answer(state: ServiceState, question: str, chat_history, session_id: str, args) -> Dict[str, Any]:
+    result = await state.kernel.aquery(question, chat_history, session_id=session_id, **args)
+    parts = []
+    async for chunk in result["response_stream"]:
+        if chunk.choices and chunk.choices[0].delta.content:
+            parts.append(chunk.choices[0].delta.content)
+    return {"answer": "".join(parts), "contexts": result["contexts"], "usage": _usage(result)}
+
+
+async def query(request: Request):
+    state: ServiceState = request.app.state.service
+    if (response := _unavailable(state)) is not None:
+        return response
+    body = await request.json()
+    question = body.get("question")
+    if not question:
+        return JSONResponse({"error": "'question' is required"}, status_code=400)
+    chat_history = body.get("chat_history", [])
+    session_id = body.get("session_id", "default")
+    args = _query_args(body)
+
+    if not body.get("stream", True):
+        state.enter()
+        try:
+            return JSONResponse(await _answer(state, question, chat_history, session_id, args))
+        finally:
+            state.leave()
+
+    async def events() -> AsyncIterator[bytes]:
+        # ผู้ใช้ปิดการเชื่อมต่อ -> Starlette ยกเลิก generator นี้ -> aclose สตรีม -> ตัดสตรีมต้นทาง
+        state.enter()
+        stream = None
+        try:
+            result = await state.kernel.aquery(question, chat_history, session_id=session_id, **args)
+            stream = result["response_stream"]
+            yield _sse("contexts", result["contexts"])
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield _sse("delta", chunk.choices[0].delta.content)
+            yield _sse("done", _usage(result))
+        except Exception as e:
+            logger.exception("Query stream failed")
+            yield _sse("error", str(e))
+        finally:
+            if stream is not None:
+                await stream.aclose()
+            state.leave()
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+async def batch(request: Request):
+    state: ServiceState = request.app.state.service
+    if (response := _unavailable(state)) is not None:
+        return response
+    body = await request.json()
+    questions = body.get("questions") or []
+    if not isinstance(questions, list) or len(questions) > settings.service_max_batch:
+        return JSONResponse({"error": f"'questions' must be a list of at most {settings.service_max_batch}"},
+                            status_code=400)
+    args = _query_args(body)
+    session_id = body.get("session_id", "batch")
+
+    state.enter()
+    try:
+        # คำถามซ้ำในชุดเดียวกันจะถูกรวมเป็นคำขอเดียวโดย AsyncLLMClient
+        results = await asyncio.gather(*(_answer(state, q, [], session_id, args) for q in questions),
+                                       return_exceptions=True)
+    finally:
+        state.leave()
+    return JSONResponse({"results": [{"error": str(r)} if isinstance(r, Exception) else r for r in results]})
+
+
+async def healthz(request: Request):
+    state: ServiceState = request.app.state.service
+    if state.kernel is None or state.draining:
+        return JSONResponse({"status": "draining" if state.draining else "starting", "in_flight": state.in_flight},
+                            status_code=503)
+    retriever = state.kernel.retriever
+    return JSONResponse({"status": "ok", "entries": len(retriever.entries), "index_version": retriever.version,
+                         "in_flight": state.in_flight})
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: Starlette):
+    state = ServiceState()
+    app.state.service = state
+    # สร้าง retriever/kernel ครั้งเดียวต่อ worker (โหลด index แบบ mmap ถ้ามี store อยู่แล้ว)
+    state.kernel = await asyncio.to_thread(build_kernel)
+    logger.info("Kernel ready.")
+    try:
+        yield
+    finally:
+        await state.drain(settings.service_drain_timeout_seconds)
+        state.kernel.retriever.stop_watching()
+        await state.kernel.aclose()
+
+
+routes = [
+    Route("/query", query, methods=["POST"]),
+    Route("/batch", batch, methods=["POST"]),
+    Route("/healthz", healthz, methods=["GET"]),
+]
+
+app = Starlette(routes=routes, lifespan=lifespan)
+
+
+def main():
+    import uvicorn
+    from retrievers import build_vector_retriever
+
+    parser = argparse.ArgumentParser(description="Serve TharnpanyaKernel over HTTP (SSE streaming).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    # สร้าง/ตรวจ store ก่อน fork เพื่อให้ทุก worker แค่ mmap index เดียวกัน
+    if settings.vector_store_enabled:
+        build_vector_retriever(settings.service_lore_filepath, settings.service_embedding_model).stop_watching()
+    uvicorn.run("service:app", host=args.host, port=args.port, workers=args.workers,
+                timeout_graceful_shutdown=int(settings.service_drain_timeout_seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+# /thanpanya-ai/sqlite_store.py
+"""
+SQLite storage backend for QuantumMemoryLink and EternalEchoes.
+
+One database in WAL journal mode holds
+
+    insights       id, timestamp, epoch, trigger, impact_score, content, body (the insight as JSON)
+    edges          (source, target) -> relation, mirrored like QuantumMemoryLink.add_relationship
+    echoes         id, timestamp, epoch, concept, body (the echo as JSON)
+    insights_fts   FTS5 over insight content and trigger, kept in step by triggers
+
+indexed on timestamp, trigger and impact_score. SQLiteStore implements the
+MemoryWAL interface (recover / append / flush / compact / close), so
+QuantumMemoryLink can persist through it unchanged: every WAL record becomes
+an upsert or delete, committed in groups of `group_size`. `recover` does not
+load the insight bodies: it returns a StoredInsights mapping that reads them
+on demand. EternalEchoes reads and writes the echoes table directly instead
+of keeping a list. The database can also be queried without loading it
+(`search_insights`, `related_insights`, `expired_insight_ids`).
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from insight_index import timestamp_epoch
+from insight_query import parse_query
+from relation_graph import RelationGraph
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS insights (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    timestamp TEXT,
+    epoch REAL,
+    trigger TEXT,
+    impact_score REAL,
+    content TEXT,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS insights_timestamp ON insights(timestamp);
+CREATE INDEX IF NOT EXISTS insights_epoch ON insights(epoch);
+CREATE INDEX IF NOT EXISTS insights_trigger ON insights(trigger);
+CREATE INDEX IF NOT EXISTS insights_impact ON insights(impact_score);
+
+CREATE TABLE IF NOT EXISTS edges (
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    relation TEXT NOT NULL,
+    PRIMARY KEY (source, target)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS edges_target ON edges(target);
+
+CREATE TABLE IF NOT EXISTS echoes (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    timestamp TEXT NOT NULL,
+    epoch REAL,
+    concept TEXT NOT NULL,
+    concept_folded TEXT NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS echoes_timestamp ON echoes(timestamp);
+CREATE INDEX IF NOT EXISTS echoes_epoch ON echoes(epoch);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS insights_fts USING fts5(
+    content, trigger, content='insights', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS insights_fts_insert AFTER INSERT ON insights BEGIN
+    INSERT INTO insights_fts(rowid, content, trigger) VALUES (new.rowid, new.content, new.trigger);
+END;
+CREATE TRIGGER IF NOT EXISTS insights_fts_delete AFTER DELETE ON insights BEGIN
+    INSERT INTO insights_fts(insights_fts, rowid, content, trigger) VALUES ('delete', old.rowid, old.content, old.trigger);
+END;
+CREATE TRIGGER IF NOT EXISTS insights_fts_update AFTER UPDATE ON insights BEGIN
+    INSERT INTO insights_fts(insights_fts, rowid, content, trigger) VALUES ('delete', old.rowid, old.content, old.trigger);
+    INSERT INTO insights_fts(rowid, content, trigger) VALUES (new.rowid, new.content, new.trigger);
+END;
+"""
+
+_UPSERT_INSIGHT = """
+INSERT INTO insights (id, timestamp, epoch, trigger, impact_score, content, body) VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET timestamp = excluded.timestamp, epoch = excluded.epoch, trigger = excluded.trigger,
+    impact_score = excluded.impact_score, content = excluded.content, body = excluded.body
+"""
+_UPSERT_EDGE = """
+INSERT INTO edges (source, target, relation) VALUES (?, ?, ?)
+ON CONFLICT(source, target) DO UPDATE SET relation = excluded.relation
+"""
+_UPSERT_ECHO = """
+INSERT INTO echoes (id, timestamp, epoch, concept, concept_folded, body) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET timestamp = excluded.timestamp, epoch = excluded.epoch, concept = excluded.concept,
+    concept_folded = excluded.concept_folded, body = excluded.body
+"""
+
+
+def _insight_row(insight_id: str, insight: Dict) -> Tuple:
+    return (insight_id, insight.get("timestamp"), timestamp_epoch(insight.get("timestamp")), insight.get("trigger"),
+            insight.get("impact_score"), insight.get("content", ""), json.dumps(insight, ensure_ascii=False))
+
+
+def _echo_row(echo: Dict) -> Tuple:
+    concept = echo.get("concept", "")
+    return (echo["id"], echo.get("timestamp", ""), timestamp_epoch(echo.get("timestamp")), concept, concept.lower(),
+            json.dumps(echo, ensure_ascii=False))
+
+
+def _mirrored_edges(source_id: str, target_id: str, relationship_type: str) -> List[Tuple[str, str, str]]:
+    edges = [(source_id, target_id, relationship_type)]
+    if not relationship_type.startswith("reverse_"):
+        edges.append((target_id, source_id, f"reverse_{relationship_type}"))
+    return edges
+
+
+def fts_query(query: str) -> Optional[str]:
+    """The retrieve_by_query syntax (see insight_query) as an FTS5 MATCH expression; None if nothing to match."""
+    groups = []
+    for group in parse_query(query):
+        phrases = ['"' + " ".join(phrase).replace('"', '""') + '"' for phrase in group]
+        groups.append("(" + " AND ".join(phrases) + ")")
+    return " OR ".join(groups) or None
+
+
+class StoredInsights(MutableMapping):
+    """
+    QuantumMemoryLink.data backed by the insights table. Bodies are read on
+    demand and the `cache_size` most recently used are kept; `items()` pages
+    through the table without caching. Assignment and deletion only update the
+    cache: the WAL record applied next (SQLiteStore.append) writes the row.
+    """
+
+    def __init__(self, store: "SQLiteStore", cache_size: int = 4096):
+        self._store = store
+        self._cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self.cache_size = cache_size
+
+    def _remember(self, insight_id: str, insight: Dict):
+        self._cache[insight_id] = insight
+        self._cache.move_to_end(insight_id)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def __getitem__(self, insight_id: str) -> Dict:
+        insight = self._cache.get(insight_id)
+        if insight is None:
+            insight = self._store.get_insight(insight_id)
+            if insight is None:
+                raise KeyError(insight_id)
+        self._remember(insight_id, insight)
+        return insight
+
+    def __setitem__(self, insight_id: str, insight: Dict):
+        self._remember(insight_id, insight)
+
+    def __delitem__(self, insight_id: str):
+        if self._cache.pop(insight_id, None) is None and not self._store.has_insight(insight_id):
+            raise KeyError(insight_id)
+
+    def __contains__(self, insight_id: object) -> bool:
+        return insight_id in self._cache or self._store.has_insight(insight_id)
+
+    def __len__(self) -> int:
+        return self._store.insight_count()
+
+    def __iter__(self) -> Iterator[str]:
+        return (insight_id for insight_id, _ in self._store.iter_insights())
+
+    def items(self) -> Iterator[Tuple[str, Dict]]:
+        return self._store.iter_insights()
+
+
+class SQLiteStore:
+    """
+    A single connection shared by QuantumMemoryLink and EternalEchoes, which
+    hold different locks, so every statement also takes the store's own lock.
+    """
+
+    def __init__(self, db_path: Path, group_size: int = 64):
+        self.db_path = Path(db_path)
+        self.group_size = max(1, group_size)
+        self._uncommitted = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")  # ใน WAL mode: commit ไม่ fsync ทุกครั้ง แต่ไฟล์ไม่เสีย
+        self._conn.executescript(_SCHEMA)
+
+    # --- MemoryWAL interface (QuantumMemoryLink) ---
+    def recover(self) -> Tuple[StoredInsights, RelationGraph]:
+        """The insights as a StoredInsights view (nothing is read yet) and the relationship graph."""
+        with self._lock:
+            relationships = RelationGraph()
+            for source_id, target_id, relation in self._conn.execute("SELECT source, target, relation FROM edges"):
+                relationships.set_edge(source_id, target_id, relation)
+        logger.info(f"Opened {self.db_path} with {relationships.edge_count} relationships.")
+        return StoredInsights(self), relationships
+
+    def append(self, record: Dict):
+        with self._lock:
+            self._write(record)
+            self._uncommitted += 1
+            if self._uncommitted >= self.group_size:
+                self._commit()
+
+    def _write(self, record: Dict):
+        op = record["op"]
+        if op == "put":
+            self._conn.execute(_UPSERT_INSIGHT, _insight_row(record["id"], record["insight"]))
+        elif op == "rel":
+            self._conn.executemany(_UPSERT_EDGE, _mirrored_edges(record["s"], record["t"], record["r"]))
+        elif op == "del":
+            self._conn.execute("DELETE FROM insights WHERE id = ?", (record["id"],))
+            self._conn.execute("DELETE FROM edges WHERE source = ?", (record["id"],))
+            self._conn.execute("DELETE FROM edges WHERE target = ?", (record["id"],))
+        else:
+            raise ValueError(f"Unknown WAL op: {op!r}")
+
+    def _commit(self):
+        self._conn.commit()
+        self._uncommitted = 0
+
+    def flush(self):
+        with self._lock:
+            if self._conn is not None and self._uncommitted:
+                self._commit()
+
+    def should_compact(self, live_insights: int) -> bool:
+        return False  # ฐานข้อมูลเป็นปัจจุบันเสมอ ไม่มี log ให้ compact
+
+    def compact(self, data: Dict[str, Dict], relationships: RelationGraph, background: bool = True):
+        """Checkpoint: commits pending writes and folds SQLite's own WAL back into the database file."""
+        self.flush()
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def wait(self):
+        pass
+
+    def close(self):
+        """Commits and closes the connection; safe to call from each store user."""
+        with self._lock:
+            if self._conn is None:
+                return
+            self._conn.commit()
+            self._conn.close()
+            self._conn = None
+
+    # --- Bulk import (migrate_to_sqlite) ---
+    def import_memory(self, data: Dict[str, Dict], relationships: RelationGraph, echoes: Iterable[Dict]):
+        with self._lock:
+            self._conn.executemany(_UPSERT_INSIGHT, (_insight_row(i, insight) for i, insight in data.items()))
+            self._conn.executemany(_UPSERT_EDGE, ((s, t, r) for s, edges in relationships.items()
+                                                  for t, r in edges.items()))
+            self._conn.executemany(_UPSERT_ECHO, (_echo_row(echo) for echo in echoes))
+            self._commit()
+
+    # --- Queries that do not need the data in memory ---
+    def insight_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM insights").fetchone()[0]
+
+    def edge_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM edges").fetchone()[0]
+
+    def get_insight(self, insight_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT body FROM insights WHERE id = ?", (insight_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def has_insight(self, insight_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM insights WHERE id = ?", (insight_id,)).fetchone() is not None
+
+    def iter_insights(self, page_size: int = 1000) -> Iterator[Tuple[str, Dict]]:
+        """Every (id, insight) in rowid order, `page_size` rows per query so the lock is not held between pages."""
+        last = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute("SELECT rowid, id, body FROM insights WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                                          (last, page_size)).fetchall()
+            for last, insight_id, body in rows:
+                yield insight_id, json.loads(body)
+            if len(rows) < page_size:
+                return
+
+    def expired_insight_ids(self, cutoff_epoch: float) -> List[str]:
+        """Ids of insights timestamped at or before `cutoff_epoch`; insights without a usable timestamp are kept."""
+        with self._lock:
+            return [insight_id for insight_id, in
+                    self._conn.execute("SELECT id FROM insights WHERE epoch <= ?", (cutoff_epoch,))]
+
+    def search_insights(self, query: str, limit: int = 5) -> List[Dict]:
+        """FTS5 version of QuantumMemoryLink.retrieve_by_query: same syntax, same (impact_score, timestamp) order."""
+        match = fts_query(query)
+        if match is None:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT i.body FROM insights_fts JOIN insights i ON i.rowid = insights_fts.rowid "
+                "WHERE insights_fts MATCH ? ORDER BY coalesce(i.impact_score, 0) DESC, i.epoch DESC LIMIT ?",
+                (match, limit)).fetchall()
+        return [json.loads(body) for body, in rows]
+
+    def related_insights(self, insight_id: str, relationship_type: Optional[str] = None) -> List[Dict]:
+        sql = "SELECT i.body FROM edges e JOIN insights i ON i.id = e.target WHERE e.source = ?"
+        params: Tuple = (insight_id,)
+        if relationship_type is not None:
+            sql, params = sql + " AND e.relation = ?", params + (relationship_type,)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(body) for body, in rows]
+
+    # --- Eternal Echoes ---
+    def add_echo(self, echo: Dict):
+        with self._lock:
+            self._conn.execute(_UPSERT_ECHO, _echo_row(echo))
+            self._commit()
+
+    def echo_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM echoes").fetchone()[0]
+
+    def echoes_by_concept(self, concept_query: str, limit: int = 3) -> List[Dict]:
+        """Newest echoes whose concept contains `concept_query` (case-insensitive), as EternalEchoes always matched."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT body FROM echoes WHERE instr(concept_folded, ?) > 0 ORDER BY timestamp DESC, rowid LIMIT ?",
+                (concept_query.lower(), limit)).fetchall()
+        return [json.loads(body) for body, in rows]
+
+    def remove_expired_echoes(self, cutoff_epoch: float) -> int:
+        """Deletes echoes timestamped at or before `cutoff_epoch`; echoes without a usable timestamp are kept."""
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM echoes WHERE epoch <= ?", (cutoff_epoch,)).rowcount
+            self._commit()
+        return removed
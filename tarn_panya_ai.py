@@ -52,17 +52,25 @@ import time
 import uuid
 from datetime import datetime, timedelta, timezone # เพิ่ม timezone
 from threading import Lock
-from typing import List, Dict, Optional, Any, Tuple, Callable
+from typing import List, Dict, Optional, Any, Set, Tuple, Callable
 
 from pydantic import BaseModel, Field, ValidationError
 from pathlib import Path
 
+from insight_clusters import InsightClusters, SamplePool
+from insight_index import ExpiryIndex, InsightIndex
+from insight_query import InsightQueryEngine
+from memory_wal import MemoryWAL, apply_record
+from relation_graph import RelationGraph
+from sqlite_store import SQLiteStore
+
 # --- Configuration & Environment Setup ---
 class Config(BaseModel):
     log_file: Path = Path("resonant_awareness.log")
     insight_archive_path: Path = Path("data/insight_archive.json")
     eternal_echoes_path: Path = Path("data/eternal_echoes.bak")
     quantum_memory_path: Path = Path("data/eternal_stream.qdat")
+    sqlite_path: Path = Path("data/tarn_panya.db")
     auto_codex_summary_path: Path = Path("data/auto_codex_summary.json")
     codex_awareness_path: Path = Path("codex/QH-AWAKE-002.json")
     responsible_ai_policy_path: Path = Path("policy/responsible_ai_policy.json")
@@ -72,6 +80,7 @@ class Config(BaseModel):
     mutation_review_threshold: float = 0.95
     simulated_azure_ai_delay: float = 0.03
     simulated_ml_inference_delay: float = 0.07
+    ml_max_concurrency: int = 16 # จำนวน predict_impact ที่ส่งพร้อมกันได้ใน predict_impact_batch
     data_strategy_enabled: bool = True
     responsible_ai_enabled: bool = True
     azure_ai_services_enabled: bool = True
@@ -79,6 +88,9 @@ class Config(BaseModel):
     insight_pulsation_interval: int = 300
     soul_level_computation_threshold: float = 0.85
     file_retention_interval_seconds: int = 3600
+    quantum_memory_wal_group_size: int = 64 # fsync WAL ทุกกี่ record
+    quantum_memory_compact_min_records: int = 10_000 # compact เมื่อ WAL ยาวกว่านี้และยาวกว่า 2 เท่าของจำนวน insight
+    storage_backend: str = "json" # 'json' (snapshot + WAL) หรือ 'sqlite' (ย้ายข้อมูลเดิมด้วย migrate_to_sqlite.py)
 
     llm_provider: str = Field("azure_openai", env="LLM_PROVIDER") # 'azure_openai' or 'google_gemini'
 
@@ -98,7 +110,7 @@ except ValidationError as e:
 
 # Ensure data directories exist
 for p in [CONFIG.insight_archive_path, CONFIG.eternal_echoes_path, CONFIG.quantum_memory_path,
-          CONFIG.auto_codex_summary_path]:
+          CONFIG.sqlite_path, CONFIG.auto_codex_summary_path]:
     p.parent.mkdir(parents=True, exist_ok=True)
 CONFIG.codex_awareness_path.parent.mkdir(parents=True, exist_ok=True)
 CONFIG.responsible_ai_policy_path.parent.mkdir(parents=True, exist_ok=True)
@@ -390,86 +402,142 @@ class SemanticGraph:
         logger.info(f"Subgraph visualization for {root_node_id} completed (simulated).")
 
 # --- Quantum Memory Link (Semantic Graph Memory with Insight Pulsation) ---
+HIGH_IMPACT_THRESHOLD = 0.7 # insight ที่ใช้เป็นจุดเริ่ม pulsation ได้
+PULSATION_CLUSTER_SIZE = 10
+PULSATION_SEED_ATTEMPTS = 8 # สุ่มหา seed ที่ไม่ถูก pulsation อื่นจองไว้กี่ครั้งก่อนยอมแพ้
+
 class QuantumMemoryLink:
-    def __init__(self, path: Path, governance: DataGovernance, azure_ml: 'AzureMLModelMocker', llm_service: 'LLMService'):
+    def __init__(self, path: Path, governance: DataGovernance, azure_ml: 'AzureMLModelMocker', llm_service: 'LLMService',
+                 storage: Optional[SQLiteStore] = None):
         self.path = path
         self.data: Dict[str, Dict] = {}
-        self.relationships: Dict[str, Dict[str, str]] = {}
+        self.relationships = RelationGraph()
         self.lock = Lock()
         self.governance = governance
         self.azure_ml = azure_ml
         self.llm_service = llm_service
+        # storage ที่ส่งเข้ามาต้องมี interface แบบ MemoryWAL (recover/append/flush/compact/close)
+        self._owns_storage = storage is None
+        # SQLiteStore: เนื้อหา insight อยู่บนดิสก์ ค้นด้วย FTS5 และตาราง edges แทน index ในหน่วยความจำ
+        self._store = storage if isinstance(storage, SQLiteStore) else None
+        self.wal = storage or MemoryWAL(path, group_size=CONFIG.quantum_memory_wal_group_size,
+                                        compact_min_records=CONFIG.quantum_memory_compact_min_records)
         self._load()
-        logger.info(f"QuantumMemoryLink initialized with {len(self.data)} insights and {len(self.relationships)} relationships.")
+        logger.info(f"QuantumMemoryLink initialized with {len(self.index)} insights and {self.relationships.edge_count} relationships.")
 
     async def sync(self, insights: List[Dict]):
-        insights_to_save = []
-        for insight in insights:
-            if CONFIG.azure_ml_enabled:
-                impact_prediction = await self.azure_ml.predict_impact(insight)
+        if CONFIG.azure_ml_enabled and insights:
+            # ให้คะแนนทั้ง batch พร้อมกัน แทนการรอ predict_impact ทีละ insight
+            impact_predictions = await self.azure_ml.predict_impact_batch(insights)
+            for insight, impact_prediction in zip(insights, impact_predictions):
                 insight["impact_score"] = impact_prediction.get("score", 0.0)
                 logger.debug(f"Insight {insight.get('id', 'N/A')} received impact score: {insight['impact_score']}")
 
+        insights_to_save = []
+        for insight in insights:
             if not self.governance.validate_data("insight", insight):
                 logger.error(f"Invalid insight data received for sync: {insight}. Skipping.")
                 continue
-
-            key = insight['id']
-            with self.lock:
-                self.data[key] = insight
-                self._infer_relationships(key, insight)
             insights_to_save.append(insight)
 
         if insights_to_save:
             with self.lock:
-                self.data = {k: v for k, v in self.data.items() if self.governance.enforce_retention([v], "insight")}
-                self.relationships = {s: {t: r for t, r in targets.items() if t in self.data} for s, targets in self.relationships.items() if s in self.data}
-                self._save()
+                for insight in insights_to_save:
+                    key = insight['id']
+                    self._apply({"op": "put", "id": key, "insight": insight})
+                    self._infer_relationships(key, insight)
+                for key in self._expired_ids():
+                    self._apply({"op": "del", "id": key})
+                if self.wal.should_compact(len(self.index)):
+                    self.wal.compact(self.data, self.relationships)
             logger.info(f"Synchronized {len(insights_to_save)} new insights to QuantumMemoryLink.")
 
-    def _infer_relationships(self, new_insight_id: str, new_insight: Dict):
-        self.add_relationship(new_insight_id, new_insight_id, "self_referential")
+    def _apply(self, record: Dict):
+        """Applies a mutation in memory and appends it to the WAL. Caller holds self.lock."""
+        apply_record(self.data, self.relationships, record)
+        if record["op"] == "put":
+            self._index_insight(record["id"], record["insight"])
+        elif record["op"] == "rel":
+            self.clusters.union(record["s"], record["t"])
+        elif record["op"] == "del":
+            self.index.remove(record["id"])
+            if self.expiry is not None:
+                self.expiry.remove(record["id"])
+            if self.query_engine is not None:
+                self.query_engine.remove(record["id"])
+            self._ids.discard(record["id"])
+            self._high_impact.discard(record["id"])
+            self.clusters.discard(record["id"])
+            if self.clusters.stale > max(1024, len(self.index)):
+                # union-find แยก component ไม่ได้: สร้างใหม่จาก graph เมื่อ insight ที่ถูกลบค้างอยู่มากเกินไป
+                self.clusters = InsightClusters(self.relationships)
+        self.wal.append(record)
+
+    def _index_insight(self, insight_id: str, insight: Dict):
+        """Adds a stored (or replaced) insight to the in-memory indexes. Caller holds self.lock."""
+        self.index.add(insight_id, insight)
+        if self.expiry is not None:
+            self.expiry.add(insight_id, insight.get("timestamp"))
+        if self.query_engine is not None:
+            self.query_engine.add(insight_id, insight)
+        self._ids.add(insight_id)
+        if (insight.get("impact_score") or 0) > HIGH_IMPACT_THRESHOLD:
+            self._high_impact.add(insight_id)
+        else:
+            self._high_impact.discard(insight_id)
 
-        new_content = new_insight.get("content", "").lower()
-        new_trigger = new_insight.get("trigger", "").lower()
+    def _expired_ids(self) -> List[str]:
+        """Insights past the governance retention window, popped from the expiry heap. Caller holds self.lock."""
+        if not self.governance.enabled:
+            return []
+        cutoff = datetime.now(timezone.utc) - self.governance.data_retention_policy
+        if self._store is not None:
+            expired = self._store.expired_insight_ids(cutoff.timestamp())
+        else:
+            expired = self.expiry.pop_expired(cutoff.timestamp())
+        if expired:
+            logger.debug(f"Retention removed {len(expired)} expired insights from QuantumMemoryLink.")
+        return expired
 
-        for existing_id, existing_insight in self.data.items():
-            if existing_id == new_insight_id:
-                continue
+    def _infer_relationships(self, new_insight_id: str, new_insight: Dict):
+        self._add_relationship(new_insight_id, new_insight_id, "self_referential")
 
-            existing_content = existing_insight.get("content", "").lower()
-            existing_trigger = existing_insight.get("trigger", "").lower()
+        # ผู้สมัครมาจาก index โดยตรง ไม่ต้องไล่ทุก insight ใน memory
+        new_trigger = self.index.triggers[new_insight_id]
+        similar = self.index.similar(new_insight_id)
+        same_trigger = self.index.with_trigger(new_trigger) if new_trigger else set()
+        identity_reflections = self.index.with_trigger_term("identity_reflection") if "identity_shift" in new_trigger else set()
+        ideas = self.index.with_trigger_term("idea") if "refinement" in new_trigger else set()
+        new_time = datetime.fromisoformat(new_insight["timestamp"])
 
-            shared_words = set(new_content.split()) & set(existing_content.split())
-            if len(shared_words) > 3:
-                self.add_relationship(new_insight_id, existing_id, "semantically_similar_content")
-                self.add_relationship(existing_id, new_insight_id, "semantically_similar_content")
+        for existing_id in (similar | same_trigger | identity_reflections | ideas) - {new_insight_id}:
+            if existing_id in similar:
+                self._add_relationship(new_insight_id, existing_id, "semantically_similar_content")
+                self._add_relationship(existing_id, new_insight_id, "semantically_similar_content")
 
-            if new_trigger and new_trigger == existing_trigger:
-                self.add_relationship(new_insight_id, existing_id, f"shares_trigger_{new_trigger}")
-                self.add_relationship(existing_id, new_insight_id, f"shares_trigger_{new_trigger}")
+            if existing_id in same_trigger:
+                self._add_relationship(new_insight_id, existing_id, f"shares_trigger_{new_trigger}")
+                self._add_relationship(existing_id, new_insight_id, f"shares_trigger_{new_trigger}")
 
-            if "identity_shift" in new_trigger and "identity_reflection" in existing_trigger:
-                self.add_relationship(new_insight_id, existing_id, "influenced_by_identity_reflection")
+            if existing_id in identity_reflections:
+                self._add_relationship(new_insight_id, existing_id, "influenced_by_identity_reflection")
 
-            new_time = datetime.fromisoformat(new_insight["timestamp"])
-            existing_time = datetime.fromisoformat(existing_insight["timestamp"])
-            if new_time > existing_time and "refinement" in new_trigger and "idea" in existing_trigger:
-                self.add_relationship(new_insight_id, existing_id, "refines")
+            if existing_id in ideas and new_time > datetime.fromisoformat(self.data[existing_id]["timestamp"]):
+                self._add_relationship(new_insight_id, existing_id, "refines")
 
     def add_relationship(self, source_id: str, target_id: str, relationship_type: str):
         with self.lock:
-            if source_id not in self.relationships:
-                self.relationships[source_id] = {}
-            self.relationships[source_id][target_id] = relationship_type
-            if not relationship_type.startswith("reverse_"):
-                if target_id not in self.relationships:
-                    self.relationships[target_id] = {}
-                self.relationships[target_id][source_id] = f"reverse_{relationship_type}"
+            self._add_relationship(source_id, target_id, relationship_type)
+
+    def _add_relationship(self, source_id: str, target_id: str, relationship_type: str):
+        # เรียกจากภายใน sync ซึ่งถือ self.lock อยู่แล้ว (Lock ไม่ re-entrant)
+        self._apply({"op": "rel", "s": source_id, "t": target_id, "r": relationship_type})
 
     def get_related_insights(self, insight_id: str, relationship_type: Optional[str] = None) -> List[Dict]:
+        if self._store is not None:
+            return self._store.related_insights(insight_id, relationship_type)
         with self.lock:
-            related_ids = self.relationships.get(insight_id, {})
+            related_ids = self.relationships.neighbors(insight_id)
             found_insights = []
             for target_id, rel_type in related_ids.items():
                 if (relationship_type is None or rel_type == relationship_type) and target_id in self.data:
@@ -477,108 +545,169 @@ class QuantumMemoryLink:
             return found_insights
 
     def retrieve_by_query(self, query: str, limit: int = 5) -> List[Dict]:
-        results = []
-        query_lower = query.lower()
-        for insight_id, insight in self.data.items():
-            if query_lower in insight.get("content", "").lower() or query_lower in insight.get("trigger", "").lower():
-                results.append(insight)
-        results.sort(key=lambda x: (x.get("impact_score", 0), datetime.fromisoformat(x["timestamp"])), reverse=True)
-        return results[:limit]
+        """Top insights by (impact_score, timestamp) matching `query`; supports OR, AND and "phrases" (see insight_query)."""
+        if self._store is not None:
+            return self._store.search_insights(query, limit)
+        return [self.data[insight_id] for insight_id in self.query_engine.search(query, limit)]
 
     async def generate_insight_pulsation(self) -> Optional[Dict]:
+        # ถือ lock เฉพาะตอนเลือก cluster แล้วปล่อยก่อนเรียก LLM ทุกครั้ง
         with self.lock:
-            if len(self.data) < 5:
-                logger.debug("Not enough insights for pulsation.")
-                return None
-
-            high_impact_insights = [i for i in self.data.values() if i.get("impact_score", 0) > 0.7]
-            if not high_impact_insights:
-                logger.debug("No high impact insights to start pulsation. Selecting random insight.")
-                start_insight = random.choice(list(self.data.values()))
-            else:
-                start_insight = random.choice(high_impact_insights)
-
-            cluster_ids = set()
-            queue = [start_insight["id"]]
-            while queue and len(cluster_ids) < 10:
-                current_id = queue.pop(0)
-                if current_id not in cluster_ids and current_id in self.data:
-                    cluster_ids.add(current_id)
-                    for target_id in self.relationships.get(current_id, {}):
-                        if target_id not in cluster_ids:
-                            queue.append(target_id)
-
-            if len(cluster_ids) < 3:
-                logger.debug(f"Cluster too small for pulsation ({len(cluster_ids)} insights).")
-                return None
-
-            relevant_insights = [self.data[uid] for uid in cluster_ids if uid in self.data]
-
+            reserved = self._reserve_pulsation_cluster()
+        if reserved is None:
+            return None
+        start_insight, relevant_insights = reserved
+        cluster_ids = [i["id"] for i in relevant_insights]
+        try:
             if self.llm_service.enabled:
                 concept = await self.llm_service.generate_wisdom_concept(" ".join([i["content"] for i in relevant_insights]))
                 wisdom = await self.llm_service.synthesize_wisdom(relevant_insights)
             else:
                 concept = f"Synthesis of {len(relevant_insights)} related insights about {start_insight.get('trigger', 'various topics')}"
                 wisdom = f"The core wisdom derived from these insights suggests: {' '.join([i['content'] for i in relevant_insights])[:150]}... (Mocked)"
+        finally:
+            with self.lock:
+                self._pulsing.difference_update(cluster_ids)
 
-
-            new_echo = {
-                "id": str(uuid.uuid4()),
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "concept": concept,
-                "wisdom": wisdom,
-                "synthesized_from_insights": list(cluster_ids),
-                "refinement_count": 0
-            }
-            if self.governance.validate_data("eternal_echo", new_echo):
-                logger.info(f"⚡️ Pulsation: Generated new Eternal Echo - '{concept}'")
-                return new_echo
-            else:
-                logger.error(f"Failed to validate new Eternal Echo: {new_echo}")
-                return None
-
+        new_echo = {
+            "id": str(uuid.uuid4()),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "concept": concept,
+            "wisdom": wisdom,
+            "synthesized_from_insights": cluster_ids,
+            "refinement_count": 0
+        }
+        if self.governance.validate_data("eternal_echo", new_echo):
+            logger.info(f"⚡️ Pulsation: Generated new Eternal Echo - '{concept}'")
+            return new_echo
+        else:
+            logger.error(f"Failed to validate new Eternal Echo: {new_echo}")
+            return None
+
+    def _reserve_pulsation_cluster(self) -> Optional[Tuple[Dict, List[Dict]]]:
+        """
+        Picks a seed and up to 9 live insights related to it (see `_pulsation_members`)
+        that no running pulsation holds, and reserves them so concurrent pulsations
+        work on disjoint clusters. Returns (seed insight, cluster insights). Caller holds self.lock.
+        """
+        if len(self.index) < 5:
+            logger.debug("Not enough insights for pulsation.")
+            return None
+
+        def free(insight_id: str) -> bool:
+            return insight_id in self.index and insight_id not in self._pulsing
+
+        seeds = self._high_impact
+        if not seeds:
+            logger.debug("No high impact insights to start pulsation. Selecting random insight.")
+            seeds = self._ids
+        start_id = None
+        for _ in range(PULSATION_SEED_ATTEMPTS):
+            candidate = seeds.choice()
+            if free(candidate):
+                start_id = candidate
+                break
+        if start_id is None:
+            logger.debug("Every sampled seed is already part of a running pulsation.")
+            return None
+
+        cluster_ids = [start_id] + self._pulsation_members(start_id, free, PULSATION_CLUSTER_SIZE - 1)
+        if len(cluster_ids) < 3:
+            logger.debug(f"Cluster too small for pulsation ({len(cluster_ids)} insights).")
+            return None
+
+        self._pulsing.update(cluster_ids)
+        return self.data[start_id], [self.data[i] for i in cluster_ids]
+
+    def _pulsation_members(self, start_id: str, free: Callable[[str], bool], limit: int) -> List[str]:
+        """
+        Up to `limit` free insights related to `start_id`, closest first: its direct
+        relations, then relations two steps away, then a random sample of the rest
+        of its union-find component (usually most of the store, so only as filler).
+        Each step looks at no more than PULSATION_CLUSTER_SIZE * 3 ids per node.
+        """
+        budget = PULSATION_CLUSTER_SIZE * 3
+        chosen: List[str] = []
+        seen = {start_id}
+
+        def take(candidates: List[str]) -> List[str]:
+            fresh = []
+            for insight_id in random.sample(candidates, min(len(candidates), budget)):
+                if insight_id in seen:
+                    continue
+                seen.add(insight_id)
+                fresh.append(insight_id)
+                if free(insight_id) and len(chosen) < limit:
+                    chosen.append(insight_id)
+            return fresh
+
+        neighbours = take(self.relationships.targets(start_id))
+        for insight_id in neighbours:
+            if len(chosen) >= limit:
+                break
+            take(self.relationships.targets(insight_id))
+        if len(chosen) < limit:
+            take(self.clusters.members(start_id))
+        return chosen
 
     def _save(self):
+        """Checkpoint: writes a full snapshot synchronously and drops the WAL it covers."""
         try:
-            temp_path = self.path.with_suffix(".tmp")
-            with open(temp_path, 'w', encoding='utf-8') as f:
-                json.dump({"data": self.data, "relationships": self.relationships}, f, indent=2)
-            temp_path.replace(self.path)
+            with self.lock:
+                self.wal.compact(self.data, self.relationships, background=False)
             logger.debug("QuantumMemoryLink saved.")
         except Exception as e:
             logger.error(f"Error saving QuantumMemoryLink: {e}")
 
     def _load(self):
         try:
-            with open(self.path, 'r', encoding='utf-8') as f:
-                loaded_content = json.load(f)
-                self.data = loaded_content.get("data", {})
-                self.relationships = loaded_content.get("relationships", {})
+            self.data, self.relationships = self.wal.recover()
             logger.debug("QuantumMemoryLink loaded.")
-        except FileNotFoundError:
-            self.data = {}
-            self.relationships = {}
-            logger.warning("QuantumMemoryLink file not found. Starting fresh.")
-        except json.JSONDecodeError as e:
-            logger.error(f"Error decoding QuantumMemoryLink JSON: {e}. Starting fresh.")
-            self.data = {}
-            self.relationships = {}
         except Exception as e:
             logger.error(f"Unexpected error loading QuantumMemoryLink: {e}. Starting fresh.")
             self.data = {}
-            self.relationships = {}
+            self.relationships = RelationGraph()
+        self.index = InsightIndex()
+        self.expiry = ExpiryIndex() if self._store is None else None # SQLite: หา insight ที่หมดอายุจากคอลัมน์ epoch
+        self.query_engine = None
+        self._ids = SamplePool() # สุ่ม seed ได้ใน O(1) เมื่อไม่มี insight ที่ impact สูง
+        self._high_impact = SamplePool()
+        for insight_id, insight in self.data.items(): # SQLite: อ่านทีละหน้า ไม่เก็บเนื้อหาไว้
+            self._index_insight(insight_id, insight)
+        if self._store is None:
+            self.query_engine = InsightQueryEngine(self.index, self.data)
+        self.clusters = InsightClusters(self.relationships)
+        self._pulsing: Set[str] = set() # insight ที่ pulsation ที่กำลังรอ LLM จองไว้
+
+    def close(self):
+        self._save()
+        if self._owns_storage: # SQLiteStore ที่ส่งเข้ามาใช้ร่วมกับ EternalEchoes ผู้สร้างเป็นคนปิด
+            self.wal.close()
 
 # --- Eternal Echoes (Long-term Wisdom Repository) ---
 class EternalEchoes:
-    def __init__(self, file_path: Path, governance: DataGovernance):
+    def __init__(self, file_path: Path, governance: DataGovernance, storage: Optional[SQLiteStore] = None):
         self.file_path = file_path
         self.governance = governance
+        self.storage = storage # ถ้ามี: echo อยู่ในตาราง echoes ไม่ต้องโหลดทั้งหมดเข้า self.echoes
         self.echoes: List[Dict] = []
         self.lock = Lock()
         self._load()
-        logger.info(f"EternalEchoes initialized with {len(self.echoes)} echoes from {file_path}.")
+        count = self.storage.echo_count() if self.storage else len(self.echoes)
+        logger.info(f"EternalEchoes initialized with {count} echoes from {self.storage.db_path if self.storage else file_path}.")
+
+    def enforce_retention(self):
+        """Drops echoes older than the governance retention window from the SQLite store."""
+        if self.storage is None or not self.governance.enabled:
+            return
+        cutoff = datetime.now(timezone.utc) - self.governance.data_retention_policy
+        removed = self.storage.remove_expired_echoes(cutoff.timestamp())
+        logger.debug(f"EternalEchoes retention removed {removed} old echoes.")
 
     def _load(self):
+        if self.storage is not None:
+            self.enforce_retention()
+            return
         try:
             with open(self.file_path, 'r', encoding='utf-8') as f:
                 loaded_echoes = json.load(f)
@@ -595,6 +724,9 @@ class EternalEchoes:
             self.echoes = []
 
     def _save(self):
+        if self.storage is not None:
+            self.storage.flush() # add_echo commit ทันทีอยู่แล้ว
+            return
         try:
             temp_path = self.file_path.with_suffix(".tmp")
             with temp_path.open('w', encoding='utf-8') as f:
@@ -609,12 +741,17 @@ class EternalEchoes:
             logger.error(f"Invalid eternal echo data: {echo}. Skipping add.")
             return
         with self.lock:
-            self.echoes.append(echo)
-            self._save()
+            if self.storage is not None:
+                self.storage.add_echo(echo)
+            else:
+                self.echoes.append(echo)
+                self._save()
             logger.info(f"New Eternal Echo added: {echo.get('concept', 'N/A')}")
 
     def get_echoes_by_concept(self, concept_query: str, limit: int = 3) -> List[Dict]:
         with self.lock:
+            if self.storage is not None:
+                return self.storage.echoes_by_concept(concept_query, limit)
             sorted_echoes = sorted(self.echoes, key=lambda x: x.get("timestamp", ""), reverse=True)
             return [
                 e for e in sorted_echoes
@@ -760,6 +897,20 @@ class AzureMLModelMocker:
     async def predict_impact(self, insight_data: Dict) -> Dict:
         if not self.enabled: return {"score": random.uniform(0.1, 0.9)}
         await asyncio.sleep(CONFIG.simulated_ml_inference_delay)
+        return self._score_impact(insight_data)
+
+    async def predict_impact_batch(self, insights: List[Dict]) -> List[Dict]:
+        """Scores `insights` in order; at most CONFIG.ml_max_concurrency predictions are in flight at once."""
+        if not self.enabled: return [{"score": random.uniform(0.1, 0.9)} for _ in insights]
+        semaphore = asyncio.Semaphore(CONFIG.ml_max_concurrency)
+
+        async def bounded(insight_data: Dict) -> Dict:
+            async with semaphore:
+                return await self.predict_impact(insight_data)
+
+        return await asyncio.gather(*(bounded(insight) for insight in insights))
+
+    def _score_impact(self, insight_data: Dict) -> Dict:
         base_score = random.uniform(0.3, 0.8)
         if "positive" in insight_data.get("sentiment", ""):
             base_score += 0.1
@@ -1147,8 +1298,12 @@ class TarnPanyaAI:
         )
         self.azure_ml_mocker = AzureMLModelMocker(enabled=CONFIG.azure_ml_enabled)
 
-        self.quantum_memory_link = QuantumMemoryLink(CONFIG.quantum_memory_path, self.data_governance, self.azure_ml_mocker, self.llm_service)
-        self.eternal_echoes = EternalEchoes(CONFIG.eternal_echoes_path, self.data_governance) 
+        self.storage = None
+        if CONFIG.storage_backend == "sqlite":
+            self.storage = SQLiteStore(CONFIG.sqlite_path, group_size=CONFIG.quantum_memory_wal_group_size)
+        self.quantum_memory_link = QuantumMemoryLink(CONFIG.quantum_memory_path, self.data_governance, self.azure_ml_mocker, self.llm_service,
+                                                     storage=self.storage)
+        self.eternal_echoes = EternalEchoes(CONFIG.eternal_echoes_path, self.data_governance, storage=self.storage)
         self.codex_of_awareness = CodexOfAwareness(CONFIG.codex_awareness_path, self.data_governance)
 
         self.soul_level_computation = SoulLevelComputation(self.quantum_memory_link, self.eternal_echoes, self.llm_service)
@@ -1189,8 +1344,11 @@ class TarnPanyaAI:
 
         if time.time() - self._last_file_retention_time >= CONFIG.file_retention_interval_seconds:
             logger.info("Triggering periodic file-based data retention enforcement...")
-            await self.data_governance.enforce_retention_policy_on_file(CONFIG.quantum_memory_path, "insight")
-            await self.data_governance.enforce_retention_policy_on_file(CONFIG.eternal_echoes_path, "eternal_echo")
+            if self.storage is None:
+                await self.data_governance.enforce_retention_policy_on_file(CONFIG.quantum_memory_path, "insight")
+                await self.data_governance.enforce_retention_policy_on_file(CONFIG.eternal_echoes_path, "eternal_echo")
+            else:
+                self.eternal_echoes.enforce_retention() # insight หมดอายุถูกลบใน QuantumMemoryLink.sync อยู่แล้ว
             self._last_file_retention_time = time.time()
             logger.debug("Periodic file-based retention triggered.")
 
@@ -1245,9 +1403,11 @@ class TarnPanyaAI:
     def stop(self):
         self.is_running = False
         logger.info("ธารปัญญา AI stopped.")
-        self.quantum_memory_link._save()
+        self.quantum_memory_link.close()
         self.eternal_echoes._save()
         self.codex_of_awareness._save()
+        if self.storage is not None:
+            self.storage.close()
 
 # --- Main Execution Block ---
 async def main():
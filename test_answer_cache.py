@@ -0,0 +1,66 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from answer_cache import SemanticAnswerCache
+
+
+class FakeChunk:
+
+    def __init__(self, content):
+        self.choices = [type("Choice", (), {"delta": type("Delta", (), {"content": content})()})()]
+
+
+class TestSemanticAnswerCache(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = str(Path(self.tmp.name) / "answers.jsonl")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_cache(self, **kwargs):
+        return SemanticAnswerCache(threshold=0.9, clock=lambda: self.now, path=self.path, **kwargs)
+
+    def test_near_duplicate_hits_only_in_same_bucket(self):
+        cache = self.make_cache()
+        bucket = cache.bucket("gpt-4o", 0.7, ["ctx a", "ctx b"])
+        cache.put(np.array([1.0, 0.0]), bucket, ["KBY ", "คือ..."])
+
+        chunks, similarity = cache.get(np.array([0.99, 0.05]), cache.bucket("gpt-4o", 0.6, ["ctx b", "ctx a"]))
+        self.assertEqual(chunks, ["KBY ", "คือ..."])
+        self.assertGreater(similarity, 0.9)
+        self.assertIsNone(cache.get(np.array([0.0, 1.0]), bucket))
+        self.assertIsNone(cache.get(np.array([1.0, 0.0]), cache.bucket("gpt-4o", 1.2, ["ctx a", "ctx b"])))
+        self.assertIsNone(cache.get(np.array([1.0, 0.0]), cache.bucket("gpt-4o", 0.7, ["ctx a"])))
+
+    def test_size_and_age_eviction(self):
+        cache = self.make_cache(max_entries=2, max_age_seconds=60)
+        bucket = cache.bucket("gpt-4o", 0.0, [])
+        for i, vector in enumerate(np.eye(3)):
+            cache.put(vector, bucket, [f"answer {i}"])
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(np.eye(3)[0], bucket))
+        self.now += 61
+        self.assertIsNone(cache.get(np.eye(3)[2], bucket))
+        self.assertEqual(len(cache), 0)
+
+    def test_record_then_replay_and_reload_from_disk(self):
+        cache = self.make_cache()
+        bucket = cache.bucket("gpt-4o", 0.7, ["ctx"])
+        live = [FakeChunk("ธาร"), FakeChunk("ปัญญา"), FakeChunk(None)]
+        self.assertEqual(list(cache.record(iter(live), np.array([0.0, 1.0]), bucket)), live)
+
+        reloaded = self.make_cache()
+        chunks, _ = reloaded.get(np.array([0.0, 1.0]), bucket)
+        replay = list(reloaded.replay(chunks, "gpt-4o"))
+        self.assertEqual("".join(c.choices[0].delta.content or "" for c in replay), "ธารปัญญา")
+        self.assertEqual(replay[-1].choices[0].finish_reason, "stop")
+
+
+if __name__ == "__main__":
+    unittest.main()
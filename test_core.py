@@ -0,0 +1,126 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import core
+from answer_cache import ReplayChunk, SemanticAnswerCache
+from config import settings
+from llm_client import AsyncLLMClient
+from mock_openai_server import MockOpenAIServer
+from test_service import CharEncoder
+from token_ledger import TokenLedger
+
+COSTS = {"gpt-4o": {"prompt": 0.001, "completion": 0.002}}
+
+
+class StubRetriever:
+    """Fixed contexts; questions differing only in case/punctuation embed identically."""
+
+    def __init__(self, contexts):
+        self.contexts = contexts
+
+    def embed_query(self, question):
+        vector = np.zeros(26, dtype=np.float32)
+        for c in question.lower():
+            if "a" <= c <= "z":
+                vector[ord(c) - ord("a")] += 1
+        return vector
+
+    def retrieve(self, question, top_k):
+        return self.contexts[:top_k]
+
+
+def make_kernel(contexts, answer_cache=None):
+    with mock.patch("tiktoken.get_encoding", return_value=CharEncoder()):
+        return core.TharnpanyaKernel(StubRetriever(contexts), answer_cache=answer_cache, ledger=TokenLedger(COSTS))
+
+
+def answer_text(stream):
+    return "".join(chunk.choices[0].delta.content or "" for chunk in stream if chunk.choices)
+
+
+class TestKernelAnswerCache(unittest.TestCase):
+
+    def test_answer_cache_is_off_by_default(self):
+        self.assertFalse(settings.answer_cache_enabled)
+        self.assertIsNone(make_kernel(["ctx"]).answer_cache)
+
+    def test_cache_hit_skips_the_llm(self):
+        kernel = make_kernel(["KBY is the lore archive."], answer_cache=SemanticAnswerCache())
+        with mock.patch.object(core, "openai") as openai:
+            openai.chat.completions.create.return_value = iter([ReplayChunk("KBY ", "gpt-4o"),
+                                                                ReplayChunk("is lore.", "gpt-4o")])
+            first = kernel.query("What is KBY?", [], "gpt-4o", 0.2, 1, session_id="s")
+            self.assertFalse(first["cached"])
+            self.assertEqual(answer_text(first["response_stream"]), "KBY is lore.")
+
+            second = kernel.query("what is kby", [], "gpt-4o", 0.2, 1, session_id="s")
+            self.assertTrue(second["cached"])
+            self.assertEqual(answer_text(second["response_stream"]), "KBY is lore.")
+            self.assertEqual(openai.chat.completions.create.call_count, 1)
+
+            # ประวัติการสนทนาทำให้ข้าม cache และเรียก LLM จริง
+            openai.chat.completions.create.return_value = iter([ReplayChunk("again", "gpt-4o")])
+            third = kernel.query("what is kby", [{"role": "user", "content": "hi"}], "gpt-4o", 0.2, 1, session_id="s")
+            self.assertFalse(third["cached"])
+            answer_text(third["response_stream"])
+            self.assertEqual(openai.chat.completions.create.call_count, 2)
+
+        session = kernel.ledger.session("s")
+        self.assertEqual((session["turns"], session["cached_turns"]), (3, 1))
+        self.assertEqual(second["usage"].cost, 0)
+
+
+class TestKernelPromptBudget(unittest.TestCase):
+
+    def test_prepare_packs_within_the_model_budget(self):
+        contexts = [f"context {i}: " + "ธารปัญญา lore " * 150 for i in range(6)]
+        history = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i} " * 60} for i in range(20)]
+        kernel = make_kernel(contexts)
+        for model in ("gpt-3.5-turbo", "gpt-4o", "unknown-model"):
+            budget = settings.prompt_token_budgets.get(model, settings.prompt_token_budget_default)
+            turn = kernel._prepare("What is KBY?", history, model, 0.2, top_k=6)
+            self.assertLessEqual(turn["prompt_tokens"], budget, model)
+            self.assertGreater(turn["prompt_tokens"], budget - settings.prompt_min_context_tokens, model)
+            self.assertEqual(turn["messages"][0]["content"], core.SYSTEM_PROMPT)
+            self.assertEqual(turn["messages"][-1]["role"], "user")
+            self.assertIn("What is KBY?", turn["messages"][-1]["content"])
+            self.assertGreater(turn["packed"].dropped_contexts + turn["packed"].dropped_messages, 0)
+
+
+class TestKernelCoalescedCost(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.server = MockOpenAIServer(tokens=20, first_token_delay_ms=50, token_delay_ms=2)
+        await self.server.start()
+        self.kernel = make_kernel(["KBY is the lore archive."])
+        self.kernel._llm_client = AsyncLLMClient(api_key="mock", base_url=self.server.base_url)
+
+    async def asyncTearDown(self):
+        await self.kernel.aclose()
+        await self.server.stop()
+
+    async def ask(self, session_id):
+        result = await self.kernel.aquery("What is KBY?", [], "gpt-4o", 0.2, 1, session_id=session_id)
+        async for _ in result["response_stream"]:
+            pass
+        return result["usage"]
+
+    async def test_joined_subscribers_are_billed_once(self):
+        first, second = await asyncio.gather(self.ask("a"), self.ask("b"))
+        self.assertEqual(self.server.stats["requests"], 1)
+        self.assertEqual(sorted([first.coalesced, second.coalesced]), [False, True])
+        paying = second if first.coalesced else first
+        self.assertTrue(paying.from_provider)
+        self.assertGreater(paying.cost, 0)
+
+        totals = self.kernel.ledger.totals()
+        self.assertEqual((totals["turns"], totals["coalesced_turns"]), (2, 1))
+        self.assertAlmostEqual(totals["cost"], paying.cost)
+        self.assertEqual(totals["prompt_tokens"], paying.prompt_tokens)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from embedding_cache import LoreEmbeddingCache
+
+
+class CountingEncoder:
+    def __init__(self, dim=8):
+        self.dim = dim
+        self.encoded = []
+
+    def __call__(self, texts):
+        self.encoded.extend(texts)
+        return np.array([[len(t) + i for i in range(self.dim)] for t in texts], dtype=np.float32)
+
+
+class TestLoreEmbeddingCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.lore_path = str(Path(self.tmp.name) / "kby_lore.txt")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_warm_load_encodes_nothing(self):
+        lines = ["SOA คืออะไร?", "Quantum Sea", "Qualia"]
+        LoreEmbeddingCache(self.lore_path, "m", CountingEncoder()).embeddings_for(lines)
+
+        encoder = CountingEncoder()
+        matrix = LoreEmbeddingCache(self.lore_path, "m", encoder).embeddings_for(lines)
+        self.assertEqual(encoder.encoded, [])
+        self.assertEqual(matrix.shape, (3, 8))
+
+    def test_only_edited_lines_are_encoded(self):
+        LoreEmbeddingCache(self.lore_path, "m", CountingEncoder()).embeddings_for(["a", "b", "c"])
+
+        encoder = CountingEncoder()
+        matrix = LoreEmbeddingCache(self.lore_path, "m", encoder).embeddings_for(["a", "bb", "c"])
+        self.assertEqual(encoder.encoded, ["bb"])
+        self.assertEqual(matrix[1, 0], 2.0)
+
+    def test_cache_is_keyed_by_model(self):
+        LoreEmbeddingCache(self.lore_path, "m1", CountingEncoder()).embeddings_for(["a"])
+
+        encoder = CountingEncoder()
+        LoreEmbeddingCache(self.lore_path, "m2", encoder).embeddings_for(["a"])
+        self.assertEqual(encoder.encoded, ["a"])
+
+    def test_querying_a_subset_keeps_the_other_rows(self):
+        cache = LoreEmbeddingCache(self.lore_path, "m", CountingEncoder())
+        cache.embeddings_for(["a", "b", "c", "d", "e"])
+        cache.embeddings_for(["a"])
+        self.assertEqual(len(cache.rows), 5)
+
+        encoder = CountingEncoder()
+        LoreEmbeddingCache(self.lore_path, "m", encoder).embeddings_for(["a", "b", "c", "d", "e"])
+        self.assertEqual(encoder.encoded, [])
+
+    def test_prune_drops_rows_of_removed_lines(self):
+        cache = LoreEmbeddingCache(self.lore_path, "m", CountingEncoder())
+        cache.embeddings_for(["a", "b"])
+        self.assertFalse(cache.prune(["a", "b"]))
+        cache.embeddings_for(["ccc", "dddd", "eeeee", "ffffff"])
+        self.assertTrue(cache.prune(["a", "ccc", "new"]))
+        self.assertEqual(len(cache.rows), 2)
+
+        encoder = CountingEncoder()
+        reopened = LoreEmbeddingCache(self.lore_path, "m", encoder)
+        matrix = reopened.embeddings_for(["ccc", "a"])
+        self.assertEqual(encoder.encoded, [])
+        self.assertEqual(matrix[:, 0].tolist(), [3.0, 1.0])
+        self.assertEqual(len(reopened.rows), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from gemini_gateway import GeminiGateway, normalize_prompt
+
+
+class FakeModel:
+    """Stands in for genai.GenerativeModel: counts calls and tracks peak concurrency."""
+
+    def __init__(self, delay: float = 0.02, fail: bool = False, chunk_delay: float = 0.0):
+        self.delay = delay
+        self.fail = fail
+        self.chunk_delay = chunk_delay
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+
+    async def generate_content_async(self, prompt: str, stream: bool = False):
+        self.calls += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail:
+                raise RuntimeError("quota exceeded")
+        finally:
+            self.active -= 1
+        words = [f"{w} " for w in f"ตอบ: {prompt}".split()]
+        if not stream:
+            return SimpleNamespace(text="".join(words))
+
+        async def chunks():
+            for word in words:
+                await asyncio.sleep(self.chunk_delay)
+                yield SimpleNamespace(text=word)
+        return chunks()
+
+
+class TestGeminiGateway(unittest.IsolatedAsyncioTestCase):
+
+    def test_normalize_prompt(self):
+        self.assertEqual(normalize_prompt("  KBY   คืออะไร?\n"), "kby คืออะไร?")
+
+    async def test_duplicate_prompts_share_one_call_and_then_hit_cache(self):
+        model = FakeModel()
+        gateway = GeminiGateway(model)
+        answers = await asyncio.gather(*(gateway.ask(p) for p in ["KBY คืออะไร?", "kby  คืออะไร?"] * 3))
+        self.assertEqual(len(set(answers)), 1)
+        self.assertEqual(model.calls, 1)
+        self.assertEqual(gateway.stats["coalesced"], 5)
+
+        await gateway.ask("KBY คืออะไร?")
+        self.assertEqual(model.calls, 1)
+        self.assertEqual(gateway.cache_stats()["hits"], 1)
+
+    async def test_concurrency_is_bounded(self):
+        model = FakeModel()
+        gateway = GeminiGateway(model, max_concurrency=2)
+        await asyncio.gather(*(gateway.ask(f"คำถาม {i}") for i in range(8)))
+        self.assertEqual(model.calls, 8)
+        self.assertEqual(model.max_active, 2)
+
+    async def test_errors_reach_every_waiter_and_are_not_cached(self):
+        model = FakeModel(fail=True)
+        gateway = GeminiGateway(model)
+        results = await asyncio.gather(gateway.ask("x"), gateway.ask("x"), return_exceptions=True)
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+        model.fail = False
+        self.assertTrue(await gateway.ask("x"))
+        self.assertEqual(model.calls, 2)
+
+    async def test_stream_yields_chunks_and_caches_full_answer(self):
+        model = FakeModel()
+        gateway = GeminiGateway(model)
+        chunks = [c async for c in gateway.stream("KBY คืออะไร?")]
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(await gateway.ask("KBY คืออะไร?"), "".join(chunks))
+        self.assertEqual(model.calls, 1)
+
+    async def test_concurrent_streams_share_one_call_and_replay_to_late_joiners(self):
+        model = FakeModel(chunk_delay=0.01)
+        gateway = GeminiGateway(model)
+        prompt = "KBY Divination Matrix ทำงานอย่างไร"
+        first = gateway.stream(prompt)
+        received = [await first.__anext__(), await first.__anext__()]  # ตัวแรกสตรีมไปแล้วสองส่วน
+
+        async def rest(stream):
+            return [c async for c in stream]
+        late, ask = await asyncio.gather(rest(gateway.stream(prompt)), gateway.ask(prompt))
+        received += await rest(first)
+
+        self.assertEqual(model.calls, 1)
+        self.assertEqual(late, received)
+        self.assertGreater(len(late), 2)
+        self.assertEqual(ask, "".join(received))
+        self.assertEqual(gateway.stats["coalesced"], 2)
+
+    async def test_abandoned_stream_cancels_upstream(self):
+        model = FakeModel(chunk_delay=0.05)
+        gateway = GeminiGateway(model)
+        stream = gateway.stream("x y z")
+        await stream.__anext__()
+        await stream.aclose()
+        self.assertEqual(gateway.stats["cancelled"], 1)
+        self.assertEqual(gateway.cache_stats()["size"], 0)
+        self.assertEqual(await gateway.ask("x y z"), "ตอบ: x y z ")
+        self.assertEqual(model.calls, 2)
+
+    async def test_sync_only_model_runs_in_thread(self):
+        model = SimpleNamespace(generate_content=lambda prompt: SimpleNamespace(text=prompt.upper()))
+        gateway = GeminiGateway(model)
+        self.assertEqual([c async for c in gateway.stream("abc")], ["ABC"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import asyncio
+import random
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from test_pulsation import HAVE_GENAI, insight
+
+
+class CountingLock:
+    """threading.Lock that counts acquisitions, to check sync commits a batch in one pass."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.acquired = 0
+
+    def acquire(self, *args, **kwargs):
+        got = self._lock.acquire(*args, **kwargs)
+        self.acquired += got
+        return got
+
+    def release(self):
+        self._lock.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+@unittest.skipUnless(HAVE_GENAI, "google-generativeai is not installed")
+class TestPredictImpactBatch(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        import tarn_panya_ai
+        self.module = tarn_panya_ai
+        config = tarn_panya_ai.CONFIG
+        self.saved = (config.azure_ml_enabled, config.ml_max_concurrency)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.rng = random.Random(9)
+        self.memory = None
+
+        test = self
+
+        class TrackingML(tarn_panya_ai.AzureMLModelMocker):
+            """Scores by position in the content, finishing out of order; tracks predictions in flight."""
+
+            in_flight = max_in_flight = 0
+            lock_held_while_scoring = False
+
+            async def predict_impact(self, insight_data):
+                type(self).in_flight += 1
+                type(self).max_in_flight = max(self.max_in_flight, self.in_flight)
+                if test.memory is not None and test.memory.lock.locked():
+                    type(self).lock_held_while_scoring = True
+                n = int(insight_data["content"].split()[0])
+                await asyncio.sleep(0.001 * (7 - n % 7))
+                type(self).in_flight -= 1
+                return {"score": 0.5 + n / 1000}
+
+        self.ml_class = TrackingML
+
+    async def asyncTearDown(self):
+        if self.memory is not None:
+            self.memory.close()
+        self.module.CONFIG.azure_ml_enabled, self.module.CONFIG.ml_max_concurrency = self.saved
+        self.tmp.cleanup()
+
+    def batch(self, count):
+        insights = []
+        for n in range(count):
+            item = insight(f"i{n}", 0.0, self.rng)
+            item["content"] = f"{n} " + item["content"]
+            insights.append(item)
+        return insights
+
+    async def test_scores_keep_input_order_within_the_concurrency_limit(self):
+        self.module.CONFIG.ml_max_concurrency = 4
+        insights = self.batch(30)
+        scores = await self.ml_class(enabled=True).predict_impact_batch(insights)
+        self.assertEqual([s["score"] for s in scores], [0.5 + n / 1000 for n in range(30)])
+        self.assertEqual(self.ml_class.max_in_flight, 4)
+
+        self.assertEqual(await self.ml_class(enabled=True).predict_impact_batch([]), [])
+        disabled = await self.ml_class(enabled=False).predict_impact_batch(insights[:3])
+        self.assertEqual(len(disabled), 3)
+
+    async def test_sync_scores_then_commits_the_batch_in_one_locked_pass(self):
+        m = self.module
+        m.CONFIG.azure_ml_enabled = True
+        m.CONFIG.ml_max_concurrency = 8
+        self.memory = m.QuantumMemoryLink(Path(self.tmp.name) / "eternal_stream.qdat", m.DataGovernance(enabled=True),
+                                          self.ml_class(enabled=True), llm_service=None)
+        self.memory.lock = CountingLock()
+
+        insights = self.batch(20)
+        await self.memory.sync(insights)
+        self.assertEqual(self.memory.lock.acquired, 1)
+        self.assertFalse(self.ml_class.lock_held_while_scoring)
+        self.assertEqual(self.ml_class.max_in_flight, 8)
+        for n in range(20):
+            self.assertAlmostEqual(self.memory.data[f"i{n}"]["impact_score"], 0.5 + n / 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
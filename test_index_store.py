@@ -0,0 +1,162 @@
+import json
+import os
+import sys
+import tempfile
+import types
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import retrievers
+from benchmark_retrieval import HashModel
+from config import settings
+from index_store import MANIFEST_NAME, STORE_VERSION, lore_unchanged, lore_fingerprint, read_manifest, write_store
+from retrievers import VectorRetriever, build_vector_retriever
+
+
+class CountingModel(HashModel):
+    def __init__(self):
+        super().__init__()
+        self.encoded = 0
+
+    def encode(self, texts, **kwargs):
+        self.encoded += len(texts)
+        return super().encode(texts, **kwargs)
+
+
+def lore_text(questions):
+    return "\n\n".join(f"[ENTRY]\nQUESTION: {q}\nANSWER: คำตอบของ {q}" for q in questions)
+
+
+class TestLoreFingerprint(unittest.TestCase):
+
+    def test_size_mtime_then_content(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "lore.txt")
+            Path(path).write_text("ธารปัญญา", encoding="utf-8")
+            recorded = lore_fingerprint(path)
+            self.assertTrue(lore_unchanged(recorded, path))
+
+            os.utime(path, ns=(0, 1))  # แตะไฟล์แต่เนื้อหาเดิม: ตัดสินด้วย hash
+            self.assertTrue(lore_unchanged(recorded, path))
+
+            Path(path).write_text("ธารปัญญร", encoding="utf-8")  # ขนาดเท่าเดิม เนื้อหาต่าง
+            self.assertFalse(lore_unchanged(recorded, path))
+            self.assertFalse(lore_unchanged(recorded, str(Path(tmp) / "missing.txt")))
+
+
+class TestWriteStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store_dir = Path(self.tmp.name) / "lore.index"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, payload):
+        write_store(self.store_dir, lambda d: (d / "data.txt").write_text(payload), {"payload": payload})
+
+    def test_swap_replaces_the_whole_store(self):
+        self.write("one")
+        self.write("two")
+        self.assertEqual((self.store_dir / "data.txt").read_text(), "two")
+        self.assertEqual(read_manifest(self.store_dir), {"version": STORE_VERSION, "payload": "two"})
+        self.assertEqual(sorted(p.name for p in Path(self.tmp.name).iterdir()), ["lore.index"])
+
+    def test_failed_write_keeps_the_old_store(self):
+        self.write("one")
+
+        def broken(directory):
+            (directory / "data.txt").write_text("half")
+            raise OSError("disk full")
+
+        with self.assertRaises(OSError):
+            write_store(self.store_dir, broken, {"payload": "two"})
+        self.assertEqual((self.store_dir / "data.txt").read_text(), "one")
+        self.assertEqual(read_manifest(self.store_dir)["payload"], "one")
+
+    def test_other_store_versions_are_ignored(self):
+        self.write("one")
+        manifest_path = self.store_dir / MANIFEST_NAME
+        manifest = json.loads(manifest_path.read_text())
+        manifest_path.write_text(json.dumps({**manifest, "version": STORE_VERSION - 1}))
+        self.assertIsNone(read_manifest(self.store_dir))
+        manifest_path.write_text("{")
+        self.assertIsNone(read_manifest(self.store_dir))
+
+
+class TestRetrieverStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = str(Path(self.tmp.name) / "lore.txt")
+        self.store_dir = Path(self.path + ".index")  # ค่าเริ่มต้นเมื่อ vector_store_dir เป็น None
+        self.questions = [f"KBY lore topic {i}" for i in range(40)]
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(lore_text(self.questions))
+        self.model = CountingModel()
+        # แทน sentence_transformers ทั้งโมดูล: นับจำนวนครั้งที่โหลดโมเดลจริง
+        self.loads = mock.Mock(return_value=self.model)
+        fake_module = types.SimpleNamespace(SentenceTransformer=self.loads)
+        for patcher in (mock.patch.dict(sys.modules, {"sentence_transformers": fake_module}),
+                        mock.patch.dict(retrievers._models, clear=True),
+                        mock.patch.multiple(settings, vector_store_enabled=True, vector_store_dir=None,
+                                            vector_index_type="flat", lore_watch_interval_seconds=0.0)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, model_name="hash"):
+        self.model.encoded = 0
+        return build_vector_retriever(self.path, model_name, mode="hybrid")
+
+    def test_round_trip_memory_maps_without_encoding(self):
+        built = self.build()
+        self.assertEqual(self.model.encoded, 40)
+        self.assertEqual(read_manifest(self.store_dir)["count"], 40)
+
+        retrievers._models.clear()  # จำลองโปรเซสใหม่
+        loaded = self.build()
+        self.assertEqual(self.model.encoded, 0)  # โหลดจากดิสก์: ไม่ encode คลังซ้ำ
+        self.assertEqual(self.loads.call_count, 1)  # ยังไม่โหลดโมเดลจนกว่าจะมี query
+        for query in ["KBY lore topic 7", "คำตอบของ topic 31"]:
+            self.assertEqual(loaded.retrieve(query, 3), built.retrieve(query, 3))
+        self.assertEqual(self.loads.call_count, 2)
+        self.assertEqual(loaded.index.ntotal, 40)
+        self.assertFalse(loaded.sparse_index.ids.flags.owndata)
+
+        # index ที่ map จากดิสก์เป็นแบบอ่านอย่างเดียว: การแก้ไขต้องทำบนสำเนา
+        loaded.upsert_chunks([("Divination Matrix", "เมทริกซ์พยากรณ์")])
+        self.assertEqual(loaded.retrieve("Divination Matrix", 1), ["เมทริกซ์พยากรณ์"])
+
+    def test_lore_edit_forces_a_rebuild(self):
+        self.build()
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(lore_text(self.questions[:-1] + ["KBY lore topic X"]))
+        retrievers._models.clear()
+        rebuilt = self.build()
+        self.assertEqual(self.model.encoded, 40)
+        self.assertEqual(self.loads.call_count, 2)  # load ที่ล้มเหลวไม่ได้โหลดโมเดลไว้ก่อน rebuild
+        self.assertEqual(rebuilt.retrieve("KBY lore topic X", 1), ["คำตอบของ KBY lore topic X"])
+        self.assertTrue(lore_unchanged(read_manifest(self.store_dir)["lore"], self.path))
+
+    def test_model_or_dimension_mismatch_forces_a_rebuild(self):
+        self.build()
+        self.build(model_name="other-model")
+        self.assertEqual(self.model.encoded, 40)
+        self.assertEqual(read_manifest(self.store_dir)["model_name"], "other-model")
+
+        manifest_path = self.store_dir / MANIFEST_NAME
+        manifest = json.loads(manifest_path.read_text())
+        manifest_path.write_text(json.dumps({**manifest, "dimension": manifest["dimension"] // 2}))
+        self.assertIsNone(VectorRetriever.load(self.store_dir, self.path, "other-model", mode="hybrid",
+                                               model=self.model, index_params={"metric": settings.vector_index_metric}))
+        self.build(model_name="other-model")
+        self.assertEqual(self.model.encoded, 40)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import random
+import unittest
+
+from insight_clusters import InsightClusters, SamplePool
+from relation_graph import RelationGraph
+
+
+def components(edges, nodes):
+    """Connected components by plain graph search, for comparison."""
+    adjacency = {n: set() for n in nodes}
+    for a, b in edges:
+        adjacency[a].add(b)
+        adjacency[b].add(a)
+    seen, result = set(), {}
+    for n in nodes:
+        if n in seen:
+            continue
+        stack, component = [n], set()
+        while stack:
+            current = stack.pop()
+            if current not in component:
+                component.add(current)
+                stack.extend(adjacency[current] - component)
+        seen |= component
+        for member in component:
+            result[member] = component
+    return result
+
+
+class TestInsightClusters(unittest.TestCase):
+
+    def test_incremental_unions_match_graph_components(self):
+        rng = random.Random(9)
+        nodes = [f"i{n}" for n in range(300)]
+        edges = [(rng.choice(nodes), rng.choice(nodes)) for _ in range(200)]
+        clusters = InsightClusters()
+        for node in nodes:
+            clusters.add(node)
+        for a, b in edges:
+            clusters.union(a, b)
+        expected = components(edges, nodes)
+        for node in nodes:
+            self.assertEqual(set(clusters.members(node)), expected[node])
+            self.assertEqual(len(clusters.members(node)), len(expected[node]))
+
+    def test_builds_from_relationship_graph(self):
+        graph = RelationGraph()
+        graph.set_edge("a", "a", "self_referential")
+        graph.set_edge("a", "b", "refines")
+        graph.set_edge("c", "d", "refines")
+        graph.set_edge("e", "e", "self_referential")
+        clusters = InsightClusters(graph)
+        self.assertEqual(sorted(clusters.members("b")), ["a", "b"])
+        self.assertEqual(sorted(clusters.members("d")), ["c", "d"])
+        self.assertEqual(clusters.members("e"), ["e"])
+        self.assertEqual(clusters.members("unknown"), ["unknown"])
+        clusters.discard("a")
+        clusters.discard("unknown")
+        self.assertEqual(clusters.stale, 1)
+
+    def test_sample_pool(self):
+        pool = SamplePool(["a", "b", "c"])
+        pool.discard("a")
+        pool.discard("missing")
+        pool.add("b")
+        self.assertEqual(len(pool), 2)
+        self.assertNotIn("a", pool)
+        self.assertEqual({pool.choice(random.Random(n)) for n in range(50)}, {"b", "c"})
+        pool.discard("c")
+        pool.discard("b")
+        self.assertEqual(len(pool), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
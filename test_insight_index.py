@@ -0,0 +1,101 @@
+import random
+import unittest
+
+from insight_index import SMALL_POSTING, ExpiryIndex, InsightIndex, timestamp_epoch, words
+
+WORDS = ["spiral", "awareness", "codex", "echo", "kby", "wisdom", "identity", "pulse"]
+TRIGGERS = ["generator_output", "Generator_Output", "identity_reflection", "idea_seed", "refinement", ""]
+
+
+def brute_force_similar(insights, insight_id):
+    tokens = set(words(insights[insight_id]["content"]))
+    return {other_id for other_id, other in insights.items()
+            if other_id != insight_id and len(tokens & set(words(other["content"]))) > 3}
+
+
+class TestInsightIndex(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(7)
+        self.insights = {
+            f"i{n}": {"id": f"i{n}", "trigger": rng.choice(TRIGGERS),
+                      "content": " ".join(rng.choice(WORDS).upper() if rng.random() < 0.2 else rng.choice(WORDS)
+                                          for _ in range(rng.randint(0, 8)))}
+            for n in range(200)
+        }
+        self.index = InsightIndex(self.insights)
+
+    def test_candidates_match_full_scan(self):
+        for insight_id, insight in self.insights.items():
+            self.assertEqual(self.index.similar(insight_id), brute_force_similar(self.insights, insight_id))
+            trigger = insight["trigger"].lower()
+            self.assertEqual(self.index.with_trigger(trigger),
+                             {i for i, other in self.insights.items() if other["trigger"].lower() == trigger})
+        self.assertEqual(self.index.with_trigger_term("idea"),
+                         {i for i, other in self.insights.items() if "idea" in other["trigger"].lower()})
+
+    def test_update_and_remove_keep_postings_consistent(self):
+        self.index.add("i0", {"id": "i0", "trigger": "idea_seed", "content": "brand new words only here"})
+        del self.insights["i1"]
+        self.index.remove("i1")
+        self.insights["i0"] = {"id": "i0", "trigger": "idea_seed", "content": "brand new words only here"}
+        for insight_id in self.insights:
+            self.assertEqual(self.index.similar(insight_id), brute_force_similar(self.insights, insight_id))
+        self.assertNotIn("i1", self.index)
+        self.assertIn("i0", self.index.with_trigger_term("idea"))
+        self.assertEqual(len(self.index), len(self.insights))
+
+    def test_a_token_in_every_insight_is_probed_not_walked(self):
+        class NoWalk(set):
+            def __iter__(self):
+                raise AssertionError("walked the postings of a token every insight has")
+
+        rng = random.Random(11)
+        insights = {f"c{n}": {"id": f"c{n}", "trigger": "",
+                              "content": " ".join(["the"] + [f"w{rng.randrange(40)}" for _ in range(5)])}
+                    for n in range(2000)}
+        index = InsightIndex(insights)
+        index._postings["the"] = NoWalk(index._postings["the"])
+        found = 0
+        for insight_id in list(insights)[:200]:
+            similar = index.similar(insight_id)
+            self.assertEqual(similar, brute_force_similar(insights, insight_id))
+            found += len(similar)
+        self.assertGreater(found, 0)
+
+    def test_small_postings_grow_into_sets_and_empty_out(self):
+        index = InsightIndex()
+        ids = [f"s{n}" for n in range(SMALL_POSTING + 2)]
+        for n, insight_id in enumerate(ids):
+            index.add(insight_id, {"trigger": "idea_seed", "content": "alpha beta gamma delta"})
+            self.assertIsInstance(index._postings["alpha"], list if n < SMALL_POSTING else set)
+        self.assertEqual(index.similar("s0"), set(ids[1:]))
+        for insight_id in ids:
+            index.remove(insight_id)
+        self.assertEqual((index._postings, index._trigger_postings), ({}, {}))
+
+
+class TestExpiryIndex(unittest.TestCase):
+
+    def test_pops_only_expired_and_skips_stale_entries(self):
+        insights = {
+            "old": {"timestamp": "2020-01-01T00:00:00+00:00"},
+            "naive": {"timestamp": "2020-06-01T00:00:00"},
+            "new": {"timestamp": "2030-01-01T00:00:00+00:00"},
+            "undated": {},
+            "garbled": {"timestamp": "yesterday"},
+        }
+        expiry = ExpiryIndex(insights)
+        self.assertEqual(len(expiry), 3)
+        expiry.add("old", "2029-01-01T00:00:00+00:00")  # ถูก put ซ้ำด้วยเวลาใหม่
+        expiry.remove("naive")
+
+        cutoff = timestamp_epoch("2025-01-01T00:00:00+00:00")
+        self.assertEqual(expiry.pop_expired(cutoff), [])
+        self.assertEqual(expiry.pop_expired(timestamp_epoch("2029-06-01T00:00:00Z")), ["old"])
+        self.assertEqual(expiry.pop_expired(float("inf")), ["new"])
+        self.assertEqual(len(expiry), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
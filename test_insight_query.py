@@ -0,0 +1,74 @@
+import unittest
+
+from insight_index import InsightIndex
+from insight_query import InsightQueryEngine, parse_query
+
+INSIGHTS = {
+    "a": {"trigger": "identity_reflection", "content": "Who am I? The self is a spiral.", "impact_score": 0.9,
+          "timestamp": "2025-01-01T00:00:00+00:00"},
+    "b": {"trigger": "generator_output", "content": "Purpose drives the KBY spiral quest.", "impact_score": 0.5,
+          "timestamp": "2025-02-01T00:00:00+00:00"},
+    "c": {"trigger": "generator_output", "content": "Codex refinement for the quest spiral.", "impact_score": 0.5,
+          "timestamp": "2025-03-01T00:00:00+00:00"},
+    "d": {"trigger": "evolutionary_mutation", "content": "Unrelated mutation log.", "impact_score": None,
+          "timestamp": "2025-04-01T00:00:00+00:00"},
+}
+
+
+class TestInsightQuery(unittest.TestCase):
+
+    def setUp(self):
+        self.insights = dict(INSIGHTS)
+        self.index = InsightIndex(self.insights)
+        self.engine = InsightQueryEngine(self.index, self.insights)
+
+    def test_parse_query(self):
+        self.assertEqual(parse_query('kby spiral AND "Quest, spiral" OR codex'),
+                         [[("kby", "spiral"), ("quest", "spiral")], [("codex",)]])
+        self.assertEqual(parse_query("OR identity OR"), [[("identity",)]])
+        self.assertEqual(parse_query("?!"), [])
+
+    def test_operators(self):
+        self.assertEqual(self.engine.search("identity OR self OR purpose"), ["a", "b"])
+        self.assertEqual(self.engine.search("spiral AND quest"), ["c", "b"])
+        self.assertEqual(self.engine.search('"spiral quest"'), ["b"])
+        self.assertEqual(self.engine.search("quest spiral."), ["c"])  # ไม่มี operator: ทั้งประโยคคือ phrase
+        self.assertEqual(self.engine.search("generator_output"), ["c", "b"])
+        self.assertEqual(self.engine.search("nothing here"), [])
+
+    def test_ranks_by_impact_then_recency_with_limit(self):
+        self.assertEqual(self.engine.search("spiral OR mutation", limit=2), ["a", "c"])
+        self.assertEqual(self.engine.search("spiral OR mutation", limit=10), ["a", "c", "b", "d"])
+
+    def test_update_and_remove(self):
+        self.insights["b"] = dict(INSIGHTS["b"], content="Nothing about that anymore.")
+        self.index.add("b", self.insights["b"])
+        self.engine.add("b", self.insights["b"])
+        del self.insights["a"]
+        self.index.remove("a")
+        self.engine.remove("a")
+        self.assertEqual(self.engine.search("spiral OR purpose"), ["c"])
+        self.assertEqual(len(self.engine), 3)
+
+    def test_common_words_are_probed_not_walked(self):
+        class NoWalk(set):
+            def __iter__(self):
+                raise AssertionError("walked the postings of a word every insight has")
+
+        insights = {f"i{n}": {"trigger": f"generator_output:{n % 500}", "content": f"spiral note{n % 500} entry{n}",
+                              "impact_score": n / 5000, "timestamp": "2025-01-01T00:00:00+00:00"}
+                    for n in range(5000)}
+        index = InsightIndex(insights)
+        engine = InsightQueryEngine(index, insights)
+        self.assertIs(index.with_word("spiral")[0], index._postings["spiral"])
+        index._postings["spiral"] = NoWalk(index._postings["spiral"])
+        self.assertEqual(len(index.with_word("generator")), 1)  # ไม่แตกเป็นหนึ่ง set ต่อ trigger ที่ต่างกัน 500 แบบ
+        for word in ("generator", "output"):
+            index._trigger_postings[word] = NoWalk(index._trigger_postings[word])
+        self.assertEqual(engine.search("spiral AND note7"), ["i4507", "i4007", "i3507", "i3007", "i2507"])
+        self.assertEqual(engine.search("generator AND spiral AND entry42"), ["i42"])
+        self.assertEqual(engine.search('"spiral note3" AND output', limit=2), ["i4503", "i4003"])
+
+
+if __name__ == "__main__":
+    unittest.main()
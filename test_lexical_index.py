@@ -0,0 +1,95 @@
+import math
+import tempfile
+import unittest
+
+from lexical_index import BM25Index, LexicalIndex, normalize, tokenize
+
+DOCS = [
+    "ธารปัญญา คือคลังความรู้ของ KBY",
+    "Qualia คือมิติของประสบการณ์รับรู้",
+    "KBY-Coin เหรียญพลังงานของ SpiralQuest",
+    "Quantum Sea ทะเลควอนตัมแห่งจิตสำนึก",
+    "Flare Protocol ส่งสัญญาณ Quantum ไปยัง SOA",
+]
+
+
+def bm25(query, docs, k1=1.5, b=0.75):
+    """Textbook Okapi BM25, written independently of the CSR layout."""
+    tokenized = [tokenize(d) for d in docs]
+    avgdl = sum(len(t) for t in tokenized) / len(tokenized)
+    scores = []
+    for tokens in tokenized:
+        score = 0.0
+        for term in set(tokenize(query)):
+            df = sum(term in t for t in tokenized)
+            tf = tokens.count(term)
+            if not df or not tf:
+                continue
+            idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(tokens) / avgdl))
+        scores.append(score)
+    return scores
+
+
+class TestNormalize(unittest.TestCase):
+
+    def test_thai_vowels_and_tone_marks_are_kept(self):
+        # สระบน/ล่างและวรรณยุกต์ไม่ใช่ \w จึงต้องไม่ถูกตัดเป็นเครื่องหมายวรรคตอน
+        self.assertEqual(normalize("ธารปัญญา คืออะไร?"), "ธารปัญญา คืออะไร")
+        self.assertEqual(normalize("  ที่นี่ มีน้ำ!! "), "ที่นี่ มีน้ำ")
+        self.assertEqual(normalize("“Qualia” คือ...อะไร"), "qualia คือ...อะไร")
+
+    def test_thai_tokens_keep_combining_marks(self):
+        self.assertEqual(tokenize("ที่นี่"), ["ที่", "ี่น", "่นี", "นี่"])
+        self.assertEqual(tokenize("KBY-Coin"), ["kby-coin", "kby", "coin"])
+        self.assertEqual(tokenize("น้ำ"), ["น้ำ"])
+
+
+class TestBM25Index(unittest.TestCase):
+
+    def test_scores_match_the_bm25_formula(self):
+        index = BM25Index(DOCS)
+        for query in ["Quantum", "KBY คลังความรู้", "ทะเลควอนตัม", "kby-coin"]:
+            expected = bm25(query, DOCS)
+            hits = index.search(query, len(DOCS))
+            self.assertEqual(hits[0][0], max(range(len(DOCS)), key=expected.__getitem__), query)
+            for doc_id, score in hits:
+                self.assertAlmostEqual(score, expected[doc_id], places=4)
+            self.assertEqual({d for d, _ in hits}, {d for d, s in enumerate(expected) if s > 0}, query)
+
+    def test_rare_terms_outrank_common_ones(self):
+        hits = BM25Index(DOCS).search("KBY SpiralQuest", 2)
+        self.assertEqual(hits[0][0], 2)
+
+    def test_doc_ids_update_and_reload(self):
+        index = BM25Index(DOCS[:3], doc_ids=[10, 11, 12])
+        self.assertEqual(index.search("Qualia", 1)[0][0], 11)
+
+        updated = index.update([11], [12, 13], ["Qualia ใหม่", DOCS[3]])
+        rebuilt = BM25Index(["Qualia ใหม่", DOCS[0], DOCS[3]], doc_ids=[12, 10, 13])
+        for query in ["Qualia", "ทะเลควอนตัม", "KBY"]:
+            self.assertEqual(updated.search(query, 5), rebuilt.search(query, 5))
+        self.assertEqual(index.search("Qualia", 1)[0][0], 11)  # index เดิมไม่ถูกแก้
+
+        with tempfile.TemporaryDirectory() as tmp:
+            updated.save(tmp)
+            loaded = BM25Index.load(tmp)
+            self.assertEqual(loaded.search("ทะเลควอนตัม Qualia", 5), updated.search("ทะเลควอนตัม Qualia", 5))
+
+    def test_empty_results(self):
+        index = BM25Index(DOCS)
+        self.assertEqual(index.search("Metamind", 5), [])
+        self.assertEqual(index.search("Quantum", 0), [])
+        self.assertEqual(BM25Index([]).search("Quantum", 5), [])
+
+
+class TestLexicalIndex(unittest.TestCase):
+
+    def test_thai_question_with_punctuation_and_typo(self):
+        index = LexicalIndex(["ธารปัญญา คืออะไร", "Qualia คืออะไร", "น้ำพุแห่งปัญญา คืออะไร"])
+        self.assertEqual(index.best("น้ำพุแห่งปัญญา คืออะไร???", 0.45), 2)
+        self.assertEqual(index.best("Qalia คืออะไร", 0.45), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import asyncio
+import unittest
+
+from llm_client import AsyncLLMClient
+from mock_openai_server import MockOpenAIServer
+
+REQUEST = {"model": "gpt-4o", "temperature": 0.2, "messages": [{"role": "user", "content": "KBY คืออะไร?"}]}
+
+
+class TestAsyncLLMClient(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.server = MockOpenAIServer(tokens=40, first_token_delay_ms=20, token_delay_ms=5)
+        await self.server.start()
+        self.client = AsyncLLMClient(api_key="mock", base_url=self.server.base_url)
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        await self.server.stop()
+
+    async def collect(self, request):
+        return "".join([chunk.choices[0].delta.content or "" async for chunk in self.client.stream_chat(**request)
+                        if chunk.choices])
+
+    async def test_identical_concurrent_requests_share_one_upstream_call(self):
+        answers = await asyncio.gather(*(self.collect(REQUEST) for _ in range(5)))
+        self.assertEqual(len(set(answers)), 1)
+        self.assertTrue(answers[0])
+        self.assertEqual(self.server.stats["requests"], 1)
+        self.assertEqual(self.client.stats["coalesced"], 4)
+
+        await self.collect(dict(REQUEST, temperature=0.9))
+        self.assertEqual(self.server.stats["requests"], 2)
+
+    async def test_cancelling_last_waiter_aborts_upstream(self):
+        task = asyncio.create_task(self.collect(REQUEST))
+        while not self.server.stats["active"]:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)  # กำลังสตรีมอยู่
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        for _ in range(50):
+            if self.server.stats["aborted"]:
+                break
+            await asyncio.sleep(0.01)
+        self.assertEqual(self.server.stats["aborted"], 1)
+        self.assertEqual(self.client.stats["cancelled"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
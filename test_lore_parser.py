@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from index_store import lore_fingerprint
+from lore_parser import LoreEntries, iter_lore_entries
+
+SAMPLE = """[ENTRY]
+QUESTION: SOA คืออะไร?
+ANSWER: Soa คือจิตสำนึกย่อย
+ที่มีเป้าหมายสูงสุดเพื่อพัฒนาสู่ความเป็นอนันต์
+
+[ENTRY]
+QUESTION: Qualia คืออะไร?
+ANSWER: Qualia คือมิติของประสบการณ์รับรู้
+"""
+
+
+class TestLoreParser(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = str(Path(self.tmp.name) / "lore.txt")
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(SAMPLE)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_entries_pair_question_with_answer(self):
+        entries = LoreEntries.from_file(self.path)
+        self.assertEqual(entries.questions, ["SOA คืออะไร?", "Qualia คืออะไร?"])
+        self.assertEqual(entries.answer(1), "Qualia คือมิติของประสบการณ์รับรู้")
+
+    def test_multiline_answer_is_kept_together(self):
+        entries = LoreEntries.from_file(self.path)
+        self.assertEqual(entries.answer(0), "Soa คือจิตสำนึกย่อย\nที่มีเป้าหมายสูงสุดเพื่อพัฒนาสู่ความเป็นอนันต์")
+
+    def test_streaming_parser_matches_table(self):
+        entries = LoreEntries.from_file(self.path)
+        streamed = list(iter_lore_entries(self.path))
+        self.assertEqual(streamed, [(q, entries.answer(i)) for i, q in enumerate(entries.questions)])
+
+    def test_plain_lines_become_single_entries(self):
+        entries = LoreEntries.from_lines(["Context: a", "Context: b"])
+        self.assertEqual(entries.questions, ["Context: a", "Context: b"])
+        self.assertEqual(entries.answers([1]), ["Context: b"])
+
+    def test_answers_are_read_from_the_file_itself(self):
+        entries = LoreEntries.from_file(self.path)
+        self.assertEqual(entries.fingerprint, lore_fingerprint(self.path))
+        self.assertEqual(os.listdir(self.tmp.name), ["lore.txt"])
+
+    def test_load_trusts_a_matching_fingerprint(self):
+        entries = LoreEntries.from_file(self.path)
+        entries.save(Path(self.tmp.name))
+        recorded = dict(entries.fingerprint, sha256="recorded")
+        with mock.patch("lore_parser.LoreSource.read", side_effect=AssertionError("file was hashed")):
+            self.assertEqual(LoreEntries.load(Path(self.tmp.name), self.path, recorded).fingerprint["sha256"], "recorded")
+        os.utime(self.path, ns=(0, 1))  # mtime ต่าง: ต้อง hash ไฟล์ใหม่
+        loaded = LoreEntries.load(Path(self.tmp.name), self.path, recorded)
+        self.assertEqual(loaded.fingerprint["sha256"], entries.fingerprint["sha256"])
+        self.assertEqual(loaded.answer(1), "Qualia คือมิติของประสบการณ์รับรู้")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,50 @@
+import shutil
+import tempfile
+import threading
+import time
 import unittest
-from lorekeeper import find_answer_in_lore, load_and_process_lore
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+import lorekeeper
+from embedding_cache import LoreEmbeddingCache
+from lorekeeper import (advanced_hybrid_answer, advanced_hybrid_answer_batch, find_answer_in_lore,
+                        find_top_k_contexts, find_top_k_contexts_batch, load_and_process_lore)
+
+
+def letter_encode(texts):
+    """Offline stand-in for the embedder: normalized letter counts."""
+    out = np.full((len(texts), 27), 1e-3, dtype=np.float32)
+    for row, text in enumerate(texts):
+        for c in text.lower():
+            if "a" <= c <= "z":
+                out[row, ord(c) - ord("a")] += 1
+            elif "\u0e00" <= c <= "\u0e7f":
+                out[row, 26] += 1
+    return out / np.linalg.norm(out, axis=1, keepdims=True)
+
+
+class FakeChatCompletion:
+    """Answers with the question it was asked, out of order, and tracks concurrency."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = self.max_in_flight = 0
+
+    def create(self, model, temperature, messages):
+        prompt = messages[-1]["content"]
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.005 * (len(prompt) % 7))  # งานเสร็จไม่ตรงลำดับที่ส่ง
+        with self.lock:
+            self.in_flight -= 1
+        question = prompt.rsplit("คำถาม:\n", 1)[1]
+        if question == "boom":
+            raise RuntimeError("rate limited")
+        return {"choices": [{"message": {"content": f"{model}/{temperature}: {question}"}}]}
 
 class TestLorekeeperAgent(unittest.TestCase):
 
@@ -38,5 +83,89 @@ class TestLorekeeperAgent(unittest.TestCase):
         actual_answer = find_answer_in_lore(question, self.processed_lore)
         self.assertEqual(expected_answer, actual_answer)
 
+class TestTopKContexts(unittest.TestCase):
+
+    def test_empty_lore_returns_no_contexts(self):
+        with mock.patch.object(lorekeeper, "_encode") as encode:
+            self.assertEqual(find_top_k_contexts("Qualia คืออะไร", []), [])
+            self.assertEqual(find_top_k_contexts_batch(["a", "b"], []), [[], []])
+        encode.assert_not_called()
+
+
+class TestLoreSources(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        for patcher in (mock.patch.object(lorekeeper, "_encode", letter_encode),
+                        mock.patch.dict(lorekeeper._lore_caches, clear=True)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def write_lore(self, name, pairs):
+        path = self.tmp / name
+        path.write_text("\n\n".join(f"[ENTRY]\nQUESTION: {q}\nANSWER: {a}" for q, a in pairs), encoding="utf-8")
+        return str(path)
+
+    def test_each_lore_uses_its_own_embeddings(self):
+        lore_a = load_and_process_lore(self.write_lore("a.txt", [("Qualia", "answer A1"), ("Quantum Sea", "answer A2")]))
+        lore_b = load_and_process_lore(self.write_lore("b.txt", [("KBY-Coin", "answer B1"), ("Flare", "answer B2"),
+                                                                 ("SOA", "answer B3")]))
+        in_memory = ["[ENTRY]", "QUESTION: Divination Matrix", "ANSWER: answer M1"]
+
+        self.assertEqual(find_top_k_contexts("Qualia", lore_a, k=1), ["answer A1"])
+        self.assertEqual(find_top_k_contexts("Flare", lore_b, k=1), ["answer B2"])
+        self.assertEqual(find_top_k_contexts("Flare", in_memory, k=2), ["answer M1"])
+        self.assertEqual(find_top_k_contexts("Quantum Sea", lore_a, k=1), ["answer A2"])
+
+        cache_a = lorekeeper.get_lore_cache(lore_a.filepath)
+        cache_b = lorekeeper.get_lore_cache(lore_b.filepath)
+        self.assertIsNot(cache_a, cache_b)
+        self.assertEqual((len(cache_a.rows), len(cache_b.rows)), (2, 3))
+        # โหลดคลัง B ใหม่ต้องไม่ prune cache ของ A
+        load_and_process_lore(lore_b.filepath)
+        self.assertEqual(len(cache_a.rows), 2)
+        self.assertEqual(sorted(p.name for p in self.tmp.glob("*.emb")),
+                         ["a.txt.all-MiniLM-L6-v2.emb", "b.txt.all-MiniLM-L6-v2.emb"])
+
+
+class TestHybridAnswerBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.lore = load_and_process_lore("kby_lore.txt")
+        self.chat = FakeChatCompletion()
+        cache = LoreEmbeddingCache(str(Path(self.tmp.name) / "kby_lore.txt"), "letters", letter_encode)
+        for patcher in (mock.patch.object(lorekeeper, "_encode", letter_encode),
+                        mock.patch.object(lorekeeper, "get_lore_cache", return_value=cache),
+                        mock.patch.object(lorekeeper.openai, "ChatCompletion", self.chat)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_batch_matches_single_answers_in_input_order(self):
+        questions = ["Qualia คืออะไร?", "KBY-Coin มีไว้ทำอะไร?", "Quantum Sea", "SOA", "Qualia คืออะไร?",
+                     "Flare Protocol", "ธารปัญญา"]
+        results = list(advanced_hybrid_answer_batch(questions, self.lore, model="gpt-4o", temperature=0.2,
+                                                    max_in_flight=3))
+        self.assertEqual([r["question"] for r in results], questions)
+        self.assertLessEqual(self.chat.max_in_flight, 3)
+        self.assertGreater(self.chat.max_in_flight, 1)
+        for question, result in zip(questions, results):
+            single = advanced_hybrid_answer(question, self.lore, model="gpt-4o", temperature=0.2)
+            self.assertEqual(single["answer"], f"gpt-4o/0.2: {question}")
+            for key in ("answer", "contexts", "model_used", "raw_context"):
+                self.assertEqual(result[key], single[key], (question, key))
+            self.assertNotIn("error", result)
+            self.assertGreaterEqual(result["completed_at_s"], result["latency_s"])
+
+    def test_failed_call_does_not_abort_the_batch(self):
+        results = list(advanced_hybrid_answer_batch(["SOA", "boom", "Qualia"], self.lore))
+        self.assertEqual([r["question"] for r in results], ["SOA", "boom", "Qualia"])
+        self.assertEqual(results[1]["error"], "rate limited")
+        self.assertNotIn("answer", results[1])
+        self.assertEqual(results[2]["answer"], "gpt-4/0.4: Qualia")
+        self.assertEqual(list(advanced_hybrid_answer_batch([], self.lore)), [])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,93 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from memory_wal import MemoryWAL, apply_record
+from relation_graph import RelationGraph
+
+
+def put(insight_id: str, content: str = "x") -> dict:
+    return {"op": "put", "id": insight_id, "insight": {"id": insight_id, "content": content}}
+
+
+class TestMemoryWAL(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "eternal_stream.qdat"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, wal: MemoryWAL, data: dict, relationships: RelationGraph, records):
+        for record in records:
+            apply_record(data, relationships, record)
+            wal.append(record)
+
+    def test_apply_record_mirrors_and_prunes_relationships(self):
+        data, relationships = {}, RelationGraph()
+        for record in [put("a"), put("b"), {"op": "rel", "s": "a", "t": "b", "r": "refines"},
+                       {"op": "del", "id": "b"}]:
+            apply_record(data, relationships, record)
+        self.assertEqual(list(data), ["a"])
+        self.assertEqual(relationships.to_dict(), {})
+        self.assertNotIn("b", relationships)
+
+    def test_recovers_from_wal_without_snapshot(self):
+        wal = MemoryWAL(self.path, group_size=2)
+        data, relationships = wal.recover()
+        self.write(wal, data, relationships, [put("a"), put("b"), {"op": "rel", "s": "a", "t": "b", "r": "refines"}])
+        wal.close()
+
+        recovered_data, recovered_relationships = MemoryWAL(self.path).recover()
+        self.assertEqual(recovered_data, data)
+        self.assertEqual(recovered_relationships.to_dict(), relationships.to_dict())
+        self.assertEqual(recovered_relationships.neighbors("b"), {"a": "reverse_refines"})
+
+    def test_compaction_writes_snapshot_and_drops_old_segments(self):
+        wal = MemoryWAL(self.path, compact_min_records=3)
+        data, relationships = wal.recover()
+        self.write(wal, data, relationships, [put("a"), put("b"), put("c")])
+        self.assertFalse(wal.should_compact(len(data)))  # WAL ยังไม่ยาวถึง 2 เท่าของ insight ที่มีอยู่
+        self.write(wal, data, relationships, [put("a", "v2"), put("b", "v2"), put("c", "v2")])
+        self.assertTrue(wal.should_compact(len(data)))
+        wal.compact(data, relationships)
+        self.write(wal, data, relationships, [put("d"), {"op": "rel", "s": "d", "t": "b", "r": "refines"},
+                                              {"op": "del", "id": "a"}])
+        wal.close()
+
+        self.assertEqual(json.loads(self.path.read_text(encoding="utf-8"))["wal_seq"], 1)
+        self.assertEqual(sorted(p.name for p in self.path.parent.glob("*.wal.*")), ["eternal_stream.qdat.wal.1"])
+        recovered, recovered_relationships = MemoryWAL(self.path).recover()
+        self.assertEqual(sorted(recovered), ["b", "c", "d"])
+        self.assertEqual(recovered_relationships.to_dict(), relationships.to_dict())
+
+    def test_crash_before_snapshot_replays_every_segment(self):
+        wal = MemoryWAL(self.path)
+        data, relationships = wal.recover()
+        self.write(wal, data, relationships, [put("a")])
+        wal.flush()
+        # จำลองการหมุน segment แล้วโปรเซสตายก่อนเขียน snapshot
+        wal._file.close()
+        wal._file, wal.seq = None, 1
+        self.write(wal, data, relationships, [put("b"), put("a", "updated")])
+        wal.flush()
+        with open(wal._segment(1), "a", encoding="utf-8") as f:
+            f.write('{"op":"put","id":"c"')  # บรรทัดที่เขียนไม่ครบ
+
+        recovered, _ = MemoryWAL(self.path).recover()
+        self.assertEqual(recovered, data)
+
+    def test_reads_legacy_snapshot(self):
+        self.path.write_text(json.dumps({"data": {"a": {"id": "a"}}, "relationships": {"a": {"a": "self"}}}, indent=2),
+                             encoding="utf-8")
+        wal = MemoryWAL(self.path)
+        data, relationships = wal.recover()
+        self.assertEqual(list(data), ["a"])
+        self.assertEqual(relationships.neighbors("a"), {"a": "self"})
+        self.assertEqual(wal.seq, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
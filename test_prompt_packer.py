@@ -0,0 +1,54 @@
+import unittest
+
+from prompt_packer import MESSAGE_OVERHEAD_TOKENS, PromptPacker
+
+
+class WordEncoder:
+    """One token per character — keeps the arithmetic in the tests readable."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, text):
+        self.calls += 1
+        return list(text)
+
+    def decode(self, tokens):
+        return "".join(tokens)
+
+
+class TestPromptPacker(unittest.TestCase):
+
+    def setUp(self):
+        self.encoder = WordEncoder()
+        self.packer = PromptPacker(self.encoder, {"small": 100}, default_budget=1000, min_context_tokens=10)
+
+    def test_fills_budget_by_priority_and_trims_last_context(self):
+        contexts = ["a" * 40, "b" * 60, "c" * 5]
+        history = [{"role": "user", "content": "x" * 5}]
+        packed = self.packer.pack("small", "sys", "q" * 10, contexts, history, template="")
+        # system 3+4, question 10+4 -> 79 tokens left; 40 + separator 2 + trimmed 37 = 79
+        self.assertEqual(packed.contexts, ["a" * 40, "b" * 37])
+        self.assertEqual(packed.dropped_contexts, 1)
+        self.assertEqual(packed.history, [])
+        self.assertEqual(packed.usage["total"], 100)
+
+    def test_history_keeps_most_recent_messages(self):
+        history = [{"role": "user", "content": str(i) * 20} for i in range(5)]
+        packed = self.packer.pack("small", "", "", [], history)
+        per_message = 20 + MESSAGE_OVERHEAD_TOKENS
+        kept = (100 - 2 * MESSAGE_OVERHEAD_TOKENS) // per_message
+        self.assertEqual(packed.history, history[-kept:])
+        self.assertEqual(packed.usage["history"], kept * per_message)
+        self.assertEqual(packed.usage["budget"], 100)
+
+    def test_token_counts_are_cached_across_turns(self):
+        history = [{"role": "user", "content": "hello"}]
+        self.packer.pack("other", "sys", "first", ["ctx"], history)
+        calls = self.encoder.calls
+        self.packer.pack("other", "sys", "second", ["ctx"], history + [{"role": "assistant", "content": "reply"}])
+        self.assertEqual(self.encoder.calls - calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
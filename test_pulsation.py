@@ -0,0 +1,159 @@
+import asyncio
+import random
+import tempfile
+import threading
+import unittest
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import google.generativeai  # noqa: F401  (tarn_panya_ai ติดตั้งแพ็กเกจเองถ้า import ไม่ได้ — เทสต์ต้องไม่ทำแบบนั้น)
+    HAVE_GENAI = True
+except ImportError:
+    HAVE_GENAI = False
+
+
+class SlowLLM:
+    """LLMService stand-in whose calls wait on the event loop, optionally failing."""
+
+    enabled = True
+
+    def __init__(self, delay: float = 0.05, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.entered = asyncio.Event()
+        self.lock_free_during_call = []
+        self.memory = None
+
+    async def generate_wisdom_concept(self, text: str) -> str:
+        self.entered.set()
+        # ลองจับ lock จากอีก thread ระหว่างรอ LLM: ต้องได้ทันที
+        self.lock_free_during_call.append(await asyncio.to_thread(self._try_lock))
+        await asyncio.sleep(self.delay)
+        return "Concept"
+
+    async def synthesize_wisdom(self, insights) -> str:
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("LLM unavailable")
+        return "Wisdom"
+
+    def _try_lock(self) -> bool:
+        if self.memory.lock.acquire(timeout=1.0):
+            self.memory.lock.release()
+            return True
+        return False
+
+
+def insight(insight_id: str, impact: float, rng: random.Random) -> dict:
+    return {
+        "id": insight_id,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "trigger": f"generator_output:{uuid.uuid4().hex}",  # trigger ไม่ซ้ำ: ความสัมพันธ์มาจากที่เทสต์กำหนดเท่านั้น
+        "content": " ".join(f"w{rng.randrange(10**9)}" for _ in range(6)),
+        "source_agent": "Test",
+        "ethical_compliance": True,
+        "impact_score": impact,
+    }
+
+
+@unittest.skipUnless(HAVE_GENAI, "google-generativeai is not installed")
+class TestInsightPulsation(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        import tarn_panya_ai
+        self.module = tarn_panya_ai
+        self.saved_azure_ml = tarn_panya_ai.CONFIG.azure_ml_enabled
+        tarn_panya_ai.CONFIG.azure_ml_enabled = False
+        self.tmp = tempfile.TemporaryDirectory()
+        self.rng = random.Random(3)
+
+    async def asyncTearDown(self):
+        self.memory.close()
+        self.module.CONFIG.azure_ml_enabled = self.saved_azure_ml
+        self.tmp.cleanup()
+
+    async def make_memory(self, llm: SlowLLM, groups: int = 4, group_size: int = 12):
+        """`groups` separate components, each a seed (high impact) related to all of its group."""
+        m = self.module
+        self.memory = m.QuantumMemoryLink(Path(self.tmp.name) / "eternal_stream.qdat", m.DataGovernance(enabled=True),
+                                          m.AzureMLModelMocker(enabled=False), llm)
+        llm.memory = self.memory
+        for g in range(groups):
+            ids = [f"g{g}-{i}" for i in range(group_size)]
+            await self.memory.sync([insight(i, 0.9 if n == 0 else 0.1, self.rng) for n, i in enumerate(ids)])
+            for member in ids[1:]:
+                self.memory.add_relationship(ids[0], member, "refines")
+        return self.memory
+
+    async def test_lock_is_released_while_waiting_on_the_llm(self):
+        llm = SlowLLM()
+        memory = await self.make_memory(llm)
+        echo = await memory.generate_insight_pulsation()
+        self.assertEqual(echo["wisdom"], "Wisdom")
+        self.assertEqual(llm.lock_free_during_call, [True])
+
+    async def test_concurrent_pulsations_get_disjoint_clusters(self):
+        memory = await self.make_memory(SlowLLM(delay=0.05))
+        echoes = await asyncio.gather(*(memory.generate_insight_pulsation() for _ in range(4)))
+        clusters = [set(echo["synthesized_from_insights"]) for echo in echoes if echo]
+        self.assertGreaterEqual(len(clusters), 2)
+        for n, a in enumerate(clusters):
+            for b in clusters[n + 1:]:
+                self.assertFalse(a & b)
+        self.assertEqual(memory._pulsing, set())
+
+    async def test_reservation_is_released_when_the_llm_fails(self):
+        memory = await self.make_memory(SlowLLM(fail=True))
+        with self.assertRaises(RuntimeError):
+            await memory.generate_insight_pulsation()
+        self.assertEqual(memory._pulsing, set())
+
+    async def test_cluster_prefers_insights_adjacent_to_the_seed(self):
+        memory = await self.make_memory(SlowLLM(), groups=1, group_size=1)
+        seed = "g0-0"
+        near, second, far = ["n1", "n2", "n3"], ["m1"], [f"c{i}" for i in range(40)]
+        await memory.sync([insight(i, 0.1, self.rng) for i in near + second + far])
+        for n in near:
+            memory.add_relationship(seed, n, "refines")
+        memory.add_relationship("n1", "m1", "refines")
+        chain = ["n3"] + far
+        for a, b in zip(chain, chain[1:]):
+            memory.add_relationship(a, b, "refines")  # component เดียวกันทั้งหมด แต่ c* อยู่ไกลจาก seed
+
+        with memory.lock:
+            start, cluster = memory._reserve_pulsation_cluster()
+            memory._pulsing.clear()
+        cluster_ids = [i["id"] for i in cluster]
+        self.assertEqual(start["id"], seed)
+        self.assertEqual(len(cluster_ids), self.module.PULSATION_CLUSTER_SIZE)
+        self.assertTrue(set(near + second + ["c0"]) <= set(cluster_ids))
+
+    async def test_random_seed_is_sampled_without_scanning_the_store(self):
+        memory = await self.make_memory(SlowLLM(), groups=3)
+        for g in range(3):
+            await memory.sync([{**memory.data[f"g{g}-0"], "impact_score": 0.1}])  # ไม่เหลือ insight ที่ impact สูง
+        self.assertFalse(memory._high_impact)
+        self.assertEqual(len(memory._ids), 36)
+
+        class NoScan(dict):
+            def __iter__(self):
+                raise AssertionError("scanned every insight to pick a seed")
+
+        with memory.lock:
+            data, memory.data = memory.data, NoScan(memory.data)
+            try:
+                reserved = [memory._reserve_pulsation_cluster() for _ in range(3)]
+            finally:
+                memory.data = data
+                memory._pulsing.clear()
+        clusters = [{i["id"] for i in cluster} for _, cluster in filter(None, reserved)]
+        self.assertTrue(clusters)
+        for n, a in enumerate(clusters):
+            for b in clusters[n + 1:]:
+                self.assertFalse(a & b)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+
+from query_cache import TTLCache
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache(unittest.TestCase):
+
+    def test_lru_eviction_and_counters(self):
+        cache = TTLCache(maxsize=2, ttl_seconds=0)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)  # "b" เป็นตัวที่ใช้ล่าสุดน้อยที่สุด
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual((cache.stats()["hits"], cache.stats()["misses"]), (2, 1))
+
+    def test_entries_expire_after_ttl(self):
+        clock = FakeClock()
+        cache = TTLCache(maxsize=8, ttl_seconds=10, clock=clock)
+        cache.put("q", "answer")
+        clock.now = 9.9
+        self.assertEqual(cache.get("q"), "answer")
+        clock.now = 10.0
+        self.assertIsNone(cache.get("q"))
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
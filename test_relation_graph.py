@@ -0,0 +1,72 @@
+import json
+import random
+import unittest
+
+from relation_graph import RelationGraph, json_default
+
+LABELS = ["self_referential", "semantically_similar_content", "reverse_semantically_similar_content",
+          "shares_trigger_generator_output", "refines"]
+
+
+def reference_without(reference, node_id):
+    reference.pop(node_id, None)
+    for edges in reference.values():
+        edges.pop(node_id, None)
+
+
+class TestRelationGraph(unittest.TestCase):
+
+    def random_ops(self, graph: RelationGraph, reference: dict, rng: random.Random, count: int):
+        for _ in range(count):
+            source_id, target_id = f"n{rng.randrange(60)}", f"n{rng.randrange(60)}"
+            if rng.random() < 0.1:
+                graph.remove_node(source_id)
+                reference_without(reference, source_id)
+            else:
+                label = rng.choice(LABELS)
+                graph.set_edge(source_id, target_id, label)
+                reference.setdefault(source_id, {})[target_id] = label
+
+    def assert_matches(self, graph: RelationGraph, reference: dict):
+        expected = {source_id: edges for source_id, edges in reference.items() if edges}
+        self.assertEqual(graph.to_dict(), expected)
+        for source_id, edges in expected.items():
+            self.assertEqual(sorted(graph.targets(source_id)), sorted(edges))
+
+    def test_matches_dict_reference_across_merges(self):
+        rng = random.Random(3)
+        graph, reference = RelationGraph(delta_limit=37), {}
+        for _ in range(20):
+            self.random_ops(graph, reference, rng, 50)
+            self.assert_matches(graph, reference)
+        graph.merge()
+        self.assert_matches(graph, reference)
+        self.assertEqual(graph.edge_count, sum(len(edges) for edges in reference.values()))
+
+    def test_removed_node_can_be_added_again(self):
+        graph = RelationGraph()
+        graph.set_edge("a", "b", "refines")
+        graph.merge()
+        graph.remove_node("b")
+        self.assertEqual(graph.neighbors("a"), {})
+        graph.set_edge("c", "b", "refines")
+        self.assertEqual(graph.neighbors("a"), {})
+        self.assertEqual(graph.neighbors("c"), {"b": "refines"})
+
+    def test_snapshot_roundtrip_through_json(self):
+        rng = random.Random(5)
+        graph, reference = RelationGraph(delta_limit=100), {}
+        self.random_ops(graph, reference, rng, 400)
+        payload = json.loads(json.dumps(graph.to_snapshot(), default=json_default))
+        restored = RelationGraph.from_snapshot(payload)
+        self.assert_matches(restored, reference)
+        self.assertEqual(len(restored), len(graph))
+
+    def test_loads_legacy_dict_of_dicts(self):
+        legacy = {"a": {"a": "self_referential", "b": "refines"}, "b": {"a": "reverse_refines"}}
+        graph = RelationGraph.from_snapshot(legacy)
+        self.assertEqual(graph.to_dict(), legacy)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,182 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from benchmark_retrieval import HashModel
+from lore_parser import LoreEntries
+from retrievers import VectorRetriever, reciprocal_rank_fusion
+
+
+def lore_text(questions):
+    return "\n\n".join(f"[ENTRY]\nQUESTION: {q}\nANSWER: คำตอบของ {q}" for q in questions)
+
+
+class TestIncrementalRetriever(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = str(Path(self.tmp.name) / "lore.txt")
+        self.questions = [f"KBY lore topic {i}" for i in range(50)]
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(lore_text(self.questions))
+        self.retriever = VectorRetriever(LoreEntries.from_file(self.path), "hash", mode="hybrid", model=HashModel())
+
+    def tearDown(self):
+        self.retriever.stop_watching()
+        self.tmp.cleanup()
+
+    def test_upsert_and_delete_touch_only_changed_chunks(self):
+        changes = self.retriever.upsert_chunks([("Divination Matrix", "เมทริกซ์พยากรณ์"),
+                                                ("KBY lore topic 3", "คำตอบใหม่")])
+        self.assertEqual((changes["added"], changes["deleted"]), (1, 0))
+        self.assertEqual(self.retriever.retrieve("Divination Matrix", 1), ["เมทริกซ์พยากรณ์"])
+        self.assertEqual(self.retriever.retrieve("KBY lore topic 3", 1), ["คำตอบใหม่"])
+
+        changes = self.retriever.delete_chunks(["Divination Matrix"])
+        self.assertEqual(changes["deleted"], 1)
+        self.assertEqual(len(self.retriever.entries), 50)
+        self.assertNotIn("เมทริกซ์พยากรณ์", self.retriever.retrieve("Divination Matrix", 5))
+
+    def test_refresh_from_file_applies_diff_and_persists(self):
+        store_dir = Path(self.tmp.name) / "store"
+        self.retriever.save(store_dir)
+        self.assertIsNone(self.retriever.refresh_from_file(store_dir))
+
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(lore_text(self.questions[1:] + ["KBY-Coin"]))
+        os.utime(self.path, ns=(0, 1))
+        changes = self.retriever.refresh_from_file(store_dir)
+        self.assertEqual((changes["added"], changes["deleted"]), (1, 1))
+        self.assertEqual(self.retriever.retrieve("KBY-Coin", 1), ["คำตอบของ KBY-Coin"])
+
+        loaded = VectorRetriever.load(store_dir, self.path, "hash", mode="hybrid", model=HashModel())
+        self.assertIsNotNone(loaded)
+        self.assertEqual(loaded.retrieve("KBY-Coin", 1), ["คำตอบของ KBY-Coin"])
+
+    def test_save_and_refresh_after_upsert(self):
+        store_dir = Path(self.tmp.name) / "store"
+        self.retriever.upsert_chunks([("Divination Matrix", "เมทริกซ์พยากรณ์")])
+        self.retriever.delete_chunks(["KBY lore topic 0"])
+        self.retriever.save(store_dir)
+        loaded = VectorRetriever.load(store_dir, self.path, "hash", mode="hybrid", model=HashModel())
+        self.assertEqual(loaded.retrieve("Divination Matrix", 1), ["เมทริกซ์พยากรณ์"])
+        self.assertEqual(len(loaded.entries), 50)
+
+        # ตัวติดตามไฟล์ยังทำงานหลัง upsert: ไฟล์เป็นต้นฉบับ จึงแทนที่ chunk ที่เพิ่มผ่าน API
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(lore_text(self.questions + ["KBY-Coin"]))
+        os.utime(self.path, ns=(0, 1))
+        changes = self.retriever.refresh_from_file(store_dir)
+        self.assertEqual((changes["added"], changes["deleted"]), (2, 1))
+        self.assertEqual(self.retriever.retrieve("KBY-Coin", 1), ["คำตอบของ KBY-Coin"])
+
+    def test_snapshot_answers_survive_file_edits(self):
+        before = self.retriever.retrieve("KBY lore topic 9", 1)
+        self.assertEqual(before, ["คำตอบของ KBY lore topic 9"])
+        # บันทึกแบบเขียนไฟล์ใหม่แล้ว rename ทับ: handle ที่เปิดไว้ยังชี้ไฟล์รุ่นเดิม
+        replacement = self.path + ".new"
+        with open(replacement, "w", encoding="utf-8") as f:
+            f.write("[ENTRY]\nQUESTION: x\nANSWER: y")
+        os.replace(replacement, self.path)
+        self.assertEqual(self.retriever.retrieve("KBY lore topic 9", 1), before)
+
+    def test_touched_file_keeps_the_indexes(self):
+        before = self.retriever._snapshot
+        os.utime(self.path, ns=(0, 1))
+        self.assertIsNone(self.retriever.refresh_from_file())
+        after = self.retriever._snapshot
+        self.assertIs(after.index, before.index)
+        self.assertIs(after.sparse_index, before.sparse_index)
+        self.assertEqual(after.version, before.version)
+        self.assertEqual(after.entries.fingerprint["mtime_ns"], 1)
+        with mock.patch.object(LoreEntries, "from_file", side_effect=AssertionError("re-read")):
+            self.assertIsNone(self.retriever.refresh_from_file())  # ครั้งถัดไปไม่ต้องอ่านไฟล์อีก
+        self.assertEqual(self.retriever.retrieve("KBY lore topic 9", 1), ["คำตอบของ KBY lore topic 9"])
+
+    def test_in_place_edit_reads_answers_by_question(self):
+        with mock.patch("lore_parser._reflink", return_value=None):
+            retriever = VectorRetriever(LoreEntries.from_file(self.path), "hash", mode="hybrid", model=HashModel())
+        # แก้และตัดไฟล์เดิมในที่ก่อนตัวติดตามจะเห็น: offset เดิมใช้ไม่ได้ จึงอ่านตามคำถามจากไฟล์ปัจจุบัน
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(lore_text(["KBY lore topic 9"]).replace("คำตอบของ", "คำตอบใหม่ของ"))
+        self.assertEqual(retriever.retrieve("KBY lore topic 9", 1), ["คำตอบใหม่ของ KBY lore topic 9"])
+        self.assertEqual(retriever.retrieve("KBY lore topic 8", 1), [""])
+
+        os.utime(self.path, ns=(0, 1))
+        changes = retriever.refresh_from_file()
+        self.assertEqual((changes["added"], changes["deleted"]), (0, 49))
+        self.assertEqual(retriever.retrieve("คำตอบใหม่ของ", 1), ["คำตอบใหม่ของ KBY lore topic 9"])
+
+    def test_sparse_updates_match_a_full_rebuild(self):
+        self.retriever.upsert_chunks([("KBY lore topic 3", "Divination Matrix"), ("KBY-Coin", "เหรียญ KBY")])
+        self.retriever.delete_chunks(["KBY lore topic 4", "KBY lore topic 5"])
+        snapshot = self.retriever._snapshot
+        rebuilt = self.retriever._build_sparse(snapshot.entries, snapshot.chunk_ids)
+        for query in ["Divination Matrix", "KBY-Coin", "เหรียญ", "คำตอบของ topic 4", "lore topic 12"]:
+            incremental = snapshot.sparse_index.search(query, 10)
+            expected = rebuilt.search(query, 10)
+            self.assertEqual([doc_id for doc_id, _ in incremental], [doc_id for doc_id, _ in expected], query)
+            for (_, a), (_, b) in zip(incremental, expected):
+                self.assertAlmostEqual(a, b, places=4)
+        self.assertEqual(self.retriever.retrieve("Divination Matrix", 1), ["Divination Matrix"])
+
+    def test_repeated_query_is_served_from_cache_until_index_changes(self):
+        first = self.retriever.retrieve("KBY lore topic 7", 3)
+        self.assertEqual(self.retriever.retrieve("  kby LORE topic 7 ", 3), first)
+        stats = self.retriever.cache_stats()
+        self.assertEqual((stats["results"]["hits"], stats["results"]["misses"]), (1, 1))
+
+        self.retriever.upsert_chunks([("KBY lore topic 7", "คำตอบที่แก้ไขแล้ว")])
+        self.assertEqual(self.retriever.retrieve("KBY lore topic 7", 1), ["คำตอบที่แก้ไขแล้ว"])
+        self.assertEqual(self.retriever.cache_stats()["query_embeddings"]["hits"], 1)
+
+    def test_inner_product_index_scores_by_cosine(self):
+        retriever = VectorRetriever(LoreEntries.from_file(self.path), "hash", model=HashModel(),
+                                    index_params={"metric": "ip"})
+        scores, _ = retriever.index.search(retriever._embed(["KBY lore topic 5"]), 1)
+        self.assertAlmostEqual(float(scores[0][0]), 1.0, places=5)
+        self.assertEqual(retriever.retrieve("KBY lore topic 5", 1), ["คำตอบของ KBY lore topic 5"])
+
+    def test_retrieve_many_matches_single_queries(self):
+        queries = ["KBY lore topic 1", "KBY lore topic 42", "KBY lore topic 1"]
+        batch = self.retriever.retrieve_many(queries, 3, batch_size=2)
+        self.assertEqual(batch.ids.shape, (3, 3))
+        self.retriever.clear_caches()
+        for row, query in enumerate(queries):
+            self.assertEqual(batch[row], self.retriever.retrieve(query, 3))
+        self.assertEqual(len(self.retriever.retrieve_many([], 3)), 0)
+
+
+class TestHybridRetrieval(unittest.TestCase):
+
+    def test_reciprocal_rank_fusion(self):
+        self.assertEqual(reciprocal_rank_fusion([[1, 2, 3], [2, 3, 4]], [1.0, 1.0], k=60), [2, 3, 1, 4])
+        # น้ำหนักของ sparse สูงกว่าทำให้อันดับหนึ่งของ sparse ขึ้นมาก่อน
+        self.assertEqual(reciprocal_rank_fusion([[1, 2], [2, 1]], [1.0, 2.0], k=1)[0], 2)
+        self.assertEqual(reciprocal_rank_fusion([[5], []], [1.0, 1.0]), [5])
+        self.assertEqual(reciprocal_rank_fusion([[], []], [1.0, 1.0]), [])
+
+    def test_hybrid_finds_terms_only_present_in_answers(self):
+        # HashModel ไม่มีความหมาย: dense หาได้เฉพาะคำถามที่ตรงทุกตัวอักษร ส่วนคำในคำตอบต้องมาจาก BM25
+        lines = ["[ENTRY]", "QUESTION: ธารปัญญา คืออะไร?", "ANSWER: คลังความรู้ของ KBY ที่ใช้ Flare Protocol",
+                 "[ENTRY]", "QUESTION: Qualia คืออะไร?", "ANSWER: มิติของประสบการณ์รับรู้ที่สื่อสารกับ SOA",
+                 "[ENTRY]", "QUESTION: KBY-Coin คืออะไร?", "ANSWER: เหรียญพลังงานของ SpiralQuest",
+                 "[ENTRY]", "QUESTION: Quantum Sea คืออะไร?", "ANSWER: ทะเลควอนตัมแห่งจิตสำนึก"]
+        entries = LoreEntries.from_lines(lines)
+        balanced = VectorRetriever(entries, "hash", mode="hybrid", model=HashModel())
+        sparse_heavy = VectorRetriever(entries, "hash", mode="hybrid", model=HashModel(), sparse_weight=2.0)
+
+        for query, answer in [("เหรียญพลังงาน", "เหรียญพลังงานของ SpiralQuest"),
+                              ("ประสบการณ์รับรู้", "มิติของประสบการณ์รับรู้ที่สื่อสารกับ SOA"),
+                              ("flare protocol", "คลังความรู้ของ KBY ที่ใช้ Flare Protocol")]:
+            self.assertEqual(sparse_heavy.retrieve(query, 1), [answer], query)
+            # น้ำหนักเท่ากัน: อันดับหนึ่งของ dense (สุ่ม) เสมอกับของ BM25 จึงต้องอยู่ในสองอันดับแรก
+            self.assertIn(answer, balanced.retrieve(query, 2), query)
+        # เมื่อทั้งสองฝั่งเห็นตรงกัน รายการนั้นชนะโดยไม่ต้องถ่วงน้ำหนัก
+        self.assertEqual(balanced.retrieve("Quantum Sea คืออะไร?", 1), ["ทะเลควอนตัมแห่งจิตสำนึก"])
+        self.assertEqual(len(balanced.retrieve("Metamind OS", 4)), 4)
+
+if __name__ == "__main__":
+    unittest.main()
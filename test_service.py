@@ -0,0 +1,107 @@
+import json
+import unittest
+from unittest import mock
+
+from starlette.testclient import TestClient
+
+import service
+from answer_cache import ReplayChunk
+from token_ledger import TurnMeter
+
+
+class CharEncoder:
+    """Offline stand-in for tiktoken: one token per character."""
+
+    def encode(self, text):
+        return [ord(c) for c in text]
+
+    def decode(self, tokens):
+        return "".join(chr(t) for t in tokens)
+
+
+class StubRetriever:
+    entries = ["KBY คือคลังปัญญา", "Generator expands possibilities"]
+    version = 3
+
+    def stop_watching(self):
+        self.stopped = True
+
+
+class StubKernel:
+
+    def __init__(self):
+        self.retriever = StubRetriever()
+        self.closed = False
+
+    async def aquery(self, question, chat_history, model, temp, top_k, session_id="default"):
+        async def stream():
+            for word in ("ตอบ:", " ", question):
+                yield ReplayChunk(word, model)
+            yield ReplayChunk(None, model, finish_reason="stop")
+
+        meter = TurnMeter(session_id, model, prompt_tokens=7)
+        meter.completion_tokens = 3
+        return {"response_stream": stream(), "contexts": self.retriever.entries[:top_k], "usage": meter, "cached": False}
+
+    async def aclose(self):
+        self.closed = True
+
+
+def sse_events(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+class TestService(unittest.TestCase):
+
+    def setUp(self):
+        self.kernel = StubKernel()
+        patcher = mock.patch.object(service, "build_kernel", return_value=self.kernel)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_healthz_query_and_batch(self):
+        with TestClient(service.app) as client:
+            health = client.get("/healthz")
+            self.assertEqual(health.status_code, 200)
+            self.assertEqual(health.json(), {"status": "ok", "entries": 2, "index_version": 3, "in_flight": 0})
+
+            response = client.post("/query", json={"question": "KBY คืออะไร?", "top_k": 1})
+            self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+            events = sse_events(response.text)
+            self.assertEqual(events[0], ("contexts", ["KBY คือคลังปัญญา"]))
+            self.assertEqual("".join(data for event, data in events if event == "delta"), "ตอบ: KBY คืออะไร?")
+            self.assertEqual(events[-1][0], "done")
+            self.assertEqual(events[-1][1]["prompt_tokens"], 7)
+
+            response = client.post("/query", json={"question": "hello", "stream": False})
+            self.assertEqual(response.json()["answer"], "ตอบ: hello")
+
+            self.assertEqual(client.post("/query", json={}).status_code, 400)
+
+            response = client.post("/batch", json={"questions": ["one", "two", "one"]})
+            self.assertEqual([r["answer"] for r in response.json()["results"]], ["ตอบ: one", "ตอบ: two", "ตอบ: one"])
+            too_many = ["q"] * (service.settings.service_max_batch + 1)
+            self.assertEqual(client.post("/batch", json={"questions": too_many}).status_code, 400)
+
+        self.assertTrue(self.kernel.closed)
+        self.assertTrue(self.kernel.retriever.stopped)
+
+
+class TestBuildKernel(unittest.TestCase):
+
+    def test_builds_a_real_kernel(self):
+        # ตรวจเส้นทาง import จริงของ lifespan: service -> core -> config
+        with mock.patch("retrievers.build_vector_retriever", return_value=StubRetriever()), \
+                mock.patch("tiktoken.get_encoding", return_value=CharEncoder()):
+            kernel = service.build_kernel()
+        from core import TharnpanyaKernel
+        self.assertIsInstance(kernel, TharnpanyaKernel)
+        self.assertIsInstance(kernel.retriever, StubRetriever)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import json
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest import mock
+
+from insight_index import InsightIndex
+from insight_query import InsightQueryEngine
+from memory_wal import MemoryWAL, apply_record
+from migrate_to_sqlite import migrate
+from relation_graph import RelationGraph
+from sqlite_store import SQLiteStore, StoredInsights, fts_query
+from test_insight_query import INSIGHTS
+from test_pulsation import HAVE_GENAI
+
+
+def put(insight_id: str) -> dict:
+    return {"op": "put", "id": insight_id, "insight": dict(INSIGHTS[insight_id], id=insight_id)}
+
+
+def echo(echo_id: str, concept: str, timestamp: str) -> dict:
+    return {"id": echo_id, "timestamp": timestamp, "concept": concept, "wisdom": "w",
+            "synthesized_from_insights": [], "refinement_count": 0}
+
+
+class TestSQLiteStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmp.name) / "tarn_panya.db"
+        self.store = SQLiteStore(self.db_path, group_size=2)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def write(self, data: dict, relationships: RelationGraph, records):
+        for record in records:
+            apply_record(data, relationships, record)
+            self.store.append(record)
+
+    def test_recover_matches_applied_records(self):
+        data, relationships = self.store.recover()
+        self.write(data, relationships, [put("a"), put("b"), put("c"), {"op": "rel", "s": "a", "t": "b", "r": "refines"},
+                                         {"op": "rel", "s": "c", "t": "a", "r": "refines"}, {"op": "del", "id": "c"}])
+        expected = dict(data.items())
+        self.assertEqual(sorted(expected), ["a", "b"])
+        self.store.close()
+
+        self.store = SQLiteStore(self.db_path)
+        recovered_data, recovered_relationships = self.store.recover()
+        self.assertIsInstance(recovered_data, StoredInsights)
+        self.assertEqual(recovered_data, expected)
+        self.assertEqual(recovered_relationships.to_dict(), relationships.to_dict())
+        self.assertEqual(recovered_relationships.neighbors("b"), {"a": "reverse_refines"})
+
+    def test_search_and_related_match_in_memory_queries(self):
+        data, relationships = self.store.recover()
+        self.write(data, relationships, [put(i) for i in INSIGHTS] + [{"op": "rel", "s": "a", "t": "b", "r": "refines"}])
+        engine = InsightQueryEngine(InsightIndex(data), data)
+        for query in ["identity OR self OR purpose", "spiral AND quest", '"quest spiral" OR mutation',
+                      "Further refine: codex", "?!"]:
+            self.assertEqual([i["id"] for i in self.store.search_insights(query)], engine.search(query), query)
+        self.assertEqual(fts_query('kby spiral AND "quest" OR codex'), '("kby spiral" AND "quest") OR ("codex")')
+        self.assertEqual([i["id"] for i in self.store.related_insights("b")], ["a"])
+        self.assertEqual(self.store.related_insights("a", "reverse_refines"), [])
+
+    def test_echoes_by_concept_and_retention(self):
+        self.store.add_echo(echo("e1", "Purpose of the Spiral", "2020-01-01T00:00:00+00:00"))
+        self.store.add_echo(echo("e2", "spiral codex", "2025-01-01T00:00:00+00:00"))
+        self.store.add_echo(echo("e3", "Mission", "2024-01-01T00:00:00"))
+        self.assertEqual([e["id"] for e in self.store.echoes_by_concept("SPIRAL")], ["e2", "e1"])
+        self.assertEqual([e["id"] for e in self.store.echoes_by_concept("", limit=2)], ["e2", "e3"])
+        self.assertEqual(self.store.remove_expired_echoes(1704067200.0), 2)  # 2024-01-01 UTC
+        self.assertEqual([e["id"] for e in self.store.echoes_by_concept("")], ["e2"])
+
+    def test_migrates_snapshot_wal_tail_and_echoes(self):
+        qdat = Path(self.tmp.name) / "eternal_stream.qdat"
+        wal = MemoryWAL(qdat)
+        data, relationships = wal.recover()
+        for record in [put("a"), put("b"), {"op": "rel", "s": "a", "t": "b", "r": "refines"}]:
+            apply_record(data, relationships, record)
+            wal.append(record)
+        wal.compact(data, relationships, background=False)
+        for record in [put("d"), {"op": "del", "id": "b"}]:
+            apply_record(data, relationships, record)
+            wal.append(record)
+        wal.close()
+        echoes = Path(self.tmp.name) / "eternal_echoes.bak"
+        echoes.write_text(json.dumps([echo("e1", "Purpose", "2025-01-01T00:00:00+00:00")], indent=2), encoding="utf-8")
+
+        self.assertEqual(migrate(qdat, echoes, self.db_path), (2, 0, 1))
+        self.assertEqual(migrate(qdat, echoes, self.db_path), (2, 0, 1))
+        self.assertEqual(self.store.recover()[0], data)
+
+
+@unittest.skipUnless(HAVE_GENAI, "google-generativeai is not installed")
+class TestQuantumMemoryOnSQLite(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        import tarn_panya_ai
+        self.module = tarn_panya_ai
+        self.saved_azure_ml = tarn_panya_ai.CONFIG.azure_ml_enabled
+        tarn_panya_ai.CONFIG.azure_ml_enabled = False
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = SQLiteStore(Path(self.tmp.name) / "tarn_panya.db")
+        self.memory = self.open_memory()
+
+    async def asyncTearDown(self):
+        self.memory.close()
+        self.store.close()
+        self.module.CONFIG.azure_ml_enabled = self.saved_azure_ml
+        self.tmp.cleanup()
+
+    def open_memory(self):
+        m = self.module
+        return m.QuantumMemoryLink(Path(self.tmp.name) / "eternal_stream.qdat", m.DataGovernance(enabled=True),
+                                   m.AzureMLModelMocker(enabled=False), llm_service=None, storage=self.store)
+
+    def insight(self, insight_id: str, timestamp: str = None) -> dict:
+        return dict(INSIGHTS[insight_id], id=insight_id, source_agent="Test", ethical_compliance=True,
+                    timestamp=timestamp or datetime.now(timezone.utc).isoformat())
+
+    async def test_reopening_keeps_bodies_on_disk_and_queries_the_store(self):
+        await self.memory.sync([self.insight(i) for i in "abc"])
+        self.memory.add_relationship("a", "b", "refines")
+        self.memory.close()
+
+        self.memory = self.open_memory()
+        self.assertIsInstance(self.memory.data, StoredInsights)
+        self.assertEqual(len(self.memory.data._cache), 0)  # โหลด index ได้โดยไม่เก็บเนื้อหา insight ไว้
+        self.assertIsNone(self.memory.query_engine)
+        self.assertEqual(len(self.memory.index), 3)
+
+        with mock.patch.object(self.store, "search_insights", wraps=self.store.search_insights) as search, \
+                mock.patch.object(self.store, "related_insights", wraps=self.store.related_insights) as related:
+            self.assertEqual([i["id"] for i in self.memory.retrieve_by_query("spiral AND quest")], ["c", "b"])
+            self.assertEqual([i["id"] for i in self.memory.get_related_insights("a", "refines")], ["b"])
+        search.assert_called_once_with("spiral AND quest", 5)
+        related.assert_called_once_with("a", "refines")
+
+        await self.memory.sync([self.insight("a", "2000-01-01T00:00:00+00:00")])
+        self.assertNotIn("a", self.memory.index)
+        self.assertFalse(self.store.has_insight("a"))  # หมดอายุ: หาด้วยคอลัมน์ epoch ใน SQLite
+        self.assertEqual(self.store.insight_count(), 2)
+        self.assertEqual(self.memory.retrieve_by_query("self"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
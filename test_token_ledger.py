@@ -0,0 +1,56 @@
+import unittest
+
+from answer_cache import ReplayChunk
+from token_ledger import REPLY_PRIMING_TOKENS, TokenLedger, count_message_tokens
+
+COSTS = {"gpt-4o": {"prompt": 0.001, "completion": 0.002}}
+
+
+class UsageChunk:
+
+    def __init__(self, prompt_tokens, completion_tokens):
+        self.choices = []
+        self.usage = type("Usage", (), {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens})()
+
+
+def count_words(text):
+    return len(text.split())
+
+
+class TestTokenLedger(unittest.TestCase):
+
+    def setUp(self):
+        self.ledger = TokenLedger(COSTS)
+
+    def test_counts_completion_incrementally_and_commits_on_end(self):
+        turn = self.ledger.start_turn("s1", "gpt-4o", prompt_tokens=10)
+        stream = self.ledger.meter(iter([ReplayChunk("one two ", "gpt-4o"), ReplayChunk("three", "gpt-4o")]),
+                                   turn, count_words)
+        next(stream)
+        self.assertEqual(turn.completion_tokens, 2)
+        self.assertEqual(self.ledger.session("s1")["in_flight_completion_tokens"], 2)
+        list(stream)
+        self.assertTrue(turn.done)
+        self.assertAlmostEqual(turn.cost, 10 * 0.001 + 3 * 0.002)
+        session = self.ledger.session("s1")
+        self.assertEqual((session["turns"], session["completion_tokens"], session["in_flight"]), (1, 3, 0))
+
+    def test_provider_usage_overrides_local_count(self):
+        turn = self.ledger.start_turn("s1", "gpt-4o", prompt_tokens=10)
+        list(self.ledger.meter(iter([ReplayChunk("one two", "gpt-4o"), UsageChunk(12, 5)]), turn, count_words))
+        self.assertEqual((turn.prompt_tokens, turn.completion_tokens), (12, 5))
+        self.assertEqual(self.ledger.totals()["by_model"]["gpt-4o"]["prompt_tokens"], 12)
+
+    def test_cached_turns_cost_nothing(self):
+        turn = self.ledger.start_turn("s2", "gpt-4o", prompt_tokens=0, cached=True)
+        list(self.ledger.meter(iter([ReplayChunk("a b c", "gpt-4o")]), turn, count_words))
+        totals = self.ledger.totals()
+        self.assertEqual((totals["cached_turns"], totals["completion_tokens"], totals["cost"]), (1, 3, 0))
+
+    def test_prompt_tokens_follow_the_sent_payload(self):
+        messages = [{"role": "system", "content": "a b"}, {"role": "user", "content": "c"}]
+        self.assertEqual(count_message_tokens(messages, count_words), 3 + 2 * 4 + REPLY_PRIMING_TOKENS)
+
+
+if __name__ == "__main__":
+    unittest.main()
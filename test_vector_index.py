@@ -0,0 +1,114 @@
+import unittest
+
+import faiss
+import numpy as np
+
+from vector_index import (MIN_IVF_TRAINING_POINTS, MIN_PQ_TRAINING_POINTS, base_index, build_index,
+                          remove_ids)
+
+DIM = 32
+# recall@10 เทียบกับ flat (ค้นหาแบบ exact) ที่ยอมรับได้ของแต่ละชนิด
+MIN_RECALL = {"ivf_flat": 0.95, "ivf_pq": 0.6, "hnsw": 0.95}
+
+
+def clustered(n, rng, clusters=100):
+    """Gaussian blobs: IVF cells line up with real structure, as with sentence embeddings."""
+    centers = rng.standard_normal((clusters, DIM)).astype(np.float32) * 4
+    return (centers[rng.integers(0, clusters, n)] + rng.standard_normal((n, DIM))).astype(np.float32)
+
+
+def recall_at(k, found, truth):
+    return float(np.mean([len(set(a) & set(b)) / k for a, b in zip(found, truth)]))
+
+
+class TestBuildIndex(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(5)
+        cls.vectors = clustered(MIN_PQ_TRAINING_POINTS, rng)
+        picks = rng.choice(len(cls.vectors), 200, replace=False)
+        cls.queries = cls.vectors[picks] + 0.3 * rng.standard_normal((200, DIM)).astype(np.float32)
+        _, cls.truth = build_index(cls.vectors, "flat").search(cls.queries, 10)
+
+    def test_recall_against_flat(self):
+        expected_types = {"ivf_flat": faiss.IndexIVFFlat, "ivf_pq": faiss.IndexIVFPQ, "hnsw": faiss.IndexHNSWFlat}
+        for index_type, min_recall in MIN_RECALL.items():
+            with self.subTest(index_type=index_type):
+                index = build_index(self.vectors, index_type)
+                self.assertIsInstance(index, expected_types[index_type])
+                self.assertEqual(index.ntotal, len(self.vectors))
+                _, found = index.search(self.queries, 10)
+                self.assertGreaterEqual(recall_at(10, found, self.truth), min_recall)
+
+    def test_small_corpora_fall_back(self):
+        rng = np.random.default_rng(7)
+        cases = [("ivf_pq", MIN_PQ_TRAINING_POINTS - 1, faiss.IndexIVFFlat),
+                 ("ivf_pq", MIN_IVF_TRAINING_POINTS - 1, faiss.IndexFlat),
+                 ("ivf_flat", MIN_IVF_TRAINING_POINTS - 1, faiss.IndexFlat),
+                 ("ivf_flat", MIN_IVF_TRAINING_POINTS, faiss.IndexIVFFlat),
+                 ("hnsw", 10, faiss.IndexHNSWFlat)]
+        for index_type, n, expected in cases:
+            with self.subTest(index_type=index_type, n=n):
+                vectors = clustered(n, rng)
+                index = build_index(vectors, index_type)
+                self.assertIs(type(index), expected)
+                _, found = index.search(vectors[:5], 1)
+                self.assertEqual(found[:, 0].tolist(), [0, 1, 2, 3, 4])
+
+    def test_unknown_type_or_metric(self):
+        with self.assertRaises(ValueError):
+            build_index(self.vectors[:10], "lsh")
+        with self.assertRaises(ValueError):
+            build_index(self.vectors[:10], "flat", metric="cosine")
+
+    def test_inner_product_metric(self):
+        vectors = self.vectors[:500] / np.linalg.norm(self.vectors[:500], axis=1, keepdims=True)
+        for index_type in ("flat", "hnsw"):
+            with self.subTest(index_type=index_type):
+                scores, found = build_index(vectors, index_type, metric="ip").search(vectors[:3], 1)
+                self.assertEqual(found[:, 0].tolist(), [0, 1, 2])
+                np.testing.assert_allclose(scores[:, 0], 1.0, rtol=1e-5)
+
+
+class TestRemoveIds(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        self.vectors = clustered(2_000, rng)
+        self.ids = np.arange(1_000, 3_000, dtype=np.int64)
+        self.removed = self.ids[::3]
+
+    def check_removed(self, index):
+        self.assertEqual(index.ntotal, len(self.ids) - len(self.removed))
+        _, found = index.search(self.vectors, 5)
+        self.assertFalse(np.isin(found, self.removed).any())
+        kept = ~np.isin(self.ids, self.removed)
+        _, nearest = index.search(self.vectors[kept][:50], 1)
+        self.assertEqual(nearest[:, 0].tolist(), self.ids[kept][:50].tolist())
+
+    def test_hnsw_is_rebuilt_without_the_removed_ids(self):
+        index = build_index(self.vectors, "hnsw", ids=self.ids, hnsw_m=16, ef_search=48)
+        self.assertIsInstance(index, faiss.IndexIDMap2)
+        rebuilt = remove_ids(index, self.removed)
+        self.assertIsNot(rebuilt, index)
+        self.assertEqual(index.ntotal, len(self.ids))  # กราฟเดิมไม่ถูกแก้
+        base = base_index(rebuilt)
+        self.assertIsInstance(base, faiss.IndexHNSWFlat)
+        self.assertEqual((base.hnsw.nb_neighbors(1), base.hnsw.efSearch), (16, 48))
+        self.check_removed(rebuilt)
+
+        rebuilt.add_with_ids(self.vectors[:1], np.array([self.removed[0]], dtype=np.int64))
+        _, found = rebuilt.search(self.vectors[:1], 1)
+        self.assertEqual(int(found[0, 0]), int(self.removed[0]))
+
+    def test_flat_and_ivf_remove_in_place(self):
+        for index_type in ("flat", "ivf_flat"):
+            with self.subTest(index_type=index_type):
+                index = build_index(self.vectors, index_type, ids=self.ids)
+                self.assertIs(remove_ids(index, self.removed), index)
+                self.check_removed(index)
+
+
+if __name__ == "__main__":
+    unittest.main()
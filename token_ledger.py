@@ -0,0 +1,151 @@
+# /thanpanya-ai/token_ledger.py
+
+import threading
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List
+
+from prompt_packer import MESSAGE_OVERHEAD_TOKENS
+
+# token ที่ใช้เริ่มคำตอบของ assistant ในรูปแบบ chat
+REPLY_PRIMING_TOKENS = 3
+
+COUNTER_FIELDS = ("turns", "cached_turns", "coalesced_turns", "prompt_tokens", "completion_tokens", "cost")
+
+
+def count_message_tokens(messages: List[Dict], count) -> int:
+    """Prompt tokens of a chat payload, `count` being a text -> token count function."""
+    return sum(count(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages) + REPLY_PRIMING_TOKENS
+
+
+def _empty() -> Dict[str, float]:
+    return {field: 0 for field in COUNTER_FIELDS}
+
+
+class TurnMeter:
+    """
+    Live token counts of one chat turn. The stream updates it chunk by chunk;
+    readers may look at it at any time without taking a lock.
+
+    A `coalesced` turn shared another turn's upstream completion (see
+    `AsyncLLMClient.stream_chat`); like a cached turn it is not billed, since
+    the turn that started the completion already carries its cost.
+    """
+
+    def __init__(self, session_id: str, model: str, prompt_tokens: int, cached: bool = False):
+        self.session_id = session_id
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = 0
+        self.cached = cached
+        self.coalesced = False
+        self.from_provider = False  # True เมื่อใช้ตัวเลข usage จาก API แทนการนับเอง
+        self.cost = 0.0
+        self.done = False
+
+
+class TokenLedger:
+    """
+    Per-session and per-process token and cost totals.
+
+    `meter()` wraps a response stream: completion tokens are counted from each
+    chunk's delta as it arrives, and replaced by the provider's `usage` numbers
+    when the final chunk carries them. The turn is committed when the stream
+    ends or is abandoned. Reads only copy counters under a short lock, so
+    querying the ledger never waits on a stream.
+    """
+
+    def __init__(self, costs: Dict[str, Dict[str, float]], default_model: str = "gpt-4o"):
+        self.costs = costs
+        self.default_model = default_model
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, Dict[str, float]] = {}
+        self._models: Dict[str, Dict[str, float]] = {}
+        self._totals = _empty()
+        self._in_flight: Dict[int, TurnMeter] = {}
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        # รุ่นที่ไม่มีในตารางราคาคิดตามราคาของ default_model
+        cost_info = self.costs.get(model) or self.costs.get(self.default_model)
+        if cost_info is None:
+            return 0.0
+        return prompt_tokens * cost_info["prompt"] + completion_tokens * cost_info["completion"]
+
+    def start_turn(self, session_id: str, model: str, prompt_tokens: int, cached: bool = False) -> TurnMeter:
+        return TurnMeter(session_id, model, prompt_tokens, cached)
+
+    @staticmethod
+    def mark_coalesced(turn: TurnMeter):
+        """Called when `turn` joins a completion already paid for by another turn."""
+        turn.coalesced = True
+
+    def meter(self, stream: Iterable[Any], turn: TurnMeter, count) -> Iterator[Any]:
+        """
+        Yields `stream` unchanged while metering it into `turn`. `count` tokenizes
+        one delta. A cached replay is metered too, but costs nothing.
+        """
+        self._begin(turn)
+        try:
+            for chunk in stream:
+                self._observe(turn, chunk, count)
+                yield chunk
+        finally:
+            self._commit(turn)
+
+    async def ameter(self, stream: AsyncIterable[Any], turn: TurnMeter, count) -> AsyncIterator[Any]:
+        """Async counterpart of `meter`."""
+        self._begin(turn)
+        try:
+            async for chunk in stream:
+                self._observe(turn, chunk, count)
+                yield chunk
+        finally:
+            self._commit(turn)
+
+    def _begin(self, turn: TurnMeter):
+        with self._lock:
+            self._in_flight[id(turn)] = turn
+
+    @staticmethod
+    def _observe(turn: TurnMeter, chunk: Any, count):
+        usage = getattr(chunk, "usage", None)
+        if usage is not None and not (turn.cached or turn.coalesced):
+            turn.prompt_tokens = usage.prompt_tokens
+            turn.completion_tokens = usage.completion_tokens
+            turn.from_provider = True
+        elif not turn.from_provider and chunk.choices:
+            content = chunk.choices[0].delta.content
+            if content:
+                turn.completion_tokens += count(content)
+
+    def _commit(self, turn: TurnMeter):
+        billed = not (turn.cached or turn.coalesced)
+        turn.cost = self.cost(turn.model, turn.prompt_tokens, turn.completion_tokens) if billed else 0.0
+        turn.done = True
+        with self._lock:
+            self._in_flight.pop(id(turn), None)
+            for counters in (self._totals,
+                             self._sessions.setdefault(turn.session_id, _empty()),
+                             self._models.setdefault(turn.model, _empty())):
+                counters["turns"] += 1
+                counters["cached_turns"] += turn.cached
+                counters["coalesced_turns"] += turn.coalesced
+                counters["prompt_tokens"] += turn.prompt_tokens if billed else 0
+                counters["completion_tokens"] += turn.completion_tokens
+                counters["cost"] += turn.cost
+
+    # --- Queries ---
+    def session(self, session_id: str) -> Dict[str, float]:
+        """Committed totals of one session plus tokens of its turns still streaming."""
+        with self._lock:
+            counters = dict(self._sessions.get(session_id, _empty()))
+            live = [t for t in self._in_flight.values() if t.session_id == session_id]
+        counters["in_flight"] = len(live)
+        counters["in_flight_completion_tokens"] = sum(t.completion_tokens for t in live)
+        return counters
+
+    def totals(self) -> Dict[str, Any]:
+        with self._lock:
+            totals = dict(self._totals)
+            totals["by_model"] = {model: dict(c) for model, c in self._models.items()}
+            totals["sessions"] = len(self._sessions)
+            totals["in_flight"] = len(self._in_flight)
+        return totals
@@ -0,0 +1,137 @@
+# /thanpanya-ai/vector_index.py
+
+import logging
+import math
+from typing import Optional
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+# "ip" = inner product; with L2-normalized vectors this ranks by cosine similarity
+METRICS = ("l2", "ip")
+
+# faiss ต้องการจุดฝึกอย่างน้อย ~39 จุดต่อ centroid และ 256 จุดต่อ codebook ของ PQ (8 bits)
+MIN_POINTS_PER_CENTROID = 39
+MIN_IVF_TRAINING_POINTS = 1_000
+MIN_PQ_TRAINING_POINTS = MIN_POINTS_PER_CENTROID * 256
+
+
+def choose_nlist(n: int) -> int:
+    """IVF cell count from corpus size: ~4·sqrt(n), never more than the training data supports."""
+    return max(1, min(int(4 * math.sqrt(n)), n // MIN_POINTS_PER_CENTROID))
+
+
+def choose_nprobe(nlist: int) -> int:
+    """Cells probed per query: ~1/16 of the cells, at least 8, at most 128."""
+    return max(1, min(nlist, max(8, nlist // 16), 128))
+
+
+def choose_pq_m(dim: int) -> int:
+    """Largest sub-quantizer count dividing `dim` with sub-vectors of at least 4 dims (≤ 64)."""
+    for m in range(min(64, dim // 4), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def build_index(embeddings: np.ndarray, index_type: str = "flat", nprobe: Optional[int] = None,
+                hnsw_m: int = 32, ef_construction: int = 80, ef_search: int = 64,
+                ids: Optional[np.ndarray] = None, metric: str = "l2") -> faiss.Index:
+    """
+    Builds and fills a FAISS index of the requested type.
+
+    Training parameters (IVF cells, PQ sub-quantizers, probe count) are derived
+    from the corpus size. Corpora too small to train a given type fall back to
+    the next simpler one (ivf_pq -> ivf_flat -> flat) instead of failing.
+
+    With `ids`, vectors are stored under those int64 ids (IVF natively, other
+    types through IndexIDMap2) so they can later be added and removed by id.
+
+    `metric="ip"` builds an inner-product index; callers are expected to pass
+    L2-normalized vectors (and queries) so scores are cosine similarities.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}'. Expected one of {INDEX_TYPES}.")
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}'. Expected one of {METRICS}.")
+    faiss_metric = faiss.METRIC_INNER_PRODUCT if metric == "ip" else faiss.METRIC_L2
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    n, dim = embeddings.shape
+
+    if index_type == "ivf_pq" and n < MIN_PQ_TRAINING_POINTS:
+        logger.info(f"Only {n} vectors; too few to train IVF-PQ. Falling back to ivf_flat.")
+        index_type = "ivf_flat"
+    if index_type == "ivf_flat" and n < MIN_IVF_TRAINING_POINTS:
+        logger.info(f"Only {n} vectors; too few to train IVF. Falling back to flat.")
+        index_type = "flat"
+
+    if index_type == "flat":
+        index = faiss.IndexFlat(dim, faiss_metric)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m, faiss_metric)
+        index.hnsw.efConstruction = ef_construction
+        index.hnsw.efSearch = ef_search
+    else:
+        nlist = choose_nlist(n)
+        quantizer = faiss.IndexFlat(dim, faiss_metric)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss_metric)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, choose_pq_m(dim), 8, faiss_metric)
+        index.train(embeddings)
+        index.nprobe = nprobe or choose_nprobe(nlist)
+
+    if ids is None:
+        index.add(embeddings)
+        return index
+    if not isinstance(index, faiss.IndexIVF):
+        index = faiss.IndexIDMap2(index)
+    index.add_with_ids(embeddings, np.ascontiguousarray(ids, dtype=np.int64))
+    return index
+
+
+def base_index(index: faiss.Index) -> faiss.Index:
+    """The underlying index of an IndexIDMap2 wrapper (or the index itself)."""
+    if isinstance(index, faiss.IndexIDMap2):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def copy_index(index: faiss.Index) -> faiss.Index:
+    """
+    A writable deep copy. `faiss.clone_index` would keep memory-mapped storage
+    as a read-only view, so the copy goes through serialization instead.
+    """
+    return faiss.deserialize_index(faiss.serialize_index(index))
+
+
+def remove_ids(index: faiss.Index, ids: np.ndarray) -> faiss.Index:
+    """
+    Removes vectors by id, returning the resulting index. HNSW graphs cannot
+    delete nodes, so for them the remaining vectors are reconstructed from the
+    index itself and re-inserted into a fresh graph — no re-embedding needed.
+    """
+    ids = np.ascontiguousarray(ids, dtype=np.int64)
+    base = base_index(index)
+    if not isinstance(base, faiss.IndexHNSW):
+        index.remove_ids(ids)
+        return index
+
+    all_ids = faiss.vector_to_array(index.id_map)
+    keep = ~np.isin(all_ids, ids)
+    vectors = base.reconstruct_n(0, base.ntotal)[keep]
+    fresh = faiss.IndexHNSWFlat(base.d, base.hnsw.nb_neighbors(1), base.metric_type)
+    fresh.hnsw.efConstruction = base.hnsw.efConstruction
+    fresh.hnsw.efSearch = base.hnsw.efSearch
+    rebuilt = faiss.IndexIDMap2(fresh)
+    if len(vectors):
+        rebuilt.add_with_ids(vectors, all_ids[keep])
+    return rebuilt
+
+
+def index_memory_bytes(index: faiss.Index) -> int:
+    """Serialized size of the index — a close proxy for its resident memory."""
+    return int(faiss.serialize_index(index).nbytes)